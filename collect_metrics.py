@@ -1,4 +1,6 @@
-import os, yaml, json, argparse, csv, re
+import os, json, argparse, csv, re
+from vificonf import loadYAML, dumpYAML
+from vifilog import LogStore
 
 
 def extYAMLtoCSVlog(fin:str, fout:str):
@@ -14,8 +16,17 @@ def extYAMLtoCSVlog(fin:str, fout:str):
     @type fout: str 
     '''
     
-    with open(fin, 'r') as f:
-        res = yaml.load(f)
+    res = loadYAML(fin, copy_conf=False)
+    writeCSVlog(logToCSVRows(res), fout)
+
+
+def logToCSVRows(res:dict) -> list:
+    ''' Extract CSV records (see @extYAMLtoCSVlog) from one (completed) request log
+    @param res: Request log
+    @type res: dict
+    @return: List of CSV records
+    @rtype: list
+    '''
     
     l = []  # List of CSV results
     for s in res['services']:
@@ -29,6 +40,16 @@ def extYAMLtoCSVlog(fin:str, fout:str):
             d['result'] = n['res_file']
             d['transfer_time(sec)'] = n['transfer_time']
             l.append(d)
+    return l
+
+
+def writeCSVlog(l:list, fout:str) -> None:
+    ''' Write CSV records to the output CSV file
+    @param l: List of CSV records
+    @type l: list
+    @param fout: Path and name of the output CSV file
+    @type fout: str 
+    '''
     
     keys = l[0].keys()
     with open(fout, 'w') as f:
@@ -54,38 +75,79 @@ def completeLog(logs_parent_path:str, d:str) -> None:
         # Search for the YAML log file under current log directory
         if '.yml' in logf or '.yaml' in logf:
             flog = os.path.join(logs_parent_path, d, logf)
-            with open(flog) as f:
-                l = yaml.load(f)
-                break
+            l = loadYAML(flog)
+            break
                 
     # Complete found YAML log if exists
     if flog:
-        if 'req_comp_time' not in l or not l['req_comp_time']:
-            l['req_comp_time'] = float(l['end']) - float(l['start'])
-        for s in l['services']:
-            itr = 0
-            l['services'][s]['serv_comp_time'] = float(l['services'][s]['end']) - float(l['services'][s]['start'])
-            for n in l['services'][s]['nifi']:
-                f = os.path.join(logs_parent_path, re.search('//(.*):', n['destination']['ip'])[1], n['res_file'])
-                with open(f, 'r') as ff:
-                    fflog = json.load(ff)
-                if 'deliverd_at' not in l['services'][s]['nifi'][itr] or not l['services'][s]['nifi'][itr]['deliverd_at']:
-                    l['services'][s]['nifi'][itr]['deliverd_at'] = float(fflog['received_at']) / 1000  # NiFi records time in milli-sec. So, time record should be devided by 1000 as other time metrics are recorded by seconds
-                if 'transfer_time' not in l['services'][s]['nifi'][itr] or not l['services'][s]['nifi'][itr]['transfer_time']:
-                    l['services'][s]['nifi'][itr]['transfer_time'] = float(l['services'][s]['nifi'][itr]['deliverd_at']) - float(l['services'][s]['nifi'][itr]['sent'])
-                itr += 1
+        completeReqLog(logs_parent_path, l)
         # final_log.append(l)
             
-        with open(flog, 'w') as f:
-            yaml.dump(l, f)
+        dumpYAML(l, flog, default_flow_style=None)
     else:
         print("No YAML log file was found under specified directory " + str(os.path.join(logs_parent_path, d)) + "\n")
 
 
+def completeReqLog(logs_parent_path:str, l:dict) -> None:
+    ''' Complete one request log in place (see @completeLog)
+    @param logs_parent_path: The root (i.e., parent) directory that contains logs sub-directories
+    @type logs_parent_path: str
+    @param l: Request log
+    @type l: dict
+    '''
+    
+    if 'req_comp_time' not in l or not l['req_comp_time']:
+        l['req_comp_time'] = float(l['end']) - float(l['start'])
+    for s in l['services']:
+        itr = 0
+        l['services'][s]['serv_comp_time'] = float(l['services'][s]['end']) - float(l['services'][s]['start'])
+        for n in l['services'][s]['nifi']:
+            f = os.path.join(logs_parent_path, re.search('//(.*):', n['destination']['ip'])[1], n['res_file'])
+            with open(f, 'r') as ff:
+                fflog = json.load(ff)
+            if 'deliverd_at' not in l['services'][s]['nifi'][itr] or not l['services'][s]['nifi'][itr]['deliverd_at']:
+                l['services'][s]['nifi'][itr]['deliverd_at'] = float(fflog['received_at']) / 1000  # NiFi records time in milli-sec. So, time record should be devided by 1000 as other time metrics are recorded by seconds
+            if 'transfer_time' not in l['services'][s]['nifi'][itr] or not l['services'][s]['nifi'][itr]['transfer_time']:
+                l['services'][s]['nifi'][itr]['transfer_time'] = float(l['services'][s]['nifi'][itr]['deliverd_at']) - float(l['services'][s]['nifi'][itr]['sent'])
+            itr += 1
+
+
+def extStoretoCSVlog(logs_parent_path:str, d:str, fout:str, start:float=None, end:float=None) -> None:
+    ''' Extract required logs in CSV format (see @extYAMLtoCSVlog) from the log store of a VIFI Node. Only the store segments
+    that may contain requests in the time window [@start, @end] are read. Request logs are completed (see @completeLog) in
+    memory, as the log store is append-only
+    @param logs_parent_path: The root (i.e., parent) directory that contains logs sub-directories
+    @type logs_parent_path: str
+    @param d: Directory name that contains the log store
+    @type d: str
+    @param fout: Path and name of the output CSV file
+    @type fout: str 
+    @param start: If specified, only requests that end at or after this time are extracted
+    @type start: float
+    @param end: If specified, only requests that start at or before this time are extracted
+    @type end: float
+    '''
+    
+    l = []  # List of CSV results
+    for rec in LogStore(os.path.join(logs_parent_path, d)).query(start=start, end=end):
+        if not rec['log'].get('services'):  # Requests that failed validation have no services
+            continue
+        completeReqLog(logs_parent_path, rec['log'])
+        for row in logToCSVRows(rec['log']):
+            l.append(dict({'request':rec['id']}, **row))
+    
+    if l:
+        writeCSVlog(l, fout)
+    else:
+        print("No request log was found in the log store under specified directory " + str(os.path.join(logs_parent_path, d)) + "\n")
+
+
 # Parse input arguments
 parser = argparse.ArgumentParser()
 parser.add_argument('--root_logs_path', help='Root path of the logs directory')
 parser.add_argument('--logs_dirs', nargs='+', help='List of directories, under root logs path, containing logs for each VIFI Node')  # usually, the value for this parameter is '35.167.35.244' '52.26.208.37' '52.32.117.160'
+parser.add_argument('--start', type=float, help='Start of the time window of extracted requests (only for log stores)')
+parser.add_argument('--end', type=float, help='End of the time window of extracted requests (only for log stores)')
 
 arguments = parser.parse_args()
 logs_parent_path = arguments.root_logs_path  # Root path of the logs directory
@@ -93,6 +155,10 @@ dirs = arguments.logs_dirs  # List of directories, under the root logs path, con
 
 # Complete each YAML log file
 for d in dirs:
+    # Extract required log information from the log store, if the VIFI Node keeps one
+    if LogStore.isStore(os.path.join(logs_parent_path, d)):
+        extStoretoCSVlog(logs_parent_path, d, os.path.join(logs_parent_path, d, 'summary.csv'), arguments.start, arguments.end)
+        continue
     completeLog(logs_parent_path, d)
     # Extract required log information fromm YAML log file to a CSV file
     logfs = os.listdir(os.path.join(logs_parent_path, d))
@@ -0,0 +1,15 @@
+'''
+Created on Oct 19, 2026
+
+Test configuration of VIFI modules. The VIFI modules are flat modules at the root of the repository, so the root is
+added to the module search path.
+
+@author: Mohammed Elshambakey
+@contact: shambakey1@gmail.com
+'''
+
+import os, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+	sys.path.insert(0, ROOT)
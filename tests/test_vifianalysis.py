@@ -0,0 +1,129 @@
+'''
+Created on Oct 19, 2026
+
+Tests of the parsing and caching of request logs for analysis (vifianalysis)
+
+@author: Mohammed Elshambakey
+@contact: shambakey1@gmail.com
+'''
+
+import os, json, math, pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('pandas')
+
+import vifianalysis
+from vificonf import dumpYAML
+from vifilog import LogStore
+from vifianalysis import AnalysisCache, parseReqLogs, analysisFrame, CACHE_NAME, isCacheFile
+
+
+def _reqLog(start, iterations=2):
+	services = {}
+	for it in range(1, iterations + 1):
+		t = start + 10 * (it - 1)
+		services['ser_' + str(it) if it > 1 else 'ser'] = {'base_service':'ser', 'iteration':it, 'tasks':2, 'start':t + 1, \
+			'end':t + 5, 'nifi':[{'sent':t + 7}, {'sent':t + 6}], 'status':'done'}
+	return {'start':start, 'end':start + 10 * iterations, 'services':services}
+
+
+def _same(a, b):
+	# Parsed columns hold NaN values, which are not equal to themselves
+	return json.dumps(a, sort_keys=True) == json.dumps(b, sort_keys=True)
+
+
+def _writeLogs(path, n):
+	paths = []
+	for i in range(n):
+		p = os.path.join(path, 'r%d.yml' % i)
+		dumpYAML(_reqLog(100 * i), p)
+		paths.append(p)
+	return paths
+
+
+def test_parse_logs(tmp_path):
+	paths = _writeLogs(str(tmp_path), 1)
+	old = str(tmp_path / 'old.yml')
+	dumpYAML({'start':0, 'services':{'s1':{'tasks':1, 'start':1, 'end':2}}}, old)
+	bad = str(tmp_path / 'bad.yml')
+	with open(bad, 'w') as f:
+		f.write('[unclosed')
+	cols = parseReqLogs(paths + [old, bad])
+	assert cols['service'] == ['ser', 'ser_2', 's1']
+	assert cols['base_service'] == ['ser', 'ser', 's1']  # Older logs have no base service or iteration
+	assert cols['iteration'][:2] == [1, 2] and math.isnan(cols['iteration'][2])
+	assert cols['nifi_sent'][:2] == [7, 17]  # Latest of multiple destinations
+	assert math.isnan(cols['s3_sent'][0])
+
+
+def test_cache_parses_only_changed_logs(tmp_path, monkeypatch):
+	paths = _writeLogs(str(tmp_path), 3)
+	cache_path = str(tmp_path / CACHE_NAME)
+	parsed = []
+	parse = vifianalysis.parseReqLogs
+	monkeypatch.setattr(vifianalysis, 'parseReqLogs', lambda x: parsed.extend(x) or parse(x))
+	cache = AnalysisCache(cache_path)
+	first = cache.logs(paths, workers=1)
+	assert parsed == paths and cache.save()
+	del parsed[:]
+	cache = AnalysisCache(cache_path)
+	assert _same(cache.logs(paths, workers=1), first) and parsed == []
+	dumpYAML(_reqLog(1000, 3), paths[1])
+	st = os.stat(paths[1])
+	os.utime(paths[1], ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+	cols = cache.logs(paths, workers=1)
+	assert parsed == [paths[1]]
+	assert len(cols['request']) == 7 and cols['request'][2:5] == [paths[1]] * 3
+	os.remove(paths[0])
+	cache.prune(paths[1:])
+	assert paths[0] not in cache.entries and len(cache.logs(paths, workers=1)['request']) == 5
+
+
+def test_cache_keeps_nan(tmp_path):
+	p = str(tmp_path / 'old.yml')
+	dumpYAML({'services':{'s1':{'tasks':1}}}, p)
+	cache = AnalysisCache(str(tmp_path / CACHE_NAME))
+	cache.logs([p], workers=1)
+	assert cache.save()
+	cols = AnalysisCache(str(tmp_path / CACHE_NAME)).entries[p]['cols']
+	assert math.isnan(cols['start'][0]) and math.isnan(cols['iteration'][0])
+
+
+def test_unusable_cache_files(tmp_path):
+	paths = _writeLogs(str(tmp_path), 1)
+	cache_path = str(tmp_path / CACHE_NAME)
+	with open(cache_path, 'w') as f:
+		f.write('{"version": ')
+	cache = AnalysisCache(cache_path)
+	assert cache.entries == {}
+	with open(cache_path, 'w') as f:
+		f.write('{"version": 1, "columns": [], "entries": {}}')
+	assert AnalysisCache(cache_path).entries == {}
+	cache = AnalysisCache(str(tmp_path / 'missing' / CACHE_NAME))  # E.g., a log directory that cannot be written
+	assert len(cache.logs(paths, workers=1)['request']) == 2
+	assert cache.save() is False
+	assert not [x for x in os.listdir(str(tmp_path)) if isCacheFile(x) and x != CACHE_NAME]
+
+
+def test_cache_of_log_store(tmp_path):
+	store = LogStore(str(tmp_path / 'store'), segment_size=400, index_records=1)
+	for i in range(6):
+		store.append('r%d.x' % i, _reqLog(100 * i), request='r%d' % i)
+	cache = AnalysisCache(str(tmp_path / CACHE_NAME))
+	cols = cache.store(store)
+	assert len(cols['request']) == 12
+	assert cols['request'][:2] == ['r0.x', 'r0.x']
+	assert sorted(set(cache.store(store, start=215, end=320)['request'])) == ['r2.x', 'r3.x']
+	assert cache.save()
+	assert _same(AnalysisCache(str(tmp_path / CACHE_NAME)).store(store), cols)
+
+
+def test_analysis_frame(tmp_path):
+	paths = _writeLogs(str(tmp_path), 1)
+	df = analysisFrame(parseReqLogs(paths))
+	assert list(df['service']) == ['ser', 'ser_2']
+	assert list(df['iteration']) == [1, 2]
+	assert list(df['cmp_time']) == [4, 4]
+	assert list(df['queue_wait']) == [1, 6]
+	assert list(df['iter_duration']) == [4, 10]
+	assert list(df['nifi_time']) == [2, 2]
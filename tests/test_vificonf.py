@@ -0,0 +1,91 @@
+'''
+Created on Oct 19, 2026
+
+Tests of the configuration cache and writer (vificonf)
+
+@author: Mohammed Elshambakey
+@contact: shambakey1@gmail.com
+'''
+
+import os, io, shutil
+from conftest import ROOT
+from vificonf import loadYAML, dumpYAML, ConfWriter, confVersion
+from vifireq import Request
+
+JPL_TEMPLATE = os.path.join(ROOT, 'conf(jpl_template).yml')
+
+
+def _touch(path, sec):
+	# Make the external modification visible, even on file systems with a coarse time resolution
+	st = os.stat(path)
+	os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + sec * 10 ** 9))
+
+
+def _request(tmp_path):
+	conffile = str(tmp_path / 'conf.yml')
+	shutil.copy(JPL_TEMPLATE, conffile)
+	req = Request.load(conffile)
+	return conffile, req, next(iter(req.services))
+
+
+def test_load_dump_round_trip(tmp_path):
+	conffile = str(tmp_path / 'conf.yml')
+	conf = loadYAML(JPL_TEMPLATE)
+	dumpYAML(conf, conffile)
+	assert loadYAML(conffile) == conf
+	conf['added'] = 1  # Loaded configurations are copies, so the cache is not modified
+	assert 'added' not in loadYAML(conffile)
+
+
+def test_flush_points(tmp_path):
+	conffile, req, ser = _request(tmp_path)
+	writer = ConfWriter(flush_points=['service'])
+	req.services[ser].iterative.cur_iter = 1
+	writer.update(conffile, req, 'iteration')
+	assert loadYAML(conffile)['services'][ser]['iterative']['cur_iter'] == 0
+	writer.update(conffile, req, 'service')
+	assert loadYAML(conffile)['services'][ser]['iterative']['cur_iter'] == 1
+	assert conffile not in writer.pending
+	assert confVersion(conffile) >= 1
+
+
+def test_flush_merges_external_modifications(tmp_path):
+	conffile, req, ser = _request(tmp_path)
+	writer = ConfWriter()
+	writer.update(conffile, req, 'service')
+	conf = loadYAML(conffile)
+	conf['services'][ser]['iterative']['max_rep'] = 99
+	dumpYAML(conf, conffile)
+	_touch(conffile, 1)
+	req.services[ser].iterative.cur_iter = 1
+	writer.update(conffile, req, 'service')
+	conf = loadYAML(conffile)
+	assert conf['services'][ser]['iterative']['max_rep'] == 99
+	assert conf['services'][ser]['iterative']['cur_iter'] == 1
+
+
+def test_flush_keeps_unmergeable_file(tmp_path):
+	conffile, req, ser = _request(tmp_path)
+	writer = ConfWriter()
+	writer.update(conffile, req, 'service')
+	conf = loadYAML(conffile)
+	conf['services'][ser]['iterative']['max_rep'] = 99
+	conf['services'][ser]['nifi'][0]['transfer']['condition'] = 'bogus cond'
+	dumpYAML(conf, conffile)
+	_touch(conffile, 1)
+	req.services[ser].iterative.cur_iter = 1
+	flog = io.StringIO()
+	writer.update(conffile, req, 'service', flog)
+	assert 'cannot be merged' in flog.getvalue()
+	assert loadYAML(conffile) == conf  # The external modifications are not overwritten
+	assert writer.pending[conffile] is req
+	# Once the file is fixed, the pending update is merged and written
+	conf['services'][ser]['nifi'][0]['transfer']['condition'] = 'last_iteration'
+	dumpYAML(conf, conffile)
+	_touch(conffile, 2)
+	writer.flush(conffile, flog)
+	conf = loadYAML(conffile)
+	assert conf['services'][ser]['iterative']['max_rep'] == 99
+	assert conf['services'][ser]['iterative']['cur_iter'] == 1
+	assert conf['services'][ser]['nifi'][0]['transfer']['condition'] == 'last_iteration'
+	assert conffile not in writer.pending
@@ -0,0 +1,98 @@
+'''
+Created on Oct 19, 2026
+
+Tests of the result index and copy functions (vififs)
+
+@author: Mohammed Elshambakey
+@contact: shambakey1@gmail.com
+'''
+
+import os, glob, pytest
+from vififs import ResultIndex, copyFile, copyTree
+
+FILES = ['a.nc', 'b.nc', 'c.txt', '.hidden.nc', 'out_1/x.nc', 'out_1/y.txt', 'out_2/z.nc', 'out_2/deep/w.nc', \
+		'.hdir/h.nc', 'sp ace/[x].nc']
+
+
+@pytest.fixture
+def tree(tmp_path):
+	for f in FILES:
+		p = tmp_path / f
+		p.parent.mkdir(parents=True, exist_ok=True)
+		p.write_text(f)
+	(tmp_path / 'empty').mkdir()
+	return str(tmp_path)
+
+
+PATTERNS = ['*', '*.nc', '?.nc', '[ab].nc', '[!a]*.nc', '.*', '.h*', '*/', 'out_*/*.nc', 'out_*/', '*/*', '*/*/*.nc', \
+			'out_?/deep/*', 'out_1/*', 'out_1', 'missing', 'missing/*', 'a.nc/*', 'sp ace/*', '*/[[]x].nc', 'empty/*']
+
+
+@pytest.mark.parametrize('pattern', PATTERNS)
+def test_glob_absolute(tree, pattern):
+	pathname = os.path.join(tree, pattern)
+	assert sorted(ResultIndex().glob(pathname)) == sorted(glob.glob(pathname))
+
+
+@pytest.mark.parametrize('pattern', PATTERNS)
+def test_glob_relative(tree, pattern, monkeypatch):
+	monkeypatch.chdir(tree)
+	assert sorted(ResultIndex().glob(pattern)) == sorted(glob.glob(pattern))
+	assert sorted(ResultIndex().glob(os.path.join('.', pattern))) == sorted(glob.glob(os.path.join('.', pattern)))
+
+
+def test_glob_lists_each_directory_once(tree, monkeypatch):
+	index = ResultIndex()
+	index.glob(os.path.join(tree, '*.nc'))
+	monkeypatch.setattr(os, 'scandir', None)  # Any new listing fails
+	assert sorted(index.glob(os.path.join(tree, '*.txt'))) == [os.path.join(tree, 'c.txt')]
+	assert index.isdir(os.path.join(tree, 'out_1')) and index.isfile(os.path.join(tree, 'a.nc'))
+
+
+def test_changed_and_invalidate(tree):
+	index = ResultIndex()
+	assert index.glob(os.path.join(tree, 'out_1', '*.nc')) == [os.path.join(tree, 'out_1', 'x.nc')]
+	new = os.path.join(tree, 'out_1', 'new.nc')
+	open(new, 'w').close()
+	assert new not in index.glob(os.path.join(tree, 'out_1', '*.nc'))  # The listing is cached
+	index.changed(new)
+	assert new in index.glob(os.path.join(tree, 'out_1', '*.nc'))
+	os.mkdir(os.path.join(tree, 'out_3'))
+	index.invalidate(tree)
+	assert os.path.join(tree, 'out_3') + os.sep in index.glob(os.path.join(tree, 'out_*', ''))
+	index.invalidate()
+	assert not index.listings
+
+
+def test_walk(tree):
+	res = {top:(sorted(dirs), sorted(files)) for top, dirs, files in ResultIndex().walk(tree)}
+	exp = {top:(sorted(dirs), sorted(files)) for top, dirs, files in os.walk(tree)}
+	assert res == exp
+
+
+def test_copy_file_does_not_hardlink_by_default(tmp_path):
+	src, dst = str(tmp_path / 'src'), str(tmp_path / 'dst')
+	with open(src, 'w') as f:
+		f.write('data')
+	assert copyFile(src, dst) in ('reflink', 'copy')
+	assert not os.path.samefile(src, dst)
+	with open(dst) as f:
+		assert f.read() == 'data'
+	assert copyFile(src, str(tmp_path / 'link'), 'hardlink') == 'hardlink'
+	assert os.path.samefile(src, str(tmp_path / 'link'))
+
+
+def test_copy_tree(tree, tmp_path_factory):
+	dst = str(tmp_path_factory.mktemp('copy') / 'tree')
+	copyTree(tree, dst, workers=2)
+	for f in FILES:
+		with open(os.path.join(dst, f)) as fin:
+			assert fin.read() == f
+	assert os.path.isdir(os.path.join(dst, 'empty'))
+
+
+def test_copy_tree_into_itself(tree):
+	dst = os.path.join(tree, 'copy')
+	copyTree(tree, dst)
+	assert os.path.isfile(os.path.join(dst, 'out_2', 'deep', 'w.nc'))
+	assert not os.path.exists(os.path.join(dst, 'copy'))
@@ -0,0 +1,100 @@
+'''
+Created on Oct 19, 2026
+
+Tests of the request log store (vifilog)
+
+@author: Mohammed Elshambakey
+@contact: shambakey1@gmail.com
+'''
+
+import os, json
+from vifilog import LogStore, INDEX_NAME, isStoreFile
+
+
+def _log(start, services):
+	return {'start':start, 'end':start + 10, 'services':{s:{'tasks':1} for s in services}}
+
+
+def _fill(store, n, dset='set1'):
+	for i in range(n):
+		store.append('r%d.%d' % (i % 3, i), _log(100 * i, ['ser%d' % (i % 2)]), request='r%d' % (i % 3), dset=dset)
+
+
+def test_rotation_and_index(tmp_path):
+	store = LogStore(str(tmp_path), segment_size=300, index_records=1)
+	_fill(store, 6)
+	names = store.listSegments()
+	assert len(names) > 1
+	assert all(x.endswith('.gz') for x in names[:-1])
+	assert all(isStoreFile(x) for x in os.listdir(str(tmp_path)))
+	assert LogStore.isStore(str(tmp_path))
+	with open(os.path.join(str(tmp_path), INDEX_NAME)) as f:
+		index = json.load(f)
+	assert sorted(index['segments']) == names
+	assert sum(x['records'] for x in index['segments'].values()) == 6
+	assert [r['id'] for r in LogStore(str(tmp_path)).query()] == ['r%d.%d' % (i % 3, i) for i in range(6)]
+
+
+def test_uncompressed_rotation(tmp_path):
+	store = LogStore(str(tmp_path), segment_size=300, compress=False)
+	_fill(store, 6)
+	names = store.listSegments()
+	assert len(names) > 1 and not any(x.endswith('.gz') for x in names)
+	reader = LogStore(str(tmp_path))
+	assert len(list(reader.query())) == 6
+	closed = [x for x in names if store.index['segments'][x].get('closed')]
+	assert closed and reader.loadIndex()['segments'][closed[0]].get('closed')
+
+
+def test_query_filters(tmp_path):
+	store = LogStore(str(tmp_path), segment_size=200, index_records=1)
+	_fill(store, 9)
+	store.append('other.1', _log(5000, ['ser9']), request='other', dset='set2')
+	reader = LogStore(str(tmp_path))
+	assert [r['id'] for r in reader.query(request='r1')] == ['r1.1', 'r1.4', 'r1.7']
+	assert [r['id'] for r in reader.query(service='ser9')] == ['other.1']
+	assert [r['id'] for r in reader.query(dset='set2')] == ['other.1']
+	assert [r['id'] for r in reader.query(start=405, end=610)] == ['r1.4', 'r2.5', 'r0.6']
+	# Segments that cannot match are not read
+	assert len(reader.segments(request='other')) < len(reader.listSegments())
+
+
+def test_unindexed_records_are_found(tmp_path):
+	store = LogStore(str(tmp_path), index_interval=3600, index_records=1000)
+	_fill(store, 4)
+	assert store.unsaved == 3  # Only the start of the segment is indexed
+	assert len(list(LogStore(str(tmp_path)).query(request='r0'))) == 2
+	store.flush()
+	assert store.unsaved == 0
+	with open(os.path.join(str(tmp_path), INDEX_NAME)) as f:
+		assert sum(x['records'] for x in json.load(f)['segments'].values()) == 4
+
+
+def test_rebuild_missing_or_malformed_index(tmp_path):
+	store = LogStore(str(tmp_path), segment_size=300, index_records=1)
+	_fill(store, 6)
+	expected = store.index['segments']
+	os.remove(os.path.join(str(tmp_path), INDEX_NAME))
+	assert LogStore(str(tmp_path)).loadIndex()['segments'] == expected
+	with open(os.path.join(str(tmp_path), INDEX_NAME), 'w') as f:
+		f.write('{"segments":')
+	assert LogStore(str(tmp_path)).loadIndex()['segments'] == expected
+
+
+def test_writer_restart_recounts_active_segment(tmp_path):
+	store = LogStore(str(tmp_path), index_interval=3600, index_records=1000)
+	_fill(store, 3)  # The last two records are not indexed
+	store = LogStore(str(tmp_path), index_interval=3600, index_records=1000)
+	_fill(store, 1)
+	store.flush()
+	with open(os.path.join(str(tmp_path), INDEX_NAME)) as f:
+		index = json.load(f)
+	assert index['segments'][index['active']]['records'] == 4
+
+
+def test_partial_line_is_skipped(tmp_path):
+	store = LogStore(str(tmp_path))
+	_fill(store, 2)
+	with open(store.segmentPath(store.index['active']), 'a') as f:
+		f.write('{"id": "partial"')
+	assert [r['id'] for r in LogStore(str(tmp_path)).query()] == ['r0.0', 'r1.1']
@@ -0,0 +1,152 @@
+'''
+Created on Oct 19, 2026
+
+Tests of the chunking, merging and caching of Prometheus range queries (vifiprom)
+
+@author: Mohammed Elshambakey
+@contact: shambakey1@gmail.com
+'''
+
+import pytest
+
+pytest.importorskip('requests')
+
+import vifiprom
+from vifiprom import PromClient, PromError, QueryCache, MAX_POINTS
+
+
+class FakeResponse():
+
+	def __init__(self, status_code=200, data=None, text=''):
+		self.status_code = status_code
+		self.ok = status_code < 400
+		self.data = data
+		self.text = text
+
+	def json(self):
+		if self.data is None:
+			raise ValueError('Expecting value')
+		return self.data
+
+
+def _client(**kwargs):
+	client = PromClient('http://prom:9090/api/v1', backoff=0, **kwargs)
+	client.calls = []
+
+	def fetchRange(query, start, end, step):
+		client.calls.append((start, end))
+		n = int(round((end - start) / step))
+		return [{'metric':{'__name__':query, 'job':j}, 'values':[[start + i * step, str(start + i * step)] for i in range(n + 1)]} \
+			for j in ('a', 'b')]
+
+	client.fetchRange = fetchRange
+	return client
+
+
+def test_merge_series():
+	chunks = [
+		[{'metric':{'job':'a'}, 'values':[[0, '0'], [10, '1']]}, {'metric':{'job':'b'}, 'values':[[10, '2']]}],
+		[{'metric':{'job':'b'}, 'values':[[20, '3'], [30, '4']]}, {'metric':{'job':'c'}, 'values':[[40, '5']]}],
+		[{'metric':{'job':'a'}, 'values':[[30, '6']]}],
+	]
+	assert PromClient.mergeSeries(chunks, 10, 30) == [
+		{'metric':{'job':'a'}, 'values':[[10, '1'], [30, '6']]},
+		{'metric':{'job':'b'}, 'values':[[10, '2'], [20, '3'], [30, '4']]},
+	]  # Series without points in the range are dropped
+	assert PromClient.mergeSeries([], 0, 10) == []
+
+
+def test_merge_series_label_order():
+	chunks = [[{'metric':{'a':'1', 'b':'2'}, 'values':[[0, '0']]}], [{'metric':{'b':'2', 'a':'1'}, 'values':[[1, '1']]}]]
+	assert PromClient.mergeSeries(chunks, 0, 1) == [{'metric':{'a':'1', 'b':'2'}, 'values':[[0, '0'], [1, '1']]}]
+
+
+def test_short_range_is_one_query():
+	client = _client()
+	res = client.queryRange('m', 0, 100, 10)
+	assert client.calls == [(0, 100)]
+	assert [len(s['values']) for s in res] == [11, 11]
+
+
+@pytest.mark.parametrize('points', [MAX_POINTS, MAX_POINTS + 1, 2 * MAX_POINTS, 3 * MAX_POINTS + 7])
+def test_long_range_is_chunked(points):
+	client = _client()
+	step = 15.0
+	res = client.queryRange('m', 1000, 1000 + (points - 1) * step, step)
+	assert len(client.calls) == -(-points // MAX_POINTS)
+	for start, end in client.calls:
+		assert (end - start) / step + 1 <= MAX_POINTS
+	for s in res:
+		times = [v[0] for v in s['values']]
+		assert times == [1000 + i * step for i in range(points)]  # No duplicated or missing points
+
+
+def test_cached_chunks_are_fetched_once(tmp_path, monkeypatch):
+	monkeypatch.setattr(vifiprom.time, 'time', lambda: 1000000.0)
+	cache = QueryCache(str(tmp_path))
+	client = _client(cache=cache, chunk_points=10)
+	first = client.queryRange('m', 105, 495, 10)
+	assert client.calls == [(100, 190), (200, 290), (300, 390), (400, 490)]  # Aligned chunks
+	assert [v[0] for v in first[0]['values']] == list(range(110, 500, 10))  # Aligned to the step, inside the range
+	client.calls.clear()
+	second = client.queryRange('  m ', 110, 490, 10)  # Same normalized query
+	assert client.calls == []
+	assert second == first
+	client.queryRange('m', 450, 620, 10)
+	assert client.calls == [(500, 590), (600, 690)]
+
+
+def test_recent_chunks_are_not_cached(tmp_path, monkeypatch):
+	monkeypatch.setattr(vifiprom.time, 'time', lambda: 1000.0)
+	client = _client(cache=QueryCache(str(tmp_path)), chunk_points=10)
+	client.queryRange('m', 500, 950, 10)
+	client.calls.clear()
+	client.queryRange('m', 500, 950, 10)
+	assert client.calls == [(700, 790), (800, 890), (900, 950)]  # Only the chunks before time()-CACHE_MIN_AGE are cached
+
+
+def test_cache_eviction(tmp_path):
+	cache = QueryCache(str(tmp_path), max_bytes=100)
+	cache.put('a', ['x' * 40])
+	cache.put('b', ['y' * 40])
+	assert cache.get('a') == ['x' * 40]  # 'a' becomes the most recently used
+	cache.put('c', ['z' * 40])
+	assert cache.get('b') is None and cache.get('a') is not None and cache.get('c') is not None
+	assert QueryCache(str(tmp_path)).size == cache.size
+
+
+def test_request_errors(monkeypatch):
+	client = PromClient('http://prom:9090/api/v1', retries=2, backoff=0)
+	responses = [FakeResponse(503, text='busy'), FakeResponse(200, {'data':{'result':[]}})]
+	monkeypatch.setattr(client.session, 'get', lambda *args, **kwargs: responses.pop(0))
+	assert client.request('query_range', {'query':'m'}) == {'result':[]}
+	for res in (FakeResponse(200, None), FakeResponse(200, {'status':'error'}), FakeResponse(400, text='bad query')):
+		monkeypatch.setattr(client.session, 'get', lambda *args, **kwargs: res)
+		with pytest.raises(PromError):
+			client.request('query_range', {'query':'m'})
+
+
+def test_query_metrics_reports_failed_metrics(monkeypatch):
+	client = _client(workers=2)
+
+	def fetchRange(query, start, end, step):
+		if 'bad' in query:
+			raise PromError('failed')
+		return [{'metric':{'__name__':'m1'}, 'values':[[0, '1']]}, {'metric':{'__name__':'m2'}, 'values':[[0, '2']]}]
+
+	client.fetchRange = fetchRange
+	res = client.queryMetrics(['m1', 'm2', 'bad'], 0, 0, 1, batch=2)
+	assert list(res) == ['m1', 'm2', 'bad']
+	assert res['m1'][0]['values'] == [[0, '1']] and res['m2'][0]['values'] == [[0, '2']]
+	assert res['bad'].startswith('Error')
+
+
+def test_set_workers_resizes_pool():
+	client = PromClient('http://prom:9090/api/v1', workers=2)
+	adapter = client.session.adapters['http://']
+	client.setWorkers(2)
+	assert client.session.adapters['http://'] is adapter
+	client.setWorkers(16)
+	assert client.workers == 16
+	assert client.session.adapters['http://'] is not adapter
+	assert client.session.adapters['https://'] is client.session.adapters['http://']
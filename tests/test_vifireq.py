@@ -0,0 +1,132 @@
+'''
+Created on Oct 19, 2026
+
+Tests of the transfer condition language and the request model (vifireq)
+
+@author: Mohammed Elshambakey
+@contact: shambakey1@gmail.com
+'''
+
+import os, copy, pytest
+from conftest import ROOT
+from vificonf import loadYAML
+from vifireq import compileCondition, Request, RequestConfError
+
+JPL_TEMPLATE = os.path.join(ROOT, 'conf(jpl_template).yml')
+
+
+@pytest.mark.parametrize('cond, it, rep, stop, expected', [
+	('all', 0, 3, False, True),
+	('never', 3, 3, True, False),
+	('true', 0, 1, False, True),
+	('false', 0, 1, False, False),
+	('last_iteration', 2, 3, False, False),
+	('last_iteration', 3, 3, False, True),
+	('all_but_last_iteration', 2, 3, False, True),
+	('all_but_last_iteration', 3, 3, False, False),
+	('stop_iteration', 0, 3, True, True),
+	('stop_iteration', 0, 3, False, False),
+	('last_iteration or stop_iteration', 0, 3, True, True),
+	('LAST_ITERATION Or Stop_Iteration', 3, 3, False, True),
+	('last_iteration', 5, 'inf', False, False),
+	('all_but_last_iteration', 10 ** 9, '.inf', False, True),
+	('last_iteration', 5, float('inf'), False, False),
+])
+def test_condition_terms(cond, it, rep, stop, expected):
+	assert compileCondition(cond)(it, rep, stop) is expected
+
+
+def test_condition_precedence():
+	# 'not' binds tighter than 'and', which binds tighter than 'or'
+	assert compileCondition('true or false and false')(0, 1) is True  # true or (false and false)
+	assert compileCondition('(true or false) and false')(0, 1) is False
+	assert compileCondition('not false and false')(0, 1) is False  # (not false) and false
+	assert compileCondition('not (false and false)')(0, 1) is True
+	assert compileCondition('not not true')(0, 1) is True
+	assert compileCondition('false or not true or true and not false')(0, 1) is True
+
+
+def test_condition_uses_stop_and_cache():
+	assert compileCondition('last_iteration or stop_iteration').uses_stop
+	assert not compileCondition('last_iteration').uses_stop
+	assert compileCondition('all') is compileCondition('all')
+
+
+@pytest.mark.parametrize('cond, message', [
+	('', 'Empty'),
+	('   ', 'Empty'),
+	('bogus', 'Unknown term "bogus"'),
+	('last_iteration or', 'Unknown term "None"'),
+	('(all or never', 'Missing ")"'),
+	('all)', 'Unexpected ")"'),
+	('all never', 'Unexpected "never"'),
+	('all and 1', 'at position'),
+	('last_iteration == 1', 'at position'),
+	('__import__', 'Unknown term'),
+])
+def test_condition_errors(cond, message):
+	with pytest.raises(RequestConfError) as e:
+		compileCondition(cond)
+	assert message in str(e.value)
+
+
+def test_condition_error_is_value_error():
+	with pytest.raises(ValueError):
+		compileCondition('bogus cond')
+
+
+def test_template_round_trip():
+	conf = loadYAML(JPL_TEMPLATE)
+	req = Request.fromDict(conf)
+	assert req.toDict() == conf
+	assert Request.fromDict(req.toDict()).toDict() == conf
+
+
+def test_round_trip_keeps_unknown_and_null_keys():
+	conf = loadYAML(JPL_TEMPLATE)
+	ser = next(iter(conf['services']))
+	conf['custom_top'] = {'a':1}
+	conf['services'][ser]['custom_key'] = [1, 2]
+	conf['services'][ser]['iterative']['custom_iter'] = 'x'
+	conf['services'][ser]['executor'] = None
+	assert Request.fromDict(conf).toDict() == conf
+
+
+def test_malformed_requests():
+	conf = loadYAML(JPL_TEMPLATE)
+	with pytest.raises(RequestConfError):
+		Request.fromDict(None)
+	bad = copy.deepcopy(conf)
+	bad['services'] = {}
+	with pytest.raises(RequestConfError):
+		Request.fromDict(bad)
+	bad = copy.deepcopy(conf)
+	ser = next(iter(bad['services']))
+	bad['services'][ser]['nifi'][0]['transfer']['condition'] = 'bogus cond'
+	with pytest.raises(RequestConfError):
+		Request.fromDict(bad)
+
+
+def test_merge_keeps_node_state():
+	conf = loadYAML(JPL_TEMPLATE)
+	req = Request.fromDict(conf)
+	ser = next(iter(conf['services']))
+	req.services[ser].iterative.cur_iter = 1
+	other = copy.deepcopy(conf)
+	other['services'][ser]['iterative']['max_rep'] = 99
+	other['services'][ser]['iterative']['cur_iter'] = 0
+	req.mergeFrom(other)
+	assert req.services[ser].iterative.max_rep == 99
+	assert req.services[ser].iterative.cur_iter == 1
+
+
+def test_merge_of_malformed_configuration_raises():
+	conf = loadYAML(JPL_TEMPLATE)
+	req = Request.fromDict(conf)
+	ser = next(iter(conf['services']))
+	other = copy.deepcopy(conf)
+	other['services'][ser]['iterative']['max_rep'] = 99
+	other['services'][ser]['nifi'][0]['transfer']['condition'] = 'bogus cond'
+	with pytest.raises(RequestConfError):
+		req.mergeFrom(other)
+	assert req.services[ser].iterative.max_rep != 99
@@ -5,20 +5,29 @@ Created on Mar 29, 2018
 @contact: shambakey1@gmail.com
 '''
 
-import yaml, time, os, sys, shutil, json, uuid, requests, traceback, select, multiprocessing, paramiko, glob
+import time, os, sys, shutil, json, uuid, requests, traceback, select, multiprocessing, paramiko, shlex, socket
 import nipyapi
 from nipyapi import canvas, templates
 from nipyapi.nifi.apis.remote_process_groups_api import RemoteProcessGroupsApi	
 from nipyapi.nifi.apis.connections_api import ConnectionsApi
 import pandas as pd
 import docker.models
-from typing import List
+from typing import List, Callable
 from zipfile import ZipFile
 from builtins import str, int
 from multiprocessing import Process
 from multiprocessing.managers import BaseManager
 from _io import TextIOWrapper
 import argparse
+from vificonf import loadYAML, dumpYAML, ConfWriter, ConfLock, fileSignature
+from vifireq import Request, RequestConfError, ResourceSpec, compileCondition
+from vifidocker import ServiceRegistry, ServiceReaper, ImageCache, AdmissionController, REQUEST_LABEL, SET_LABEL, NODE_LABEL, WORKER_LOOP, WORKER_CTL_DIR
+from vifiexec import Executor, DockerSwarmExecutor, LocalProcessExecutor
+from vififs import placeResult, copyFile, copyTree, TrashCollector, ResultIndex, TRASH_DIR
+from vifimanifest import ResultManifest, MANIFEST_NAME
+from vifianalysis import parseReqLogsParallel, analysisFrame, mergeColumns, AnalysisCache, CACHE_NAME, isCacheFile
+from vifilog import LogStore, isStoreFile, SEGMENT_SIZE, INDEX_INTERVAL, INDEX_RECORDS
+from vifiprom import PromClient, PromError, QueryCache, CACHE_SIZE
 
 
 class vifi():
@@ -37,8 +46,23 @@ class vifi():
 		# Initialize VIFI instance parameters
 		self.vifi_conf_f = ''  # Path to VIFI configuration file for current VIFI instance
 		self.vifi_conf = {}  # VIFI configuration dictionary for current VIFI instance
+		self.vifi_conf_sig = None  # Signature of the loaded VIFI configuration file. Used to reload the configuration file when it changes
 		self.req_list = {}  # Dictionary of created requests by current VIFI Node
 		self.nifi_tr_res_flows = []  # List of deployed NIFI templates to transfer results between NIFI remote sites
+		self.req_unpacking = set()  # Paths of requests currently being extracted and validated. These requests are not scheduled yet
+		self.req_validated = set()  # Paths of requests that have passed validation, so they are not re-examined by the scheduler
+		self.conf_writer = ConfWriter()  # Write-behind persistence of requests configuration files
+		self.ser_registry = ServiceRegistry()  # Index of existing (Docker) services by name, request and set
+		self.image_cache = ImageCache()  # Background pre-pull of allowed images
+		self.reaper = ServiceReaper(self.ser_registry)  # Background removal of finished and orphaned services
+		self.node_name = socket.gethostname()  # Name of this VIFI Node. Recorded in the labels of created services, so that the reaper sweeps only services of this VIFI Node
+		self.managed_sets = set()  # Sets run by this VIFI Node. The reaper sweeps only services of these sets
+		self.admission = AdmissionController()  # Resource-aware admission of services
+		self.local_executor = LocalProcessExecutor()  # Runs services as local processes for sets that allow the 'local' executor
+		self.trash = TrashCollector()  # Background deletion of removed files and directories
+		self.log_store = None  # Append-only store of request logs under the request log path, if enabled
+		self.prom_clients = {}  # Prometheus clients (i.e., pooled sessions) by API url and user
+		self.prom_caches = {}  # On-disk caches of Prometheus range queries by cache path
 		self.stop = False  # If TRUE, the current VIFI instance stops
 			
 		# Load VIFI configuration file
@@ -58,6 +82,11 @@ class vifi():
 		'''
 		
 		self.stop = True
+		self.ser_registry.end()
+		self.reaper.end()
+		self.trash.end()
+		if self.log_store:
+			self.log_store.flush()
 	
 	def dump_conf(self, conf:dict, outfile:str, flog:TextIOWrapper=None) -> None:
 		''' Dumps configuration dictionary into the required YAML file
@@ -75,8 +104,7 @@ class vifi():
 			elif not outfile:
 				print('Error: No file specified to dump the configuration')
 			else:
-				with open(outfile, 'w') as f:
-					yaml.dump(conf, f, default_flow_style=False)
+				dumpYAML(conf, outfile)
 					
 		except:
 			result = 'Error: "dump_conf" function has error(vifi_server): '
@@ -99,8 +127,7 @@ class vifi():
 	
 		try:
 			if infile and os.path.isfile(infile):
-				with open(infile, 'r') as f:
-					return yaml.load(f)
+				return loadYAML(infile)
 			else:
 				print('Error: No user configuration file is specified')
 		except:
@@ -146,6 +173,50 @@ class vifi():
 				print(result)
 				traceback.print_exc()
 	
+	def promClient(self, prom_path:str, uname:str, upass:str, workers:int=None, retries:int=None, cache_path:str=None, \
+				cache_size:int=None, chunk_points:int=None) -> PromClient:
+		''' Return the Prometheus client of a Prometheus API url and user. Clients are kept, so their connections are reused across queries
+		@param prom_path: Prometheus API url
+		@type prom_path: str  
+		@param uname: Prometheus username
+		@type uname: str
+		@param upass: Prometheus password
+		@type upass: str
+		@param workers: Maximum number of parallel queries. Defaults to vifiprom.PROM_WORKERS
+		@type workers: int
+		@param retries: Number of times a failed query is retried. Defaults to vifiprom.PROM_RETRIES
+		@type retries: int
+		@param cache_path: Directory of the on-disk cache of range queries. If not specified, range queries are not cached
+		@type cache_path: str
+		@param cache_size: Maximum size (in bytes) of the cache. Defaults to vifiprom.CACHE_SIZE
+		@type cache_size: int
+		@param chunk_points: Number of points of each cached chunk. Defaults to vifiprom.CHUNK_POINTS
+		@type chunk_points: int
+		@return: Prometheus client
+		@rtype: PromClient
+		'''
+		
+		key = (prom_path, uname, upass)
+		client = self.prom_clients.get(key)
+		if not client:
+			client = self.prom_clients[key] = PromClient(prom_path, uname, upass)
+		if workers:
+			client.setWorkers(workers)
+		if retries is not None:
+			client.retries = retries
+		if cache_path:
+			cache = self.prom_caches.get(cache_path)
+			if not cache:
+				cache = self.prom_caches[cache_path] = QueryCache(cache_path, cache_size or CACHE_SIZE)
+			elif cache_size:
+				cache.max_bytes = cache_size
+			client.cache = cache
+		else:
+			client.cache = None
+		if chunk_points:
+			client.chunk_points = chunk_points
+		return client
+	
 	def getPromMetricsNames(self, prom_path:str, uname:str, upass:str, fname:str, fname_path:str, flog:TextIOWrapper=None) -> List[str]:
 		''' Retrive Prometheus metrics names and write them to output file if required in JSON structure 
 		@param prom_path: Prometheus API url
@@ -165,16 +236,15 @@ class vifi():
 		'''
 		
 		try:
-			metrics_req = requests.get(prom_path + "label/__name__/values", auth=(uname, upass))
 			metrics_names = []  # List containing 
-			if metrics_req.ok:  # Check Prometheus can be contacted
-				metrics_names = metrics_req.json()['data']
-				if not metrics_names:  # Check metrics names is not empty
-					print('Prometheus has no metrics')
-					sys.exit()
-			else:
+			try:  # Check Prometheus can be contacted
+				metrics_names = self.promClient(prom_path, uname, upass).metricNames()
+			except PromError:
 				print("Could not get metrics names from Prometheus")
 				sys.exit()
+			if not metrics_names:  # Check metrics names is not empty
+				print('Prometheus has no metrics')
+				sys.exit()
 				
 			if fname:  # Dump metrics names as a JSON file if a JSON file path is provided
 				with open(os.path.join(fname_path, fname), 'w') as f:
@@ -212,10 +282,12 @@ class vifi():
 				traceback.print_exc()
 	
 	def getMetricsValues(self, m:List[str], start_t:float, end_t:float, prom_path:str, step:int, uname:str, upass:str, \
-						write_to_file:bool, fname:str, fname_path:str, flog:TextIOWrapper=None) -> dict:
+						write_to_file:bool, fname:str, fname_path:str, workers:int=None, batch:int=None, retries:int=None, \
+						cache_path:str=None, cache_size:int=None, chunk_points:int=None, flog:TextIOWrapper=None) -> dict:
 		''' Get specified metric values for specified duration if start and end times of duration are specified. If either \
 		start or end times are not specified, then query is done only at the time instance that is specified by either of \
 		them.
+		@note: Metrics are queried in parallel through a pooled session (see vifiprom.PromClient). Long ranges are split into chunks, and complete chunks are cached on disk if @cache_path is specified
 		@param m: Metrics names
 		@type m: List[str] 
 		@param prom_path: Prometheus API url 
@@ -236,6 +308,18 @@ class vifi():
 		@type fname: str
 		@param fname_path: Path of @fname. Defaults to current directory
 		@type fname_path: str
+		@param workers: Maximum number of parallel queries. Defaults to vifiprom.PROM_WORKERS
+		@type workers: int
+		@param batch: Number of metrics combined into one query (i.e., a regex selector on the metric name). Defaults to 1 (i.e., one query per metric)
+		@type batch: int
+		@param retries: Number of times a failed query is retried. Defaults to vifiprom.PROM_RETRIES
+		@type retries: int
+		@param cache_path: Directory of the on-disk cache of range queries. If not specified, range queries are not cached
+		@type cache_path: str
+		@param cache_size: Maximum size (in bytes) of the cache. Defaults to vifiprom.CACHE_SIZE
+		@type cache_size: int
+		@param chunk_points: Number of points of each cached chunk. Defaults to vifiprom.CHUNK_POINTS
+		@type chunk_points: int
 		@param flog: Log file to record raised events
 		@type flog: TextIOWrapper (file object)   
 		@return: Metric(vifi_server) values for the specified time interval at the specified steps, or at a specific time instance
@@ -244,7 +328,6 @@ class vifi():
 		# TODO: If start_t is not specified, then start query from the earliest possible timedate. But this depeneds on how long Prometheus stores data series, and the incremental step
 		
 		try:
-			res = None
 			res_values = {}  # Initial metric values is empty
 		
 			if start_t and not end_t:
@@ -257,12 +340,10 @@ class vifi():
 				print("Error: start time cannot be greater than end time to collect metric data")
 				sys.exit()
 				
-			for mi in m:
-				res = requests.get(prom_path + "query_range", auth=(uname, upass), params={'query':mi, 'start':start_t, 'end':end_t, 'step':step})
-				if res.ok:  # Check Prometheus can be contacted for current metric
-					res_values[mi] = res.json()['data']['result']
-				else:
-					res_values[mi] = "Error: cannot contact Prometheus for metric " + mi
+			# Query all metrics in parallel. Metrics whose queries fail get an error message instead of their values
+			client = self.promClient(prom_path, uname, upass, workers=workers, retries=retries, cache_path=cache_path, \
+									cache_size=cache_size, chunk_points=chunk_points)
+			res_values = client.queryMetrics(m, start_t, end_t, step, batch=batch)
 					
 			if write_to_file:
 				if fname:  # Dump metric values as a JSON file if one is provided
@@ -311,8 +392,8 @@ class vifi():
 		try:
 			if conf_f and os.path.isfile(conf_f):  # Check the existence of the general VIFI configuration file
 				self.vifi_conf_f = conf_f
-				with open(conf_f, 'r') as f:
-					self.vifi_conf = yaml.load(f)
+				self.vifi_conf_sig = fileSignature(conf_f)
+				self.vifi_conf = loadYAML(conf_f)
 			else:
 				if not self.vifi_conf:
 					print('Error: could not find VIFI general configuration')
@@ -343,6 +424,32 @@ class vifi():
 			log_path_mode = self.vifi_conf['domains']['log_path']['mode']  # Mode for logs folder
 			log_path_exist = self.vifi_conf['domains']['log_path']['exist_ok']  # If true, use already existing folder if one exists
 			
+			# Persistence policy of requests configuration files (i.e., when pending updates are written, and whether they are flushed to disk)
+			conf_persistence = self.vifi_conf['domains'].get('conf_persistence') or {}
+			self.conf_writer.flush()
+			self.conf_writer = ConfWriter(flush_points=conf_persistence.get('flush_points'), fsync=bool(conf_persistence.get('fsync', False)))
+			
+			# Interval between sweeps of orphaned services by the service reaper
+			reaper_conf = self.vifi_conf['domains'].get('reaper') or {}
+			self.reaper.sweep_int = reaper_conf.get('sweep_int', 60)
+			self.node_name = str(reaper_conf.get('node') or socket.gethostname())
+			
+			# Append-only store of request logs. If not enabled, one YAML file is written per request
+			log_store_conf = self.vifi_conf.get('req_log_store') or {}
+			if log_store_conf.get('enabled') and self.vifi_conf.get('req_log_path'):
+				if not self.log_store or self.log_store.root != os.path.abspath(self.vifi_conf['req_log_path']):
+					if self.log_store:
+						self.log_store.flush()
+					self.log_store = LogStore(self.vifi_conf['req_log_path'])
+				self.log_store.segment_size = int(log_store_conf.get('segment_size') or SEGMENT_SIZE)
+				self.log_store.compress = bool(log_store_conf.get('compress', True))
+				self.log_store.index_interval = float(log_store_conf.get('index_interval', INDEX_INTERVAL))
+				self.log_store.index_records = int(log_store_conf.get('index_records') or INDEX_RECORDS)
+			else:
+				if self.log_store:
+					self.log_store.flush()
+				self.log_store = None
+			
 			# req_res_path_per_request=self.vifi_conf['domains']['req_res_path_per_request']['name']	# Path to intermediate results folder within each domain
 			# req_res_path_per_request_mode=self.vifi_conf['domains']['req_res_path_per_request']['mode']	# Mode for logs folder
 			# req_res_path_per_request_exist=self.vifi_conf['domains']['req_res_path_per_request']['exist_ok']	# If true, use already existing folder if one exists
@@ -361,6 +468,14 @@ class vifi():
 				os.makedirs(os.path.join(root_script_path, self.vifi_conf['domains']['sets'][d]['name'], request_path_failed), exist_ok=request_path_failed_exist)
 				os.makedirs(os.path.join(root_script_path, self.vifi_conf['domains']['sets'][d]['name'], log_path), exist_ok=log_path_exist)
 				# os.makedirs(os.path.join(root_script_path,self.vifi_conf['domains']['sets'][d]['name'],req_res_path_per_request),exist_ok=req_res_path_per_request_exist)	
+			
+			# Pre-pull the allowed images of all sets in the background, so that image pulls are not part of the start time of services
+			images = []
+			for d in self.vifi_conf['domains']['sets'].values():
+				if d.get('docker') and d['docker'].get('prepull', True) and d['docker'].get('docker_img'):
+					images.extend([x for x in d['docker']['docker_img'] if x.lower() != 'any' and x not in images])
+			if images:
+				self.image_cache.prefetch(images, flog=flog)
 
 		except:
 			result = 'Error: "loadVIFIConf" function has error(vifi_server): '
@@ -371,17 +486,25 @@ class vifi():
 				print(result)
 				traceback.print_exc()	
 			
-	def checkServiceComplete(self, client:docker.client.DockerClient, service_name:str, task_num_in:int, ttl:int=3600, \
-							flog:TextIOWrapper=None) -> bool:
-		''' Check if specified Docker service has finished currently or within specified time threshold
-		@param client: Client connection to Docker Engine
-		@type client: client connection
+	def checkServiceComplete(self, executor:Executor, service_name:str, task_num_in:int, ttl:int=3600, \
+							retries:int=0, on_task_complete:Callable=None, flog:TextIOWrapper=None) -> bool:
+		''' Check if specified Docker service has finished currently or within specified time threshold. Tasks are tracked 
+		per slot: a slot is complete when its latest task is complete, and the service fails as soon as the tasks of any 
+		slot have failed (i.e., 'failed' or 'rejected') more than the allowed retries. Tasks that are shut down or orphaned
+		(e.g., replaced by Swarm when it reschedules a task) are not failures. Errors of reading the tasks (e.g., a
+		transient error of the Docker API) are logged, and the tasks are read again at the next poll until @ttl passes
+		@param executor: Executor of the service (e.g., Docker Swarm)
+		@type executor: Executor
 		@param service_id: Required Service ID whose status is to be checked
 		@type service_id: str
 		@param task_num: Number of tasks (i.e., replicas) within the service
 		@type task_num: int
-		@param ttl: Time threshold after which, the service is considered NOT complete
+		@param ttl: Time threshold (in seconds) after which, the service is considered NOT complete
 		@type ttl: int  
+		@param retries: Number of allowed failures of each task (i.e., restarts by Docker) before the service is considered failed
+		@type retries: int
+		@param on_task_complete: Function called with the slot number of each task as soon as the task completes (i.e., before the other tasks complete)
+		@type on_task_complete: function
 		@param flog: Log file to record raised events
 		@type flog: TextIOWrapper (file object) 
 		@return: True if all tasks of required service are complete. Otherwise, false
@@ -390,18 +513,45 @@ class vifi():
 		
 		# ## Checks if each task in task_num has completed
 		try:
-			while ttl:
+			deadline = time.time() + ttl
+			notified = set()  # Slots whose completion has been passed to @on_task_complete
+			while time.time() < deadline:
 				try:
-					ser = client.services.get(service_name)
-					task_num = task_num_in
-					for t in ser.tasks():
-						if t["Status"]["State"] == "complete":
-							task_num -= 1
-					if task_num == 0:
-						return True
+					tasks = executor.tasks(service_name)
 				except:
-					ttl -= 1
-				time.sleep(1)
+					tasks = None
+					result = 'Error: "checkServiceComplete" function could not read the tasks of service ' + service_name + '(vifi_server): '
+					if flog:
+						flog.write(result)
+						traceback.print_exc(file=flog)
+					else:
+						print(result)
+						traceback.print_exc()
+				if tasks is not None:
+					failures = {}  # Number of failed tasks of each slot
+					latest = {}  # Latest task of each slot
+					for t in tasks:
+						slot = t.get('Slot')
+						if slot not in latest or t['Version']['Index'] > latest[slot]['Version']['Index']:
+							latest[slot] = t
+						if t['Status']['State'] in ('failed', 'rejected'):
+							failures[slot] = failures.get(slot, 0) + 1
+							if failures[slot] > retries:
+								if flog:
+									flog.write("Error: Task " + str(slot) + " of service " + service_name + " is " + t['Status']['State'] + " (" + \
+											str(t['Status'].get('Err', t['Status'].get('Message', ''))) + ") after " + str(retries) + " retries at " + str(time.time()) + "\n")
+								return False
+					complete = [x for x, t in latest.items() if t['Status']['State'] == 'complete']  # Slots whose latest task is complete
+					if on_task_complete:
+						for x in complete:
+							if x not in notified:
+								notified.add(x)
+								on_task_complete(x)
+					if len(complete) >= task_num_in:
+						return True
+				time.sleep(executor.poll_interval)
+			if flog:
+				flog.write("Error: Service " + service_name + " did not complete within " + str(ttl) + " seconds at " + str(time.time()) + "\n")
 			return False
 		except:
 			result = 'Error: "checkServiceComplete" function has error(vifi_server): '
@@ -504,13 +654,14 @@ class vifi():
 				print(result)
 				traceback.print_exc()
 			
-	def createUserService(self, client:docker.client.DockerClient, service_name:str, docker_rep:int, script_path_in:str, request:str, container_dir:str, \
+	def createUserService(self, executor:Executor, service_name:str, docker_rep:int, script_path_in:str, request:str, container_dir:str, \
 						data_dir:dict, user_data_dir:dict, work_dir:str, script:str, docker_img:str, docker_cmd:str, ttl,
-						user_args:List[str]=[], user_envs:List[str]=None, user_mnts:List[str]=None, user=None, groups=None, flog:TextIOWrapper=None) -> docker.models.services.Service:
+						user_args:List[str]=[], user_envs:List[str]=None, user_mnts:List[str]=None, user=None, groups=None, dset:str=None, \
+						worker_ctl:str=None, resources:ResourceSpec=None, retries:int=0, flog:TextIOWrapper=None):
 		''' Create request service with required configurations (e.g., required mounts, environment variables, command, 
-		arguments ... etc). Currently, service is created as docker service
-		@param client: Client connection to docker enginer
-		@type client: docker.client.DockerClient
+		arguments ... etc). The service is created by the specified executor (e.g., as a Docker service, or as local processes)
+		@param executor: Executor of the service
+		@type executor: Executor
 		@param service_name: Required service name
 		@type service_name: str
 		@param docker_rep: Number of service tasks
@@ -545,10 +696,18 @@ class vifi():
 		@type user: str
 		@param groups: The groups to run the container
 		@type groups: List[str]  
+		@param dset: Set (i.e., (sub)workflow) of the request. Recorded, with the request, as labels of the service
+		@type dset: str
+		@param worker_ctl: If specified, the service is created as a persistent worker whose tasks run the user command once 
+		per iteration signaled through control files in this directory (relative to the request folder). See WORKER_LOOP
+		@type worker_ctl: str
+		@param resources: CPU and memory reservations of each task, if any
+		@type resources: ResourceSpec
+		@param retries: Number of times Docker restarts a failed task. If 0, failed tasks are not restarted
+		@type retries: int
 		@param flog: Log file object to record raised events
 		@type flog: TextIOWrapper (file object)
-		@return: Required service
-		@rtype: docker.models.services.Service    
+		@return: Required service, as returned by the executor (e.g., docker.models.services.Service)
 		'''
 		try:
 			envs = ['MY_TASK_ID={{.Task.Name}}', 'SCRIPTFILE=' + script, 'ttl=' + str(ttl)]  # Initialize list of environment variables
@@ -580,10 +739,23 @@ class vifi():
 			if not groups:
 				groups = [str(os.getgid())]
 				
-			# Now, create the required (docker) service, and return it
-			return client.services.create(name=service_name, mode={'Replicated':{'Replicas':docker_rep}}, restart_policy=\
-								{'condition':'on-failure'}, mounts=mnts, workdir=work_dir, env=envs, image=docker_img, \
-								command=docker_cmd + ' ' + script, args=[str(i) for i in user_args], user=user, groups=groups)
+			# A persistent worker runs the user command inside the worker loop, once for each signaled iteration
+			command = docker_cmd + ' ' + script
+			args = [str(i) for i in user_args]
+			if worker_ctl:
+				envs.extend(['TASK_SLOT={{.Task.Slot}}', 'VIFI_CTL=' + os.path.join(container_dir, worker_ctl)])
+				args = [WORKER_LOOP, 'vifi_worker'] + shlex.split(command) + args
+				command = 'sh -c'
+				
+			# Label the service with its request and set, so VIFI services can be found without knowing their names
+			labels = {REQUEST_LABEL:request, NODE_LABEL:self.node_name}
+			if dset:
+				labels[SET_LABEL] = dset
+				
+			# Now, create the required service by the executor, and return it. CPUs and memory of each task are reserved, if specified, so that tasks are placed only where there are enough free resources
+			return executor.create(service_name, docker_rep, docker_img, command, args, envs, mnts, work_dir=work_dir, user=user, \
+								groups=groups, labels=labels, nano_cpus=resources.nano_cpus if resources else 0, \
+								mem_bytes=max(resources.memBytes(), 0) if resources else 0, retries=retries)
 		except:
 			result = 'Error: "createUserService" function has error(vifi_server): '
 			if flog:
@@ -623,7 +795,7 @@ class vifi():
 					
 					# Check if service is complete. Note that we do not have to wait for the previous service ttl to check
 					# completeness because the previous service should have already completed. Thus, the ttl is passed as 0
-					if not self.checkServiceComplete(client, ser, ser.attrs['Spec']['Mode']['Replicated']['Replicas'], 0):
+					if not self.checkServiceComplete(DockerSwarmExecutor(client), ser, ser.attrs['Spec']['Mode']['Replicated']['Replicas'], 0):
 						return False
 			
 			return True
@@ -724,15 +896,15 @@ class vifi():
 				print(result)
 				traceback.print_exc()
 	
-	def checkSerName(self, ser:str='', iter_no:int=0, client:docker.client.DockerClient=None, flog:TextIOWrapper=None) -> str:
+	def checkSerName(self, ser:str='', iter_no:int=0, executor:Executor=None, flog:TextIOWrapper=None) -> str:
 		''' Check if required service name is unique. In case of iterative service, a modified service name is returned.
 		@todo: Currently, if service name is not unique, the new service is revoked. In the future, a new name should be assigned to the service  
 		@param ser: Service name to check its uniqueness
 		@type ser: str
 		@param iter_no: The current iteration number of current iterative service. Defaults to 1 which means the service is either not iterative or in the last iteration
 		@type iter_no: int  
-		@param client: Client connection to docker engine
-		@type client: docker.client.DockerClient
+		@param executor: Executor of the service
+		@type executor: Executor
 		@param flog: Log file to record raised events
 		@type flog: TextIOWrapper (file object) 
 		@return: Unique service name, or None if impossible to get a unique service name
@@ -740,11 +912,10 @@ class vifi():
 		'''
 		
 		try:
-			# Check if service name already exists
+			# Check if service name already exists (e.g., the Docker executor uses the service registry if it follows Docker services. Otherwise, it asks Docker for services with the same name)
 			ser = self.getSerName(ser, iter_no, flog)
-			for x in client.services.list():
-				if ser in x.name:
-					return None
+			if executor.exists(ser):
+				return None
 			
 			return ser
 
@@ -794,10 +965,11 @@ class vifi():
 				print(result)
 				traceback.print_exc()
 	
-	def delService(self, client:docker.client.DockerClient, ser_name:str, term_time:str, flog:TextIOWrapper=None) -> None:
-		''' Deletes specified service after specified termination time
-		@param client: Docker client connection
-		@type client: docker.client.DockerClient 
+	def delService(self, executor:Executor, ser_name:str, term_time:str, flog:TextIOWrapper=None) -> None:
+		''' Deletes specified service after specified termination time (in seconds), or keeps it if the termination time is 'inf'.
+		Services of the local executor are removed directly, as their finished processes have nothing left to keep
+		@param executor: Executor of the service
+		@type executor: Executor 
 		@param ser_name: Service name 
 		@type ser_name: str
 		@param term_time: Termination time after which the specified service is removed
@@ -806,10 +978,14 @@ class vifi():
 		@type flog: TextIOWrapper (file object)   
 		'''
 		
-		# TODO: Currently, this function either directly removes the service, or leaves it indefinitely. In the future, there should be a separate thread (such that other requests are not delayed until the specified service is removed) to monitor services and remove them according to specified termination time.
+		# A service without termination time (i.e., 0) is removed directly. Otherwise, the service is removed by the service reaper after the termination time, so the caller does not wait for the removal. If the reaper is not running, then the service is removed directly
 		try:
-			if term_time != 'inf':
-				client.services.get(ser_name).remove()
+			if executor.kind != 'docker' or str(term_time).lower() not in ('inf', '.inf', 'none') and float(term_time) <= 0:
+				executor.remove(ser_name)
+			elif self.reaper.running:
+				self.reaper.schedule(ser_name, term_time)
+			elif term_time != 'inf':
+				executor.remove(ser_name)
 		except:
 			result = 'Error: "delService" function has error(vifi_server): '
 			if flog:
@@ -819,10 +995,316 @@ class vifi():
 				print(result)
 				traceback.print_exc()
 	
+	def waitAdmission(self, client:docker.client.DockerClient, service_name:str, task_num:int, resources:ResourceSpec=None, \
+					ttl:int=3600, flog:TextIOWrapper=None) -> int:
+		''' Wait until the service is admitted by the admission controller (i.e., there are enough free resources for its tasks), or the time threshold passes
+		@param client: Docker client connection
+		@type client: docker.client.DockerClient 
+		@param service_name: Service name
+		@type service_name: str
+		@param task_num: Required number of tasks
+		@type task_num: int
+		@param resources: CPU and memory reservations of each task. If None, the service is admitted directly
+		@type resources: ResourceSpec
+		@param ttl: Time threshold after which, the service is considered NOT admitted
+		@type ttl: int
+		@param flog: Log file to record raised events
+		@type flog: TextIOWrapper (file object)
+		@return: Number of admitted tasks (which can be less than @task_num if the service can shrink), or 0 if the service is not admitted
+		@rtype: int
+		'''
+		
+		if not resources:
+			return task_num
+		deadline = time.time() + ttl
+		while True:
+			admitted = self.admission.admit(client, service_name, task_num, resources.nano_cpus, resources.memBytes(), \
+										min(resources.min_tasks or task_num, task_num), flog)
+			if admitted or time.time() >= deadline or self.stop:
+				return admitted
+			time.sleep(1)
+	
+	def taskResults(self, results, slot:int=None):
+		''' Split results of a service with per task results. Result patterns that contain the task slot placeholder ({{.Task.Slot}}) belong to individual tasks
+		@param results: Result patterns (either a list, or a dictionary whose keys are result patterns)
+		@type results: list or dict
+		@param slot: Task slot. If specified, return the result patterns of this task (with the placeholder replaced by the slot). Otherwise, return the result patterns that do not belong to individual tasks
+		@type slot: int
+		@return: Result patterns, in the same form as @results
+		@rtype: list or dict
+		'''
+		
+		if not results:
+			return results
+		token = '{{.Task.Slot}}'
+		if slot is None:
+			keep, sub = lambda x: token not in str(x), lambda x: x
+		else:
+			keep, sub = lambda x: token in str(x), lambda x: str(x).replace(token, str(slot))
+		if isinstance(results, dict):
+			return {sub(k):v for k, v in results.items() if keep(k)}
+		return [sub(x) for x in results if keep(x)]
+	
+	def processTaskResults(self, ser_conf, slot:int, servs:dict, ser:str, req_path:str, res_path:str, dset:str, \
+						manifest:ResultManifest=None, flog:TextIOWrapper=None) -> None:
+		''' Act upon the results of one task of a service with per task results as soon as the task completes (i.e., 
+		without waiting for the other tasks of the service), then transfer them to the destinations whose transfer 
+		conditions hold for the finishing iteration
+		@param ser_conf: Service configuration
+		@type ser_conf: ServiceSpec
+		@param slot: Slot of the completed task
+		@type slot: int
+		@param servs: Services status of the request
+		@type servs: dict
+		@param ser: Service name as specified in the user configuration file
+		@type ser: str
+		@param req_path: Path of the request folder
+		@type req_path: str
+		@param res_path: Path of the results folder of the request
+		@type res_path: str
+		@param dset: Set (i.e., (sub)workflow) of the request
+		@type dset: str
+		@param manifest: Manifest of the results folder of the request. It is updated by the transfers of the results of the task, if any
+		@type manifest: ResultManifest
+		@param flog: Log file to record raised events
+		@type flog: TextIOWrapper (file object)
+		'''
+		
+		try:
+			index = ResultIndex()  # Result directories are listed once for all result patterns of the task
+			res = self.taskResults(ser_conf.results, slot)
+			if res:
+				self.actOnResults(conf=res, res_cur_dir=req_path, res_dest_dir=res_path, trash_dir=self.getTrashPath(dset), index=index, flog=flog)
+			
+			# Transfer conditions are checked against the iteration that is finishing
+			servs_fin = dict(servs)
+			servs_fin[ser] = dict(servs[ser], cur_iter=servs[ser]['cur_iter'] + 1)
+			if ser_conf.s3.results and ser_conf.s3.conf['bucket']:
+				sec = dict(ser_conf.s3.conf, results=self.taskResults(ser_conf.s3.results, slot))
+				if sec['results'] and self.checkTransfer(sec['transfer'], servs_fin, ser, req_path, flog):
+					self.s3Transfer(sec, res_path, index, manifest, flog)
+					flog.write("Transfered results of task " + str(slot) + " to S3 bucket at " + repr(time.time()) + "\n")
+			for spec in ser_conf.nifi or []:
+				sec = dict(spec.conf, results=self.taskResults(spec.results, slot))
+				if sec['results'] and self.checkTransfer(sec['transfer'], servs_fin, ser, req_path, flog):
+					res_name = self.nifiTransfer(user_nifi_conf=sec, data_path=res_path, res_id=str(uuid.uuid1()), pg_name=dset, \
+												tr_res_temp_name='tr_res_temp', index=index, manifest=manifest, flog=flog)
+					flog.write("Results of task " + str(slot) + " transfer by NIFI " + ("succeeded" if res_name else "failed") + " at " + repr(time.time()) + "\n")
+			for spec in ser_conf.sftp or []:
+				sec = dict(spec.conf, results=self.taskResults(spec.results, slot))
+				if sec['results'] and self.checkTransfer(sec['transfer'], servs_fin, ser, req_path, flog):
+					res_sftp = self.sftpTransfer(user_sftp_conf=sec, data_path=res_path, index=index, flog=flog)
+					flog.write("Transfer of results of task " + str(slot) + " to SFTP Server " + str(sec['host']) + (" succeeded" if res_sftp else " failed") + " at " + repr(time.time()) + "\n")
+		except:
+			result = 'Error: "processTaskResults" function has error(vifi_server): '
+			if flog:
+				flog.write(result)
+				traceback.print_exc(file=flog)
+			else:
+				print(result)
+				traceback.print_exc()
+	
+	def updateManifest(self, manifest:ResultManifest, index:ResultIndex=None, md5:bool=False, paths:list=None, flog:TextIOWrapper=None) -> None:
+		''' Update the manifest of the results folder of a request with the results of the current iteration, and write it to the results folder.
+		Called by the transfers when they fire, with the files they ship, so the manifest is not built for results that are not transferred
+		@param manifest: Manifest of the results folder
+		@type manifest: ResultManifest
+		@param index: Index of the result directories of the current iteration
+		@type index: ResultIndex
+		@param md5: If True, the MD5 digests of results (used by S3) are computed as well
+		@type md5: bool
+		@param paths: Files and directories to update (see vifimanifest.ResultManifest.build). The whole results folder is updated if not specified
+		@type paths: list
+		@param flog: Log file to record raised events
+		@type flog: TextIOWrapper (file object)
+		'''
+		
+		try:
+			manifest.build(index, md5, paths=paths)
+			written = manifest.dump()
+			if index:
+				index.changed(written)
+		except:
+			result = 'Error: "updateManifest" function has error(vifi_server): '
+			if flog:
+				flog.write(result)
+				traceback.print_exc(file=flog)
+			else:
+				print(result)
+				traceback.print_exc()
+	
+	def getManagedSets(self) -> set:
+		''' Return the sets run by the VIFI Node. Used by the service reaper, so that services of other sets are not swept '''
+		
+		return set(self.managed_sets)
+	
+	def getActiveRequests(self) -> set:
+		''' Return the requests currently being processed by the VIFI Node. Used by the service reaper to find orphaned services '''
+		
+		return set(self.req_list.keys())
+	
+	def getTermTime(self, dset:str):
+		''' Return the termination time of services of the specified set, or 'inf' if the set does not exist. Used by the service reaper '''
+		
+		try:
+			return self.vifi_conf['domains']['sets'][dset]['terminate']
+		except (KeyError, TypeError):
+			return 'inf'
+	
+	def runWorkerIteration(self, ctl_path:str, worker_iter:int, flog:TextIOWrapper=None) -> bool:
+		''' Signal the tasks of a persistent worker service to run the next iteration
+		@param ctl_path: Control directory of the persistent worker
+		@type ctl_path: str
+		@param worker_iter: Iteration number of the worker (i.e., number of iterations already signaled to the worker)
+		@type worker_iter: int
+		@param flog: Log file to record raised events
+		@type flog: TextIOWrapper (file object)
+		@return: True if the iteration has been signaled. Otherwise, False
+		@rtype: bool
+		'''
+		
+		try:
+			os.makedirs(ctl_path, exist_ok=True)
+			with open(os.path.join(ctl_path, 'iter.' + str(worker_iter) + '.run'), 'w') as f:
+				f.write(repr(time.time()))
+			return True
+		except:
+			result = 'Error: "runWorkerIteration" function has error(vifi_server): '
+			if flog:
+				flog.write(result)
+				traceback.print_exc(file=flog)
+			else:
+				print(result)
+				traceback.print_exc()
+			return False
+	
+	def checkWorkerIteration(self, ctl_path:str, worker_iter:int, task_num:int, ttl:int=3600, poll:float=0.01, \
+							on_task_complete:Callable=None, executor:Executor=None, worker_name:str=None, retries:int=0, \
+							flog:TextIOWrapper=None) -> bool:
+		''' Check if all tasks of a persistent worker service have finished the specified iteration within the specified time threshold
+		@param ctl_path: Control directory of the persistent worker
+		@type ctl_path: str
+		@param worker_iter: Iteration number of the worker
+		@type worker_iter: int
+		@param task_num: Number of tasks (i.e., replicas) within the worker service
+		@type task_num: int
+		@param ttl: Time threshold after which, the iteration is considered NOT complete
+		@type ttl: int
+		@param poll: Time (in seconds) between checks of the control directory
+		@type poll: float
+		@param on_task_complete: Function called with the slot number of each task as soon as the task finishes the iteration successfully
+		@type on_task_complete: function
+		@param executor: Executor of the worker service. If specified, the tasks of the worker are checked (see @workerFailure), so that a crashed worker fails the iteration at once
+		@type executor: Executor
+		@param worker_name: Service name of the persistent worker
+		@type worker_name: str
+		@param retries: Number of allowed failures of each task of the worker
+		@type retries: int
+		@param flog: Log file to record raised events
+		@type flog: TextIOWrapper (file object)
+		@return: True if all tasks finished the iteration successfully. Otherwise, False
+		@rtype: bool
+		'''
+		
+		try:
+			deadline = time.time() + ttl
+			done = {}  # Exit code of the user command of each task slot
+			next_check = time.time()  # Next time to check the tasks of the worker
+			while time.time() < deadline:
+				for slot in range(1, task_num + 1):
+					if slot not in done and os.path.isfile(os.path.join(ctl_path, 'done.' + str(worker_iter) + '.' + str(slot))):
+						with open(os.path.join(ctl_path, 'done.' + str(worker_iter) + '.' + str(slot)), 'r') as f:
+							done[slot] = f.read().strip()
+						if on_task_complete and done[slot] == '0':
+							on_task_complete(slot)
+				if len(done) == task_num:
+					return all(x == '0' for x in done.values())
+				if executor and worker_name and time.time() >= next_check:
+					next_check = time.time() + executor.poll_interval
+					try:
+						reason = self.workerFailure(executor, worker_name, retries)
+					except Exception:  # Transient errors (e.g., of the Docker API) are tolerated until the deadline
+						reason = ''
+					if reason:
+						if flog:
+							flog.write("Error: Persistent worker " + worker_name + " failed during iteration " + str(worker_iter) + ": " + reason + " at " + str(time.time()) + "\n")
+						return False
+				time.sleep(poll)
+			return False
+		except:
+			result = 'Error: "checkWorkerIteration" function has error(vifi_server): '
+			if flog:
+				flog.write(result)
+				traceback.print_exc(file=flog)
+			else:
+				print(result)
+				traceback.print_exc()
+			return False
+	
+	def workerFailure(self, executor:Executor, worker_name:str, retries:int=0) -> str:
+		''' Check the tasks of a persistent worker service. A worker can no longer run iterations if its service does not
+		exist, if the tasks of any slot have failed more than the allowed retries, or if the latest task of any slot has
+		exited (the worker loop only exits when it is stopped)
+		@param executor: Executor of the worker service
+		@type executor: Executor
+		@param worker_name: Service name of the persistent worker
+		@type worker_name: str
+		@param retries: Number of allowed failures of each task
+		@type retries: int
+		@return: The reason why the worker can no longer run iterations, or an empty string if it can
+		@rtype: str
+		'''
+		
+		tasks = executor.tasks(worker_name)
+		if tasks is None:
+			return 'service does not exist'
+		failures = {}  # Number of failed tasks of each slot
+		latest = {}  # Latest task of each slot
+		for t in tasks:
+			slot = t.get('Slot')
+			if slot not in latest or t['Version']['Index'] > latest[slot]['Version']['Index']:
+				latest[slot] = t
+			if t['Status']['State'] in ('failed', 'rejected'):
+				failures[slot] = failures.get(slot, 0) + 1
+				if failures[slot] > retries:
+					return 'task ' + str(slot) + ' is ' + t['Status']['State'] + ' (' + str(t['Status'].get('Err', t['Status'].get('Message', ''))) + \
+						') after ' + str(retries) + ' retries'
+		for slot, t in latest.items():
+			if t['Status']['State'] == 'complete':
+				return 'task ' + str(slot) + ' has exited'
+		return ''
+	
+	def stopWorker(self, executor:Executor, worker_name:str, ctl_path:str, term_time:str, flog:TextIOWrapper=None) -> None:
+		''' Stop a persistent worker service. The worker loop ends after its current iteration, and the service is deleted (see @delService)
+		@param executor: Executor of the worker service
+		@type executor: Executor 
+		@param worker_name: Service name of the persistent worker
+		@type worker_name: str
+		@param ctl_path: Control directory of the persistent worker
+		@type ctl_path: str
+		@param term_time: Termination time after which the worker service is removed
+		@type term_time: str 
+		@param flog: Log file to record raised events
+		@type flog: TextIOWrapper (file object)
+		'''
+		
+		try:
+			os.makedirs(ctl_path, exist_ok=True)
+			open(os.path.join(ctl_path, 'stop'), 'w').close()
+			self.delService(executor, worker_name, term_time, flog)
+		except:
+			result = 'Error: "stopWorker" function has error(vifi_server): '
+			if flog:
+				flog.write(result)
+				traceback.print_exc(file=flog)
+			else:
+				print(result)
+				traceback.print_exc()
+	
 	def checkTransfer(self, transfer_conf:dict, servs:dict, ser:str, cond_path:str='', flog:TextIOWrapper=None) -> bool:
 		''' Check if it is required to make a transfer for current service iteration.
 		@attention: Current service iteration number is 1-based, meaning that after a service finishes, it should have incremented iteration number by 1. Thus, if the service iteration number, this means the service has accomplished 1 iteration. This information is important for comparsion between current service iteration number and the service maximum repetitions.
-		@param transfer_conf: The transfer configuration. It is a common structure between different transfer sections (e.g., s3, nifi)
+		@param transfer_conf: The transfer configuration. It is a common structure between different transfer sections (e.g., s3, nifi). The condition language is described in vifireq.compileCondition
 		@type transfer_conf: dict
 		@param servs: Dictionary of services with different parameters including current service iteration and maximum repetitions for current service
 		@type servs: dict 
@@ -838,37 +1320,11 @@ class vifi():
 		
 		try:
 			
-			# Lower case the condition string
-			cond = transfer_conf['condition'].lower()
-			
-			# Split the condition string to a list of conditions
-			cond = cond.strip().split()
-			
-			# Determine if it is required to transfer results (in current iteration)
-			cond = ['True' if x == 'all' else x for x in cond]  # If True, then transfer any results for each iteration
-
-			cond = ['False' if x == 'never' else x for x in cond]  # If True, then never transfer any results for any iteration
-
-			if servs[ser]['cur_iter'] == servs[ser]['max_rep']:  # If True, then transfer results only if it is already last iteration for current service
-				cond = ['True' if x == 'last_iteration' else x for x in cond]
-			else:
-				cond = ['False' if x == 'last_iteration' else x for x in cond]
-			
-			if servs[ser]['cur_iter'] < servs[ser]['max_rep']:  # If True, then transfer results of current service iteration only if it not the last iteration
-				cond = ['True' if x == 'all_but_last_iteration' else x for x in cond]
-			else:
-				cond = ['False' if x == 'all_but_last_iteration' else x for x in cond]
-			
-			if os.path.isfile(os.path.join(cond_path, 'stop.iterating')):  # If True, then transfer results of current service iteration only if the service stops iterations (i.e., stop.iterating file exists)
-				cond = ['True' if x == 'stop_iteration' else x for x in cond]
-			else:
-				cond = ['False' if x == 'stop_iteration' else x for x in cond]
-			
-			# Re-group the transfer condition string
-			cond = ' '.join(cond)
-			# print('DEBUG: cond: '+str(cond)+': '+str(eval(cond)))
-			# Evaluate the transfer condition string
-			return eval(cond)
+			# Compile the transfer condition (compiled conditions are cached, so each condition is compiled only once), then
+			# evaluate it. The 'stop.iterating' file is checked only if the condition depends on it
+			pred = compileCondition(transfer_conf['condition'])
+			stop = pred.uses_stop and os.path.isfile(os.path.join(cond_path, 'stop.iterating'))
+			return pred(servs[ser]['cur_iter'], servs[ser]['max_rep'], stop)
 		
 		except:
 			
@@ -880,48 +1336,49 @@ class vifi():
 				print(result)
 				traceback.print_exc()
 
-	def actOnResults(self, conf:dict, res_cur_dir:str, res_dest_dir:str, flog:TextIOWrapper=None) -> None:
+	def actOnResults(self, conf:dict, res_cur_dir:str, res_dest_dir:str, copy_mode:str=None, trash_dir:str=None, \
+					index:ResultIndex=None, flog:TextIOWrapper=None) -> None:
 		''' Act upon intermediate results after current service (iteration) finishes, and before the next 
 		service (iteration) starts. For each file, actions are executed in the given sequence. Current actions include:
 		- copy: Copies specified file from current results directory (e.g., working directory) to destination results directory. The copied file is kept in current results directory because it may be needed by future services (e.g., stop.iterating file)
 		- move: Moves specified file from current results directory (e.g., working directory) to destination results directory. The copied file should be moved because the next service (iteration) may depend on an updated version of this file. Otherwise, the next service (iteration) may start running using the outdated version. Move is the default action
+		Results are placed without rewriting their data where possible (see vififs.placeResult): moves are renames, and copies are reflinks or hardlinks, unless they cross devices
 		@param conf: Results configuration as specified in the user YAML configuration file
 		@type conf: dict
 		@param res_cur_dir: Current directory results (usually the working directory of the user's request)
 		@type res_cur_dir: str
 		@param res_dest_dir: Target directory for results (usually a sub-folder named 'results' under the working directory of the user's request folder)
 		@type res_dest_dir: str
+		@param copy_mode: How results are copied (i.e., 'auto', 'reflink', 'hardlink' or 'copy'). Defaults to the 'copy_mode' of the results folder in the VIFI configuration, or 'auto'
+		@type copy_mode: str
+		@param trash_dir: If specified, replaced result directories are moved to this trash directory (see vififs.TrashCollector), instead of being removed directly
+		@type trash_dir: str
+		@param index: Index of the result directories of the current iteration, shared by all functions that match result patterns. A new index is used if none is specified
+		@type index: ResultIndex
 		@param flog: Log file to record raised events
 		@type flog: TextIOWrapper (file object)
 		@return: True if transfer is required. False otherwise
 		'''
 		
 		try:
+			if not copy_mode:
+				copy_mode = self.getCopyMode()
+			index = index or ResultIndex()
 			
 			#for f_res in conf:
 			for i in conf:
-				for f_res in glob.glob(os.path.join(res_cur_dir,i)):	# If the result name is specified with pattern, instead of literal name, then the result name should be extended first to all matching files and directories
-					#for f_res in j:
-					# Check if the result is file or directory
-					if os.path.isfile(f_res):  # Result is file
-						# Perform required sequence of actions on result files
-						for act in conf[i]:
-							if act['action'].lower() == 'copy':
-								# print('DEBUG: actOnResult: copy file '+str(os.path.join(res_cur_dir,f_res))+' to '+str(os.path.join(res_cur_dir,res_dest_dir,f_res))+'\n')
-								shutil.copy(f_res, os.path.join(res_cur_dir, res_dest_dir, i))
-							else:
-								# print('DEBUG: actOnResult: move file '+str(os.path.join(res_cur_dir,f_res))+' to '+str(os.path.join(res_cur_dir,res_dest_dir,f_res))+'\n')
-								shutil.move(f_res, os.path.join(res_cur_dir, res_dest_dir, i))
-					elif os.path.isdir(f_res):  # Result is a directory
-						# Remove the directory from the destination path if already exist there
-						if os.path.isdir(os.path.join(res_cur_dir, res_dest_dir, i)):
-							shutil.rmtree(os.path.join(res_cur_dir, res_dest_dir, i))
-						# Perform required set of actions on result directories
+				for f_res in index.glob(os.path.join(res_cur_dir,i)):	# If the result name is specified with pattern, instead of literal name, then the result name should be extended first to all matching files and directories
+					# Each matching result keeps its path (relative to the current results directory) under the destination results directory
+					dest = os.path.join(res_cur_dir, res_dest_dir, os.path.relpath(f_res, res_cur_dir))
+					if index.exists(f_res):  # Result is file or directory
+						# Perform required sequence of actions on the result. An existing destination is replaced
 						for act in conf[i]:
-							if act['action'].lower() == 'copy':	
-								shutil.copytree(f_res, os.path.join(res_cur_dir, res_dest_dir, i))
-							else:
-								shutil.move(f_res, os.path.join(res_cur_dir, res_dest_dir, i))	
+							if not index.exists(f_res):  # The result has already been moved by a previous action
+								break
+							placeResult(f_res, dest, 'copy' if act['action'].lower() == 'copy' else 'move', copy_mode, \
+									discard=(lambda x: self.trash.trash(x, trash_dir)) if trash_dir else None)
+							index.changed(f_res)
+							index.changed(dest)
 					else:
 						if flog:
 							flog.write("Cannot find result " + i + " at " + repr(time.time()) + "\n")
@@ -936,7 +1393,23 @@ class vifi():
 				print(result)
 				traceback.print_exc()
 	
-	def toRemove(self, conf:dict, data_path:str, flog:TextIOWrapper=None) -> None:
+	def getCopyMode(self) -> str:
+		''' Return how results are copied (i.e., the 'copy_mode' of the results folder in the VIFI configuration, or 'auto'). See vififs.copyFile '''
+		
+		try:
+			return self.vifi_conf['domains']['req_res_path_per_request'].get('copy_mode') or 'auto'
+		except (KeyError, TypeError, AttributeError):
+			return 'auto'
+	
+	def getTrashPath(self, dset:str) -> str:
+		''' Return the trash directory of a set, or None if the set does not exist '''
+		
+		try:
+			return os.path.join(self.vifi_conf['domains']['root_script_path']['name'], self.vifi_conf['domains']['sets'][dset]['name'], TRASH_DIR)
+		except (KeyError, TypeError):
+			return None
+	
+	def toRemove(self, conf:dict, data_path:str, trash_dir:str=None, index:ResultIndex=None, flog:TextIOWrapper=None) -> None:
 		''' Remove specified set of files/directories under the specified path after current service (iteration) 
 		finishes, and before the next service (iteration) begins. The specified files/folder represent dependencies 
 		for the current service (iteration), and they should be updated before the next service (iteration) starts. 
@@ -945,19 +1418,26 @@ class vifi():
 		@type conf: dict
 		@param data_path: Root path of files/folder to be removed
 		@type data_path: str 
+		@param trash_dir: If specified, files/folders are moved to this trash directory, and deleted in the background (see vififs.TrashCollector). Otherwise, they are removed directly
+		@type trash_dir: str
+		@param index: Index of the result directories of the current iteration, shared by all functions that match result patterns. A new index is used if none is specified
+		@type index: ResultIndex
 		@param flog: Log file to record raised events
 		@type flog: TextIOWrapper (file object)  
 		'''
 		
 		try:
+			index = index or ResultIndex()
 			for i in conf:
-				for j in glob.glob(os.path.join(data_path,i)):	# If the result name is specified with pattern, instead of literal name, then the result name should be extended first to all matching files and directories
-					for f in j:
-						# print("DEBUG: remove result "+str(f)+" from path "+str(data_path)+"\n")
-						if os.path.isfile(f):  # To remove a file
-							os.remove(f)
-						elif os.path.isdir(f):  # To remove a folder
-							shutil.rmtree(f)
+				for f in index.glob(os.path.join(data_path,i)):	# If the result name is specified with pattern, instead of literal name, then the result name should be extended first to all matching files and directories
+					# print("DEBUG: remove result "+str(f)+" from path "+str(data_path)+"\n")
+					if trash_dir:  # The file/folder disappears from the request folder right away, and is deleted in the background
+						self.trash.trash(f, trash_dir)
+					elif index.isfile(f):  # To remove a file
+						os.remove(f)
+					elif index.isdir(f):  # To remove a folder
+						shutil.rmtree(f)
+					index.changed(f)
 		except:
 			result = 'Error: "toRemove" function has error(vifi_server): '
 			if flog:
@@ -968,8 +1448,8 @@ class vifi():
 				traceback.print_exc()
 		
 	def nifiTransfer(self, user_nifi_conf:dict, data_path:str, res_id:str='', pg_name:str=None, tr_res_temp_name:str='tr_res_temp', \
-					flog:TextIOWrapper=None) -> str:
-		''' Transfer required results as a compressed zip file using NIFI
+					index:ResultIndex=None, manifest:ResultManifest=None, flog:TextIOWrapper=None) -> str:
+		''' Transfer required results as a compressed zip file using NIFI. The compressed file includes the manifest (see vifimanifest) of the transferred results
 		@attention: Current implementation just creates the compressed file to be transfered by NIFI. Current implementation does not transfer the file by itself. The transfer process is done by NIFI workflow design
 		@note: If result files and/or directories are specified, then only the results files/directories are transferred. Otherwise, the whole results directory is transfered
 		@param user_nifi_conf: User configurations related to NIFI
@@ -982,6 +1462,10 @@ class vifi():
 		@type pg_name: str 
 		@param tr_res_temp_name: NIFI Transfer results template name. Defaults to 'tr_res_temp' template
 		@type tr_res_temp_name: str 
+		@param index: Index of the result directories of the current iteration, shared by all functions that match result patterns. A new index is used if none is specified
+		@type index: ResultIndex
+		@param manifest: Manifest of the results folder. It is updated with the current results, and the entries of the transferred results are added to the compressed file
+		@type manifest: ResultManifest
 		@param flog: Log file to record raised events
 		@type flog: TextIOWrapper (file object)
 		@return: Name of the (uniquely identified) compressed result file, if successful, without path. Otherwise, and empty string
@@ -989,19 +1473,32 @@ class vifi():
 		'''
 		
 		try:
+			index = index or ResultIndex()
+			shipped = None  # Transferred results. All results are transferred if None
 			
 			# Copy results file(s) and/or directories, if specified, to the created user_name directory. Otherwise, copy the whole results directory to a user_name directory, under the results directory, if not already exists
 			if 'results' in user_nifi_conf and user_nifi_conf['results']:
 				# Create the user_name directory to hold the intermediate results that will be transfered
 				os.makedirs(os.path.join(data_path, user_nifi_conf['archname']), exist_ok=False)
-				for j in [glob.glob(os.path.join(data_path,i)) for i in user_nifi_conf['results']]:	# If the result name is specified with pattern, instead of literal name, then the result name should be extended first to all matching files and directories
+				shipped = []
+				for j in [index.glob(os.path.join(data_path,i)) for i in user_nifi_conf['results']]:	# If the result name is specified with pattern, instead of literal name, then the result name should be extended first to all matching files and directories
 					for res in j:
-						if os.path.isfile(res):
-							shutil.copy(res, os.path.join(data_path, user_nifi_conf['archname']))
-						elif os.path.isdir(res):
-							shutil.copytree(res, os.path.join(data_path, user_nifi_conf['archname'], os.path.basename(res)))
+						shipped.append(res)
+						# Results keep their paths relative to the results directory, as in the manifest
+						rel = os.path.relpath(res, data_path)
+						target = os.path.join(data_path, user_nifi_conf['archname'], os.path.basename(res) if rel == os.pardir or rel.startswith(os.pardir + os.sep) else rel)
+						os.makedirs(os.path.dirname(target), exist_ok=True)
+						if index.isfile(res):
+							copyFile(res, target, self.getCopyMode())
+						elif index.isdir(res):
+							copyTree(res, target, self.getCopyMode())
 			else:
-				shutil.copytree(data_path, os.path.join(data_path, user_nifi_conf['archname']))
+				copyTree(data_path, os.path.join(data_path, user_nifi_conf['archname']), self.getCopyMode())
+			
+			# Add the manifest of the transferred results, so the receiver can verify them
+			if manifest:
+				self.updateManifest(manifest, index, paths=shipped, flog=flog)
+				manifest.dump(os.path.join(data_path, user_nifi_conf['archname'], MANIFEST_NAME), shipped)
 			
 			# Compress the created user_name directory
 			shutil.make_archive(os.path.join(data_path, user_nifi_conf['archname']), 'zip', data_path, user_nifi_conf['archname'])
@@ -1014,6 +1511,8 @@ class vifi():
 			if res_id:
 				shutil.move(res_name, os.path.join(data_path, user_nifi_conf['archname'] + '.' + res_id + '.zip'))
 				res_name = os.path.join(data_path, user_nifi_conf['archname'] + '.' + res_id + '.zip')
+			index.changed(os.path.join(data_path, user_nifi_conf['archname']))
+			index.changed(res_name)
 						
 			# Retrieve processor group for the specified set
 			set_pg = canvas.get_process_group(pg_name)
@@ -1141,43 +1640,50 @@ class vifi():
 			# Return False to indicate transfer failure
 			return False
 		
-	def s3Transfer(self, user_s3_conf:dict, data_path:str, flog:TextIOWrapper=None) -> None:
-		''' Transfer files to S3 bucket
+	def s3Transfer(self, user_s3_conf:dict, data_path:str, index:ResultIndex=None, manifest:ResultManifest=None, \
+				flog:TextIOWrapper=None) -> None:
+		''' Transfer files to S3 bucket. Files are uploaded with their MD5 digests from the manifest, if known, so that S3 verifies the uploaded data
 		@param user_s3_conf: User configurations related to S3 bucket
 		@type user_s3_conf: dict  
 		@param data_path: Path of files to be transfered
 		@type data_path: str  
+		@param index: Index of the result directories of the current iteration, shared by all functions that match result patterns. A new index is used if none is specified
+		@type index: ResultIndex
+		@param manifest: Manifest of the results folder. It is updated with the uploaded files (and their MD5 digests), which are sent with the uploads
+		@type manifest: ResultManifest
 		@param flog: Log file to record raised events
 		@type flog: TextIOWrapper (file object) 
 		''' 		
 		
-		import boto3, glob
+		import boto3
 		
 		try:
 			s3 = boto3.resource('s3')
+			index = index or ResultIndex()
+			uploads = []  # (key, path) of the files to upload
 			# If results are specified in the s3 section, then upload specified results to the s3 bucket
 			if 'results' in user_s3_conf and user_s3_conf['results']:
-				for j in [glob.glob(os.path.join(data_path,i)) for i in user_s3_conf['results']]:	# If the result name is specified with pattern, instead of literal name, then the result name should be extended first to all matching files and directories
+				for j in [index.glob(os.path.join(data_path,i)) for i in user_s3_conf['results']]:	# If the result name is specified with pattern, instead of literal name, then the result name should be extended first to all matching files and directories
 					for res in j:
-						if os.path.isfile(res):
-							data = open(res, 'rb')
-							key_obj = user_s3_conf['path'] + "/" + os.path.basename(res)
-							s3.Bucket(user_s3_conf['bucket']).put_object(Key=key_obj, Body=data)  # In this script, we do not need AWS credentials, as this EC2 instance has the proper S3 rule
-						elif os.path.isdir(res):
-							for path, _, f_res in os.walk(res):
+						if index.isfile(res):
+							uploads.append((user_s3_conf['path'] + "/" + os.path.basename(res), res))
+						elif index.isdir(res):
+							for path, _, f_res in index.walk(res):
 								for f in f_res:
-									data = open(os.path.join(path, f), 'rb')
-									key_obj = user_s3_conf['path'] + "/" + f
-									s3.Bucket(user_s3_conf['bucket']).put_object(Key=key_obj, Body=data)  # In this script, we do not need AWS credentials, as this EC2 instance has the proper S3 rule
+									uploads.append((user_s3_conf['path'] + "/" + f, os.path.join(path, f)))
 
 				
 			# If no results are specified for the s3 section, then upload the whole results section
 			else:
-				for path, dir, f_res in os.walk(data_path):
+				for path, dir, f_res in index.walk(data_path):
 					for f in f_res:
-						data = open(os.path.join(path, f), 'rb')
-						key_obj = user_s3_conf['path'] + "/" + f
-						s3.Bucket(user_s3_conf['bucket']).put_object(Key=key_obj, Body=data)  # In this script, we do not need AWS credentials, as this EC2 instance has the proper S3 rule
+						uploads.append((user_s3_conf['path'] + "/" + f, os.path.join(path, f)))
+			
+			# Only the uploaded files are hashed (with their MD5 digests)
+			if manifest and uploads:
+				self.updateManifest(manifest, index, True, [x[1] for x in uploads], flog)
+			for key_obj, path in uploads:
+				self.s3Put(s3.Bucket(user_s3_conf['bucket']), key_obj, path, manifest)
 		except:
 			result = 'Error: "s3Transfer" function has error(vifi_server): '
 			if flog:
@@ -1187,13 +1693,33 @@ class vifi():
 				print(result)
 				traceback.print_exc()
 	
-	def sftpTransfer(self, user_sftp_conf:dict, data_path:str, \
-					flog:TextIOWrapper=None) -> bool:
-		''' Transfer input file to specified SFTP server
+	def s3Put(self, bucket, key:str, path:str, manifest:ResultManifest=None) -> None:
+		''' Upload one file to an S3 bucket. If the MD5 digest of the file is known by the manifest, it is sent as the Content-MD5 of the upload, so S3 rejects corrupted uploads
+		@param bucket: S3 bucket
+		@type bucket: boto3 Bucket
+		@param key: Key of the uploaded object
+		@type key: str
+		@param path: Path of the file
+		@type path: str
+		@param manifest: Manifest of the results folder
+		@type manifest: ResultManifest
+		'''
+		
+		md5 = manifest.contentMD5(path) if manifest else None
+		with open(path, 'rb') as data:
+			if md5:
+				bucket.put_object(Key=key, Body=data, ContentMD5=md5)  # In this script, we do not need AWS credentials, as this EC2 instance has the proper S3 rule
+			else:
+				bucket.put_object(Key=key, Body=data)
+	
+	def sftpTransfer(self, user_sftp_conf:dict, data_path:str, index:ResultIndex=None, flog:TextIOWrapper=None) -> bool:
+		''' Transfer input file to specified SFTP server. The size of each uploaded file is confirmed by paramiko (SFTPClient.put)
 		@param user_sftp_conf: User configurations related to SFTP Server
 		@type user_sftp_conf: dict  
 		@param data_path: Path of files to be transfered
 		@type data_path: str
+		@param index: Index of the result directories of the current iteration, shared by all functions that match result patterns. A new index is used if none is specified
+		@type index: ResultIndex
 		@param flog: Log file to record raised events
 		@type flog: TextIOWrapper (file object)
 		@return: True if transfer succeeds. False otherwise
@@ -1218,21 +1744,22 @@ class vifi():
 			
 			sftp_client = paramiko.SFTPClient.from_transport(transport)
 			res = []  # True if files are sent correctly to the SFTP server. False, otherwise.
+			index = index or ResultIndex()
 			
 			# If results are specified in the sftp section, then upload specified results to the sftp
 			if 'results' in user_sftp_conf and user_sftp_conf['results']:
-				for j in [glob.glob(os.path.join(data_path,i)) for i in user_sftp_conf['results']]:	# If the result name is specified with pattern, instead of literal name, then the result name should be extended first to all matching files and directories
+				for j in [index.glob(os.path.join(data_path,i)) for i in user_sftp_conf['results']]:	# If the result name is specified with pattern, instead of literal name, then the result name should be extended first to all matching files and directories
 					for res in j:
-						if os.path.isfile(res):
+						if index.isfile(res):
 							sftp_client.put(res, os.path.join(dest_path, os.path.basename(res)))
-						elif os.path.isdir(res):
-							for path, _, f_res in os.walk(res):
+						elif index.isdir(res):
+							for path, _, f_res in index.walk(res):
 								for f in f_res:
 									sftp_client.put(os.path.join(path, f), os.path.join(dest_path, f))
 
 			# If no results are specified for the sftp section, then upload the whole results section
 			else:
-				for path, _, f_res in os.walk(data_path):
+				for path, _, f_res in index.walk(data_path):
 					for f in f_res:
 						sftp_client.put(os.path.join(path, f), os.path.join(dest_path, f))
 			
@@ -1349,7 +1876,123 @@ class vifi():
 		
 		# Current implementation assumes the input request consists of the desired request name + '.' + UUID + '.' + extension
 		return os.path.splitext(os.path.basename(req))[0]
-		
+
+	def validateRequest(self, req_path:str, dset:str, conf:dict=None, flog:TextIOWrapper=None) -> str:
+		''' Validate a request folder once, before it is scheduled, so that requests that can never run are not re-examined
+		by the scheduler cycle after cycle. Current checks include:
+		- The user configuration file exists, and it can be compiled into a request model (see vifireq.Request)
+		- The image of each service is allowed by the set
+		- The data keys of each service exist in the set data_dir
+		- The dependency files of the first unfinished service exist (later services may depend on files produced by preceding services)
+		@param req_path: Path to the request folder
+		@type req_path: str
+		@param dset: Set (i.e., (sub)workflow) of the request
+		@type dset: str
+		@param conf: VIFI configuration file. Defaults to the VIFI configuration of current instance
+		@type conf: dict
+		@param flog: Log file to record raised events
+		@type flog: TextIOWrapper (file object)
+		@return: Empty string if the request is valid. Otherwise, the reason why the request is invalid
+		@rtype: str
+		'''
+
+		try:
+			if not conf:
+				conf = self.vifi_conf
+
+			# Check the user configuration file exists and has the required structure
+			conf_file_name = conf['user_conf']['conf_file_name']
+			if not os.path.isfile(os.path.join(req_path, conf_file_name)):
+				return 'Configuration file ' + conf_file_name + ' does not exist'
+			try:
+				req_conf = Request.load(os.path.join(req_path, conf_file_name))
+			except RequestConfError as e:
+				return 'Configuration file ' + conf_file_name + ' is malformed: ' + str(e)
+
+			set_conf = conf['domains']['sets'][dset]
+			data_dir = set_conf['data_dir'] or {}
+			docker_img_set = set_conf['docker']['docker_img'] or {}
+			for ser in req_conf.services.values():
+				# Check the service image is allowed by the set
+				if not self.checkServiceImage(docker_img_set, ser.image, flog):
+					return 'Image ' + ser.image + ' of service ' + str(ser.name) + ' is not allowed. Please, select one from ' + str(list(docker_img_set.keys()))
+
+				# Check the required data keys exist in the set
+				for x in ser.data or {}:
+					if x not in data_dir:
+						return 'Data ' + str(x) + ' of service ' + str(ser.name) + ' does not exist in set ' + dset
+
+			# Check the dependency files of the first unfinished service
+			unfinished = req_conf.unfinishedServices()
+			if unfinished and unfinished[0].dep_files and not self.checkInputFiles(req_path, unfinished[0].dep_files, flog):
+				return 'Some or all required files are missed for service ' + str(unfinished[0].name)
+
+			return ''
+
+		except:
+			result = 'Error: "validateRequest" function has error(vifi_server): '
+			if flog:
+				flog.write(result)
+				traceback.print_exc(file=flog)
+			else:
+				print(result)
+				traceback.print_exc()
+
+			return 'Request configuration could not be validated'
+
+	def failRequest(self, req_path:str, dset:str, reason:str, conf:dict=None, flog:TextIOWrapper=None) -> None:
+		''' Move an invalid request directly to the failed directory of its set, and record the failure reason in the
+		request folder (as 'failure_reason.txt'), the set log, the request log and the central middleware log
+		@param req_path: Path to the request folder
+		@type req_path: str
+		@param dset: Set (i.e., (sub)workflow) of the request
+		@type dset: str
+		@param reason: Reason of failure
+		@type reason: str
+		@param conf: VIFI configuration file. Defaults to the VIFI configuration of current instance
+		@type conf: dict
+		@param flog: Log file to record raised events
+		@type flog: TextIOWrapper (file object)
+		'''
+
+		try:
+			if not conf:
+				conf = self.vifi_conf
+
+			request = os.path.basename(os.path.normpath(req_path))
+			set_path = os.path.join(conf['domains']['root_script_path']['name'], conf['domains']['sets'][dset]['name'])
+			script_failed = os.path.join(set_path, conf['domains']['script_path_failed']['name'], request)
+
+			# Do not overwrite an earlier failed request with the same name
+			if os.path.exists(script_failed):
+				script_failed = script_failed + '.' + str(uuid.uuid1())
+			shutil.move(req_path, script_failed)
+			self.req_validated.discard(req_path)
+
+			mes_time = time.time()
+			with open(os.path.join(script_failed, 'failure_reason.txt'), 'w') as f:
+				f.write(reason + "\n")
+			with open(os.path.join(set_path, conf['domains']['log_path']['name'], "out.log"), 'a') as f:
+				f.write("Request " + request + " FAILED validation at " + repr(mes_time) + ": " + reason + "\n")
+
+			# Write the request log
+			self.reqLog(req_log_path=conf['req_log_path'], req_log={'start':mes_time, 'end':mes_time, 'services':{}, \
+																	'status':'failed', 'reason':reason}, \
+					req=request + '.' + str(uuid.uuid1()) + '.log.yml', request=request, dset=dset)
+
+			# Update central middleware log if required
+			mes = {'request':request, 'status':'failed', 'reason':reason}
+			self.logToMiddleware(middleware_conf=conf['middleware']['log'], body=mes)
+
+		except:
+			result = 'Error: "failRequest" function has error(vifi_server): '
+			if flog:
+				flog.write(result)
+				traceback.print_exc(file=flog)
+			else:
+				print(result)
+				traceback.print_exc()
+
 	def unpackCompressedRequests(self, conf:dict=None, sets:List[str]=None, sep:str='.', flog:TextIOWrapper=None) -> None:
 		''' Unpack any compressed requests under specified set_i(vifi_server) (i.e., (sub)workflow(vifi_server))
 		@param conf: VIFI configuration file
@@ -1391,7 +2034,11 @@ class vifi():
 						
 						# Get the base request name without additions
 						req_name = self.getReqNameFromPath(req)
-						
+
+						# Hide the extracted request from the scheduler until it is validated
+						req_dir = os.path.join(comp_path, req).split('.zip')[0]
+						self.req_unpacking.add(req_dir)
+
 						# Get the path to finished requests
 						script_path_out = os.path.join(conf['domains']['root_script_path']['name'], conf['domains']['sets'][dset]['name'], \
 										conf['domains']['script_path_out']['name'])
@@ -1426,6 +2073,14 @@ class vifi():
 							os.makedirs(os.path.join(self.vifi_conf['req_log_path'], req_name), exist_ok=True)
 							# Move the found log file to the requst log directory under current VIFI node
 							shutil.move(rec_logf, os.path.join(self.vifi_conf['req_log_path'], req_name))
+
+						# Validate the extracted request once. Invalid requests go directly to the failed directory
+						reason = self.validateRequest(req_dir, dset, conf, flog)
+						if reason:
+							self.failRequest(req_dir, dset, reason, conf, flog)
+						else:
+							self.req_validated.add(req_dir)
+						self.req_unpacking.discard(req_dir)
 		except:
 			result = 'Error: "unpackCompressedRequests" function has error(vifi_server): '
 			if flog:
@@ -1434,6 +2089,9 @@ class vifi():
 			else:
 				print(result)
 				traceback.print_exc()
+		finally:
+			# Requests that could not be validated here are validated by the scheduler instead
+			self.req_unpacking.clear()
 	
 	def unpackCompressedRequestsLoop(self, conf:dict=None, sets:List[str]=None, flog:TextIOWrapper=None) -> None:
 		''' Perform unpackCompressedRequests in a loop until STOP condition of current VIFI instance is True
@@ -1504,32 +2162,45 @@ class vifi():
 				print(result)
 				traceback.print_exc()
 					
-	def reqLog(self, req_log_path:str, req_log:dict, req:str) -> None:
+	def reqLog(self, req_log_path:str, req_log:dict, req:str, request:str=None, dset:str=None) -> None:
 		''' Write request logs under specified path.
-		TODO: Currently, request log is written as YAML file
+		@note: If the log store is enabled for @req_log_path, the request log is appended to the store (see vifilog). Otherwise, request log is written as YAML file
 		@param req_log_path: Path to keep request log
 		@type req_log_path: str
 		@param req_log: Request log
 		@type req_log: dict
 		@param req: Request name. Defaults to 'general_log' if not specified
 		@type req: str   
+		@param request: Request name without the unique suffix of the log, if any
+		@type request: str
+		@param dset: Set of the request, if known
+		@type dset: str
 		'''
 		
+		# Append request log to the log store if enabled
+		if self.log_store and self.log_store.root == os.path.abspath(req_log_path):
+			for ext in ('.log.yml', '.log.yaml'):
+				if req.endswith(ext):
+					req = req[:-len(ext)]
+			self.log_store.append(req, req_log, request=request, dset=dset)
+			return
+		
 		# Create log directory if not exists
 		os.makedirs(req_log_path, exist_ok=True)
 		
 		# Write request log to created log file. Log file is created if not already exists
 		if not (req.endswith('.log.yml') or req.endswith('.log.yaml')):
 			req = req + ".log.yml"
-		with open(os.path.join(req_log_path, req), 'w') as f:
-			yaml.dump(req_log, f)
+		dumpYAML(req_log, os.path.join(req_log_path, req), default_flow_style=None)
 			
 	def reqsAnalysis(self, req_paths:List[str], req_analysis_f:str, req_analysis_path:str=None, prom_conf:dict=None, \
-					metrics_values_path:str=None, metrics_values_f:str=None, flog:TextIOWrapper=None) -> pd.DataFrame:
+					metrics_values_path:str=None, metrics_values_f:str=None, req_records:List[dict]=None, \
+					req_cols:dict=None, flog:TextIOWrapper=None) -> pd.DataFrame:
 		''' Analyze requests logs
 		@note: Despite this function can be moved outside the class. I preferred to leave it in the class just in case it may be needed in the future for scheduling and load balancing
 		@note: This function depends on the YAML structure of requests logs
-		@note: Current implementation makes a simple analysis, and collection of Prometheus metrics
+		@note: Current implementation makes a simple analysis, and collection of Prometheus metrics. Logs are parsed into columns (in parallel for many logs), 
+		and one DataFrame is built at the end, with derived columns (e.g., queue wait, per-iteration duration, transfer times). See vifianalysis
 		@param req_paths: Paths to requests to analyze 
 		@type req_paths: List[str] 
 		@param req_analysis_f: Optional file to keep requests analysis results
@@ -1538,6 +2209,10 @@ class vifi():
 		@type req_analysis_path: str 
 		@param prom_conf: VIFI Node configuration for Prometheus 
 		@type prom_conf: dict
+		@param req_records: Records of request logs from a log store (see vifilog), analyzed with the logs in @req_paths
+		@type req_records: List[dict]
+		@param req_cols: Already parsed columns of request logs (see vifianalysis.AnalysisCache), analyzed with the logs in @req_paths and @req_records
+		@type req_cols: dict
 		@param flog: Log file to record raised events
 		@type flog: TextIOWrapper (file object)
 		@return: Analysis results
@@ -1547,10 +2222,6 @@ class vifi():
 		import ntpath
 		
 		try:
-			# Initialize required variables
-			dt = []  # List to hold all analysis record of all requests
-			cnt = 0  # Counter to index analysis records
-			
 			# Record Prometheus metrics if required
 			if prom_conf:
 				# Determine file path containing metrics names
@@ -1575,42 +2246,35 @@ class vifi():
 				if not metrics_values_path:
 					metrics_values_path = prom_conf['metrics_values_path']
 			
-			# Traverse through all required requests paths
-			for reqf in req_paths:
-				# Initialize prometheus variables
-				with open(reqf, 'r') as x:
-					req = yaml.load(x)
-					for ser in req['services']:
-						d = pd.DataFrame(data={'request':reqf, 'service':[ser], 'start':[float(req['services'][ser]['start'])], \
-											'end':[float(req['services'][ser]['end'])], 'cmp_time':\
-											[float(req['services'][ser]['end']) - float(req['services'][ser]['start'])], \
-											'no_tasks':[int(req['services'][ser]['tasks'])]}, index=[cnt])
-						dt.append(d)  # Append current record to collected analysis results
-						cnt = cnt + 1  # Increment record index
-				
-					# Record Prometheus metrics if allowed by VIFI node
-					if prom_conf:
-						# Determine first time to record metrics as start time of first service in request
-						metric_start = min([req['services'][ser]['start'] for ser in req['services']])
-						
-						# Determine last time to record metrics as the end time of last service in request 
-						metric_end = max([req['services'][ser]['end'] for ser in req['services']])
-						
-						# If no file is given to record Prometheus metrics, then make file name that contains Prometheus metrics values. File name consists of request name, start time of first service, end time of last service 
-						if not metrics_values_f:
-							metrics_values_fname = ntpath.basename(reqf) + '_' + str(metric_start) + '_' + str(metric_end)
-										
-						# Record Prometheus metrics in created Prometheus file
-						self.getMetricsValues(m=metrics, start_t=metric_start, end_t=metric_end, prom_path=prom_conf['prometheus_url'], \
-								step=prom_conf['query_step'], uname=prom_conf['uname'], upass=prom_conf['upass'], \
-								write_to_file=prom_conf['write_metrics'], fname=metrics_values_fname, \
-								fname_path=metrics_values_path, flog=flog)
-			
-			# Join all analysis records together		
-			df = pd.concat(dt)
+			# Parse all requests logs into columns, and build all analysis records at once
+			cols = parseReqLogsParallel(req_paths, records=req_records)
+			if req_cols:
+				cols = mergeColumns([req_cols, cols])
+			df = analysisFrame(cols)
 			
-			# Reorder collected records for a better view
-			df = df[['request', 'service', 'no_tasks', 'start', 'end', 'cmp_time']]
+			# Record Prometheus metrics if allowed by VIFI node (requests that failed validation have no services)
+			if prom_conf:
+				for reqf, (metric_start, metric_end) in df.groupby('request', sort=False).agg({'start':'min', 'end':'max'}).iterrows():
+					# First time to record metrics is the start time of first service in request, and last time is the end time of last service in request
+					if pd.isna(metric_start) or pd.isna(metric_end):  # No service of the request has started (or ended)
+						continue
+					
+					# If no file is given to record Prometheus metrics, then make file name that contains Prometheus metrics values. File name consists of request name, start time of first service, end time of last service 
+					if not metrics_values_f:
+						metrics_values_fname = ntpath.basename(reqf) + '_' + str(metric_start) + '_' + str(metric_end)
+									
+					# Record Prometheus metrics in created Prometheus file
+					self.getMetricsValues(m=metrics, start_t=metric_start, end_t=metric_end, prom_path=prom_conf['prometheus_url'], \
+							step=prom_conf['query_step'], uname=prom_conf['uname'], upass=prom_conf['upass'], \
+							write_to_file=prom_conf['write_metrics'], fname=metrics_values_fname, \
+							fname_path=metrics_values_path, workers=prom_conf.get('query_workers'), \
+							batch=prom_conf.get('query_batch'), retries=prom_conf.get('query_retries'), \
+							cache_path=prom_conf.get('query_cache_path'), cache_size=prom_conf.get('query_cache_size'), \
+							chunk_points=prom_conf.get('query_chunk_points'), flog=flog)
+			
+			# Reorder collected records for a better view (derived columns follow the original ones)
+			df = df[['request', 'service', 'no_tasks', 'start', 'end', 'cmp_time', 'base_service', 'iteration', 'status', \
+					'queue_wait', 'iter_duration', 's3_time', 'nifi_time', 'sftp_time']]
 			
 			# Create final analysis file, or open an existing one if desired
 			if req_analysis_f:
@@ -1632,9 +2296,12 @@ class vifi():
 				traceback.print_exc()
 	
 	def reqsDirAnalysis(self, req_log_dir:str, req_analysis_path:str=None, req_analysis_f:str=None, prom_conf:dict=None, \
-					metrics_values_path:str=None, metrics_values_f:str=None, flog:TextIOWrapper=None) -> pd.DataFrame:
+					metrics_values_path:str=None, metrics_values_f:str=None, start_t:float=None, end_t:float=None, \
+					use_cache:bool=True, flog:TextIOWrapper=None) -> pd.DataFrame:
 		''' Analyzes all request logs that exist in a specific directory
 		@note: Despite this function can be moved outside the class. I preferred to leave it in the class just in case it may be needed in the future for scheduling and load balancing
+		@note: If the directory contains a log store (see vifilog), only the store segments that may contain requests in the time window [@start_t, @end_t] are read. Other (i.e., YAML) logs in the directory are analyzed as well
+		@note: If @use_cache is True, parsed logs are kept in an analysis cache file (CACHE_NAME) in the directory, so each call parses only new or changed logs (see vifianalysis.AnalysisCache)
 		@param req_log_dir: Directory containing request logs
 		@type req_log_dir: str
 		@param req_analysis_path: Path to store resulting analysis files
@@ -1643,6 +2310,12 @@ class vifi():
 		@type req_analysis_f: str
 		@param prom_conf: Prometheues configuration
 		@type prom_conf: dict 
+		@param start_t: If specified, only requests of the log store that end at or after this time are analyzed
+		@type start_t: float
+		@param end_t: If specified, only requests of the log store that start at or before this time are analyzed
+		@type end_t: float
+		@param use_cache: If True, use (and update) the analysis cache of the directory
+		@type use_cache: bool
 		@param flog: Log file to record raised events
 		@type flog: TextIOWrapper (file object)
 		@return: Analysis results
@@ -1656,15 +2329,37 @@ class vifi():
 				# Initialize empty list to hold requests' logs
 				req_logs = []
 				
-				# Collect all requests logs
+				# Collect all requests logs (except the files of the log store and the analysis cache, if any)
 				for path, dir, f_res in os.walk(req_log_dir):
 					for f in f_res:
-						req_logs.append(os.path.join(path, f))
+						if not isStoreFile(f) and not isCacheFile(f):
+							req_logs.append(os.path.join(path, f))
+				store = LogStore(req_log_dir) if LogStore.isStore(req_log_dir) else None
+				
+				# Parse only new or changed logs, and merge them with the cached ones
+				if use_cache:
+					cache = AnalysisCache(os.path.join(req_log_dir, CACHE_NAME))
+					req_cols = cache.logs(req_logs)
+					if store:
+						req_cols = mergeColumns([req_cols, cache.store(store, start=start_t, end=end_t)])
+						cache.prune(req_logs + [store.segmentPath(x) for x in store.listSegments()])
+					else:
+						cache.prune(req_logs)
+					if not cache.save() and flog:  # The analysis does not depend on the cache, so it continues without it
+						flog.write("Warning: analysis cache " + cache.path + " could not be written at " + str(time.time()) + "\n")
+					return self.reqsAnalysis(req_paths=[], req_analysis_f=req_analysis_f, \
+										req_analysis_path=req_analysis_path, prom_conf=prom_conf, \
+						metrics_values_path=metrics_values_path, metrics_values_f=metrics_values_f, \
+						req_cols=req_cols, flog=flog)
+				
+				# Query the log store for the requests in the required time window
+				req_records = list(store.query(start=start_t, end=end_t)) if store else None
 						
 				# Pass collected logs to @reqsAnalysis
 				return self.reqsAnalysis(req_paths=req_logs, req_analysis_f=req_analysis_f, \
 										req_analysis_path=req_analysis_path, prom_conf=prom_conf, \
-					metrics_values_path=metrics_values_path, metrics_values_f=metrics_values_f, flog=flog)
+					metrics_values_path=metrics_values_path, metrics_values_f=metrics_values_f, \
+					req_records=req_records, flog=flog)
 			else:
 				# Direcory path is not valid
 				print('Error: directory path is not valid')
@@ -1766,16 +2461,16 @@ class vifi():
 			
 			# Load the configuration file of request
 			if req_path and os.path.isdir(req_path):
-				with open(os.path.join(req_path, 'conf.yml'), 'r') as f:
-					conf = yaml.load(f)
-				
-				# Increment the maximum iteration of all services in the specified request
-				for ser in conf['services']:
-					conf['services'][ser]['iterative']['max_rep'] += 1
-				
-				# Store back the modified configurations in the specified request
-				with open(os.path.join(req_path, 'conf.yml'), 'w') as f: 	
-					yaml.dump(conf, f, default_flow_style=False)
+				with ConfLock(os.path.join(req_path, 'conf.yml')) as lock:
+					conf = loadYAML(os.path.join(req_path, 'conf.yml'))
+					
+					# Increment the maximum iteration of all services in the specified request
+					for ser in conf['services']:
+						conf['services'][ser]['iterative']['max_rep'] += 1
+					
+					# Store back the modified configurations in the specified request
+					dumpYAML(conf, os.path.join(req_path, 'conf.yml'))
+					lock.bump()
 					
 		except:
 			result = 'Error: "incMaxIterAllServicesinRequest" function has error(vifi_server): '
@@ -1817,51 +2512,66 @@ class vifi():
 			for dset in sets:	
 			# Check if required set_i exists
 				if dset in conf['domains']['sets']:
+					set_conf = conf['domains']['sets'][dset]  # Configuration of current set
+					self.managed_sets.add(dset)
 					### INITIALIZE USER PARAMETERS (APPLICABLE FOR ANY USER) ###
 					conf_file_name = conf['user_conf']['conf_file_name']
 		
 					### INITIALIZE REQUIRED PATH VARIABLES FOR SPECIFIED SET ###
-					script_path_in = os.path.join(conf['domains']['root_script_path']['name'], conf['domains']['sets'][dset]['name'], \
+					script_path_in = os.path.join(conf['domains']['root_script_path']['name'], set_conf['name'], \
 										conf['domains']['script_path_in']['name'])
-					script_path_out = os.path.join(conf['domains']['root_script_path']['name'], conf['domains']['sets'][dset]['name'], \
+					script_path_out = os.path.join(conf['domains']['root_script_path']['name'], set_conf['name'], \
 										conf['domains']['script_path_out']['name'])
-					script_path_failed = os.path.join(conf['domains']['root_script_path']['name'], conf['domains']['sets'][dset]['name'], \
+					script_path_failed = os.path.join(conf['domains']['root_script_path']['name'], set_conf['name'], \
 										conf['domains']['script_path_failed']['name'])
-					log_path = os.path.join(conf['domains']['root_script_path']['name'], conf['domains']['sets'][dset]['name'], \
+					log_path = os.path.join(conf['domains']['root_script_path']['name'], set_conf['name'], \
 										conf['domains']['log_path']['name'])
-					req_res_path_per_request = os.path.join(conf['domains']['root_script_path']['name'], conf['domains']['sets'][dset]['name'], conf['domains']['req_res_path_per_request']['name'])
-					data_dir = conf['domains']['sets'][dset]['data_dir']
+					req_res_path_per_request = os.path.join(conf['domains']['root_script_path']['name'], set_conf['name'], conf['domains']['req_res_path_per_request']['name'])
+					data_dir = set_conf['data_dir']
 					
 					### LOGGING PARAMETERS ###
 					flog_path = os.path.join(log_path, "out.log")
 					flog = open(flog_path, 'a')
 					flog.write("Scheduled by VIFI Orchestrator for set_i " + dset + " at " + str(time.time()) + "\n")
 							
+					# Start background deletion of removed files and directories of requests
+					self.trash.start()
+					
 					### IF DOCKER IS USED FOR THIS SET, THEN INITIALIZE DEFAULT DOCKER PARAMETERS ###
 					### SOME DOCKER PARAMETERS CAN BE OVERRIDEN BY END USER IF ALLOWED ###
-					if 'docker' in conf['domains']['sets'][dset] and conf['domains']['sets'][dset]['docker']:
-						docker_img_set = conf['domains']['sets'][dset]['docker']['docker_img']  # Set of allowed docker images
-						docker_rep = conf['domains']['sets'][dset]['docker']['docker_rep']  # Maximum number of tasks that can be run by any user for this specific set_i
-						ser_check_thr = conf['domains']['sets'][dset]['docker']['ttl']  # Default ttl for each (Docker) service
-						docker_user = conf['domains']['sets'][dset]['docker']['user']  # User to run docker container
-						docker_groups = conf['domains']['sets'][dset]['docker']['groups']  # List of groups to run docker container
-						client = docker.from_env()
+					if 'docker' in set_conf and set_conf['docker']:
+						docker_img_set = set_conf['docker']['docker_img']  # Set of allowed docker images
+						docker_rep = set_conf['docker']['docker_rep']  # Maximum number of tasks that can be run by any user for this specific set_i
+						ser_check_thr = set_conf['docker']['ttl']  # Default ttl for each (Docker) service
+						docker_user = set_conf['docker']['user']  # User to run docker container
+						docker_groups = set_conf['docker']['groups']  # List of groups to run docker container
+						set_executors = set_conf['docker'].get('executors') or ['docker']  # Allowed executors of the set. The first one is the default
+						executors = {}
+						client = None
+						if 'docker' in set_executors:
+							client = docker.from_env()
+							self.ser_registry.start(client, flog)
+							self.reaper.start(client, active=self.getActiveRequests, terminate=self.getTermTime, node=self.node_name, \
+											managed=self.getManagedSets, log_path=conf.get('vifi_log'))
+							executors['docker'] = DockerSwarmExecutor(client, self.ser_registry)
+						if 'local' in set_executors:
+							executors['local'] = self.local_executor
 					else:
 						print('Error: No containerization technique and/or stand alone service is specified to run (sub)workflow ' + dset)
 						return
 					
 					### IF NIFI IS ENABLED FOR THIS SET, THEN INITIALIZE NIFI HOST AND REGISTRY IF EXISTS ###
-					if conf['domains']['sets'][dset]['nifi']['transfer']:
-						nipyapi.config.nifi_config.host = conf['domains']['sets'][dset]['nifi']['host']
-						if conf['domains']['sets'][dset]['nifi']['registry']:
-							nipyapi.config.registry_config.host = conf['domains']['sets'][dset]['nifi']['registry']
+					if set_conf['nifi']['transfer']:
+						nipyapi.config.nifi_config.host = set_conf['nifi']['host']
+						if set_conf['nifi']['registry']:
+							nipyapi.config.registry_config.host = set_conf['nifi']['registry']
 					
 					# Acquire all requests under current set_i if none provided
 					if not request_in:
 						request_in = os.listdir(script_path_in)
 						
 					### USE PROVIDED SET FUNCTION IF EXISTS ###
-					set_fun = conf['domains']['sets'][dset]['set_function']
+					set_fun = set_conf['set_function']
 					if set_fun:
 						# TODO: Currently, only default set_i behavior is used
 						pass
@@ -1869,6 +2579,28 @@ class vifi():
 						### LOOP THROUGH REQUESTS AND PROCESS THEM (CURENTLY PROCESSING LOCATION IS NFS SHARED) ###
 						for request in request_in:
 							
+							# Skip compressed requests, and requests that are still being extracted
+							if not os.path.isdir(os.path.join(script_path_in, request)) or os.path.join(script_path_in, request) in self.req_unpacking:
+								continue
+							
+							# Validate requests that have not been validated at unpack time (e.g., uncompressed requests). Invalid requests go directly to the failed directory, so they are not re-examined in later cycles
+							if os.path.join(script_path_in, request) not in self.req_validated:
+								reason = self.validateRequest(os.path.join(script_path_in, request), dset, conf, flog)
+								if reason:
+									flog.write("Error: Request " + request + " is invalid: " + reason + " at " + str(time.time()) + "\n")
+									self.failRequest(os.path.join(script_path_in, request), dset, reason, conf, flog)
+									continue
+								self.req_validated.add(os.path.join(script_path_in, request))
+							
+							# Queue the request (i.e., leave it for a later cycle) while images of its remaining services are being pre-pulled, so that image pulls do not count against the service ttl
+							try:
+								pulling = [x.image for x in Request.load(os.path.join(script_path_in, request, conf_file_name)).unfinishedServices() if self.image_cache.isPulling(x.image)]
+							except RequestConfError:
+								pulling = []
+							if pulling:
+								flog.write("Request " + request + " is queued until images " + str(pulling) + " are pulled at " + str(time.time()) + "\n")
+								continue
+							
 							# Initialize final services status to check status of all underlying services for current request
 							final_req_stat = True  # True is a temporary value. It changes to False if any underlying service fails, or due to any other failure to process the request
 							
@@ -1887,12 +2619,15 @@ class vifi():
 							script_finished = os.path.join(script_path_out, request)
 							script_failed = os.path.join(script_path_failed, request)
 						
-							# Check and load user configuration file if exists in current request. Otherwise, move to the next request
-							if os.path.exists(os.path.join(script_path_in, request, conf_file_name)):
-								conf_in = self.load_conf(os.path.join(script_path_in, request, conf_file_name))
-							else:
-								flog.write("Error: Configuration does not exist for " + request + " at " + str(time.time()) + "\n")
-								# TODO: if this situation continues, then move to failed
+							# Load user configuration file of current request (its existence has been checked by the request validation), and
+							# compile it into the request model. Thus, any configuration problem fails the request once, here
+							conf_in = self.load_conf(os.path.join(script_path_in, request, conf_file_name))
+							try:
+								req_conf = Request.fromDict(conf_in)
+							except RequestConfError as e:
+								flog.write("Error: Malformed configuration for " + request + ": " + str(e) + " at " + str(time.time()) + "\n")
+								self.failRequest(script_processed, dset, 'Configuration file ' + conf_file_name + ' is malformed: ' + str(e), conf, flog)
+								del self.req_list[request]
 								continue
 							
 							# Initiate a dictionary of services for current request. This set can be modified after reading the configuration file of current request (due to checkpointing, which is a future feature, some services may have already been finished)
@@ -1903,37 +2638,53 @@ class vifi():
 							if not os.path.exists(os.path.join(os.path.join(script_path_in, request), req_res_path_per_request)):
 								# req_res_path_per_request=req_res_path_per_request+"_"+str(uuid.uuid1())
 								os.mkdir(os.path.join(os.path.join(script_path_in, request), req_res_path_per_request))  # To keep only required result files to be further processed or transfered.
+							res_manifest = ResultManifest(os.path.join(script_path_in, request, req_res_path_per_request))  # Result files (and their checksums) of the request, shared by all transfers
 							
 							# Traverse all services of the current request
-							for ser in conf_in['services']:
+							for ser, ser_conf in req_conf.services.items():
 								# If current service already finished, then move to the next service
 								if ser not in servs:
 									continue
 								
 								# Record service name as current service being processed
-								conf_in['curserv']=ser
-								self.dump_conf(conf_in, os.path.join(script_path_in, request, conf_file_name), flog)
+								req_conf.curserv = ser
+								self.conf_writer.update(os.path.join(script_path_in, request, conf_file_name), req_conf, 'service', flog)
 								
 								# Set current service iteration
 								ser_it = servs[ser]['cur_iter']
+								iter_conf = ser_conf.iterative.toDict()
 																
 								# Initialize temporary service status to record status of created service (True if service succeeds)
 								tmp_ser_stat = False
 								
+								# Iterative services can run all their iterations in one persistent worker service, if allowed by the set
+								persistent = bool(ser_conf.iterative.persistent and set_conf['docker'].get('persistent_workers'))
+								worker_name = None  # Service name of the persistent worker of current service, once created
+								worker_iter = 0  # Number of iterations signaled to the persistent worker
+								worker_tasks = 0  # Number of tasks of the persistent worker
+								worker_ctl = os.path.join(WORKER_CTL_DIR, ser)  # Control directory of the persistent worker, relative to the request folder
+								executor = executors.get(ser_conf.executor or set_executors[0])  # Executor of the service, if allowed by the set
+								service_name = self.getSerName(ser, ser_it)  # Service name of current iteration. Set before any check, so that a failure of the service can be recorded
+								
 								# Check if the service still needs to iterate
-								while self.serIterate(iter_conf=conf_in['services'][ser]['iterative'], ser_it_no=ser_it, stop_itarting_path=os.path.join(script_path_in, request, "stop.iterating")):
+								while self.serIterate(iter_conf=iter_conf, ser_it_no=ser_it, stop_itarting_path=os.path.join(script_path_in, request, "stop.iterating")):
 									# print('DEBUG: At new iteration, iteration: '+str(servs[ser]['cur_iter'])+', stop: '+str(os.path.isfile(os.path.join(script_path_in,request,"stop.iterating"))))
+									# Check that the user required executor is allowed by the set
+									if not executor:
+										flog.write("Error: Executor " + str(ser_conf.executor) + " of service " + ser + " is not allowed. Please, select one from " + str(set_executors) + " for request " + request + " at " + str(time.time()) + "\n")
+										break
+									
 									# Check required service name uniqueness (Just a precaution, as the request name- which should also be the service name- must be unique when the user made the request)
-									service_name = self.checkSerName(ser=ser, iter_no=ser_it, client=client)
+									service_name = self.checkSerName(ser=ser, iter_no=ser_it, executor=executor)
 									if not service_name:
-										flog.write("Error: Another service with the same name, " + service_name + ", exists at " + str(time.time()) + "\n")
+										flog.write("Error: Another service with the same name, " + self.getSerName(ser, ser_it) + ", exists at " + str(time.time()) + "\n")
 										# TODO: move to failed. In the future, another service name should be generated if desired
 										break
 									
 									# Check that user required images are allowed by VIFI Node
-									docker_img = self.checkServiceImage(conf['domains']['sets'][dset]['docker']['docker_img'], conf_in['services'][ser]['image'])
+									docker_img = self.checkServiceImage(docker_img_set, ser_conf.image)
 									if not docker_img:
-										flog.write('Error: Wrong container images specified by end-user. Please, select one from ' + str(conf['domains']['sets'][dset]['docker']['docker_img']) + " for request " + request + " at " + str(time.time()) + "\n")
+										flog.write('Error: Wrong container images specified by end-user. Please, select one from ' + str(docker_img_set) + " for request " + request + " at " + str(time.time()) + "\n")
 										# TODO: move to failed
 										break
 									
@@ -1944,7 +2695,7 @@ class vifi():
 										break
 									
 									# Check all files are satisfied for current service. Otherwise, move to the next service
-									if not self.checkInputFiles(os.path.join(script_path_in, request), conf_in['services'][ser]['dependencies']['files']):
+									if not self.checkInputFiles(os.path.join(script_path_in, request), ser_conf.dep_files or {}):
 										flog.write("Error: Some or all required files are missed for " + request + " at " + str(time.time()) + "\n")
 										# TODO: if this situation continues, then move to failed
 										continue
@@ -1962,29 +2713,62 @@ class vifi():
 										continue
 									
 									# Check available task number for current service (VIFI Node can limit concurrent number of running tasks for one service)
-									task_no = self.setServiceNumber(docker_rep=docker_rep, user_rep=conf_in['services'][ser]['tasks'])  # set_i number of service tasks to allowed number
-									if task_no != conf_in['services'][ser]['tasks']:
+									task_no = self.setServiceNumber(docker_rep=docker_rep, user_rep=ser_conf.tasks)  # set_i number of service tasks to allowed number
+									if task_no != ser_conf.tasks:
 										flog.write("Warning: Number of tasks for service " + service_name + " in request " + str(request) + " will be " + str(task_no) + " at " + str(time.time()) + "\n")
 										
+									# Number of allowed failures of each task of the service. The user value overrides the default of the set
+									ser_retries = ser_conf.retries if ser_conf.retries is not None else int(set_conf['docker'].get('retries') or 0)
+									
 									# Check time threshold to check service completeness
-									ser_ttl = self.setServiceThreshold(ser_check_thr, conf_in['services'][ser]['ser_check_thr'])  # set_i ttl to allowed value
-									if ser_ttl != conf_in['services'][ser]['ser_check_thr']:
+									ser_ttl = self.setServiceThreshold(ser_check_thr, ser_conf.ser_check_thr)  # set_i ttl to allowed value
+									if ser_ttl != ser_conf.ser_check_thr:
 										flog.write("Warning: Service check threshold for request " + str(request) + " will be " + str(ser_ttl) + " at " + str(time.time()) + "\n")
 									
+									# Wait until there are enough free resources for the tasks of the service (the service may be shrunk if allowed by the user). A running persistent worker keeps its admitted tasks.
+									# Admission applies to Swarm services only
+									if persistent and worker_name:
+										task_no = worker_tasks
+									elif executor.kind == 'docker':
+										admitted = self.waitAdmission(client, service_name, task_no, ser_conf.resources, int(ser_ttl), flog)
+										if not admitted:
+											flog.write("Error: Not enough resources for service " + service_name + " in request " + str(request) + " at " + str(time.time()) + "\n")
+											self.req_list[request]['services'][service_name] = {'tasks':0, 'base_service':ser, 'iteration':ser_it}
+											tmp_ser_stat = False
+											break
+										if admitted != task_no:
+											flog.write("Warning: Number of tasks for service " + service_name + " in request " + str(request) + " is shrunk to " + str(admitted) + " due to available resources at " + str(time.time()) + "\n")
+										task_no = admitted
+									
 									# Create the required containerized user service, add service name to internal list of services of current request, and log the created service
 									# TOOO: Currently, the created service is appended to an internal list of service. In the future, we may need to keep track of more parameters related to the created service (e.g., user name, request path, ... etc)
+									# For persistent workers, the worker service is created at the first iteration only. Later iterations are just signaled to the running worker
 									try:
-										if self.createUserService(client=client, service_name=service_name, docker_rep=task_no, \
+										if persistent and worker_name:
+											created = self.runWorkerIteration(os.path.join(script_processed, worker_ctl), worker_iter, flog)
+										else:
+											if persistent:
+												shutil.rmtree(os.path.join(script_processed, worker_ctl), ignore_errors=True)  # Remove control files of previous workers of the same service
+											created = self.createUserService(executor=executor, service_name=service_name, docker_rep=task_no, \
 														script_path_in=script_path_in, request=request, \
-														container_dir=conf_in['services'][ser]['container_dir'], data_dir=data_dir, \
-														user_data_dir=conf_in['services'][ser]['data'], work_dir=conf_in['services'][ser]['work_dir'], script=conf_in['services'][ser]['script'], \
-														docker_img=docker_img, docker_cmd=conf_in['services'][ser]['cmd_eng'], \
-														user_args=conf_in['services'][ser]['args'], user_envs=conf_in['services'][ser]['envs'], user_mnts=conf_in['services'][ser]['mnts'], ttl=ser_ttl, \
-														user=docker_user, groups=docker_groups):
+														container_dir=ser_conf.container_dir, data_dir=data_dir, \
+														user_data_dir=ser_conf.data, work_dir=ser_conf.work_dir, script=ser_conf.script, \
+														docker_img=docker_img, docker_cmd=ser_conf.cmd_eng, \
+														user_args=ser_conf.args or [], user_envs=ser_conf.envs, user_mnts=ser_conf.mnts, ttl=ser_ttl, \
+														user=docker_user, groups=docker_groups, dset=dset, worker_ctl=worker_ctl if persistent else None, \
+														resources=ser_conf.resources, retries=ser_retries)
+											if created and persistent:
+												worker_name = service_name
+												worker_tasks = task_no
+												created = self.runWorkerIteration(os.path.join(script_processed, worker_ctl), worker_iter, flog)
+										if created:
 											ser_start_time = time.time()  # Record service creation time
-											self.req_list[request]['services'][service_name] = {'tasks':task_no}
+											self.req_list[request]['services'][service_name] = {'tasks':task_no, 'base_service':ser, 'iteration':ser_it}
 											self.req_list[request]['services'][service_name]['start'] = ser_start_time
-											flog.write(repr(ser_start_time) + ":" + str(client.services.get(service_name)) + "\n")  # Log the command
+											if persistent:
+												flog.write(repr(ser_start_time) + ":Iteration " + str(worker_iter) + " of persistent worker " + worker_name + "\n")  # Log the signaled iteration
+											else:
+												flog.write(repr(ser_start_time) + ":" + executor.describe(service_name) + "\n")  # Log the command
 											
 											# Update central middleware log if required
 											mes = {'request':request, 'service':service_name, 'tasks':task_no, 'start':ser_start_time}
@@ -1997,8 +2781,23 @@ class vifi():
 										flog.write("Error: occurred while launching service " + service_name + ": \n")
 										traceback.print_exc(file=flog)
 											
-									# Check completeness of created service to transfer results (if required) and to end service
-									if self.checkServiceComplete(client, service_name, int(task_no), int(ser_ttl)):
+									# Services with per task results process the results of each task as soon as the task completes
+									if ser_conf.per_task_results:
+										on_task = lambda slot: self.processTaskResults(ser_conf, slot, servs, ser, script_processed, \
+																			os.path.join(script_processed, req_res_path_per_request), dset, res_manifest, flog)
+									else:
+										on_task = None
+									
+									# Check completeness of created service (or of the signaled iteration of the persistent worker) to transfer results (if required) and to end service
+									if persistent:
+										ser_complete = bool(worker_name) and self.checkWorkerIteration(os.path.join(script_processed, worker_ctl), worker_iter, int(task_no), int(ser_ttl), \
+																					on_task_complete=on_task, executor=executor, worker_name=worker_name, \
+																					retries=ser_retries, flog=flog)
+										worker_iter += 1
+									else:
+										ser_complete = self.checkServiceComplete(executor, service_name, int(task_no), int(ser_ttl), ser_retries, on_task, flog)
+										self.admission.release(service_name)  # The tasks of the service have finished (or failed), so their resources are free
+									if ser_complete:
 										# Log completeness time
 										# print('DEBUG: after service complete, iteration: '+str(servs[ser]['cur_iter'])+', stop: '+str(os.path.isfile(os.path.join(script_path_in,request,"stop.iterating"))))
 										ser_end_time = time.time()
@@ -2010,24 +2809,29 @@ class vifi():
 										mes = {'request':request, 'service':service_name, 'end':ser_end_time, 'status':'succeed'}
 										self.logToMiddleware(middleware_conf=conf['middleware']['log'], body=mes)
 										
-										# Move/Copy (or other required sequence of actions) required results, if any, to specified destinations
-										if conf_in['services'][ser]['results']:
-											self.actOnResults(conf=conf_in['services'][ser]['results'], res_cur_dir=script_processed, res_dest_dir=os.path.join(script_processed, req_res_path_per_request))
+										# Move/Copy (or other required sequence of actions) required results, if any, to specified destinations. For services with per task results, 
+										# this is the final barrier that handles the results that do not belong to individual tasks (results of individual tasks have already been handled).
+										# Result directories are listed once for all result patterns of the iteration (i.e., results, toremove and transfers)
+										res_index = ResultIndex()
+										if ser_conf.results:
+											self.actOnResults(conf=ser_conf.results, res_cur_dir=script_processed, res_dest_dir=os.path.join(script_processed, req_res_path_per_request), \
+														trash_dir=self.getTrashPath(dset), index=res_index, flog=flog)
 										
 										# Remove list of files/directories (if exist) that should be updated before the new service (iteration) starts. These files/directories are dependencies for the next service (iteration), and if they are not removed, then the new service (iteration) will start with the outdated data
-										if conf_in['services'][ser]['toremove']:
-											self.toRemove(conf=conf_in['services'][ser]['toremove'], data_path=script_processed)
-											
+										if ser_conf.toremove:
+											self.toRemove(conf=ser_conf.toremove, data_path=script_processed, trash_dir=self.getTrashPath(dset), index=res_index, flog=flog)
+										
 										# Update service status, request status, and request configuration file
 										tmp_ser_stat = True
 										servs[ser]['cur_iter'] += 1
-										conf_in['services'][ser]['iterative']['cur_iter'] += 1
-										self.dump_conf(conf_in, os.path.join(script_path_in, request, conf_file_name), flog)
+										ser_conf.iterative.cur_iter += 1
+										self.conf_writer.update(os.path.join(script_path_in, request, conf_file_name), req_conf, 'iteration', flog)
 										
-										# Delete service, if required, to release resource
+										# Delete service, if required, to release resource. Persistent workers are kept until all iterations of the service finish
 										try:
 											# TODO: Deleted or finished services should be recorded (either in a local list/dict, or in the user configuration file). Thus, it will be known which services, or service iterations, have finished  
-											self.delService(client, service_name, str(conf['domains']['sets'][dset]['terminate']))
+											if not persistent:
+												self.delService(executor, service_name, str(set_conf['terminate']))
 										except:
 											flog.write("Error: failed to delete service " + service_name + " at " + repr(time.time()) + "\n")
 											continue
@@ -2039,9 +2843,10 @@ class vifi():
 										res_uuid = str(uuid.uuid1())
 											
 										# IF S3 IS ENABLED, THEN TRANSFER REQUIRED RESULT FILES TO S3 BUCKET
-										if self.checkTransfer(conf_in['services'][ser]['s3']['transfer'], servs, ser, os.path.join(script_path_in, request), flog) and conf_in['services'][ser]['s3']['results'] and conf_in['services'][ser]['s3']['bucket'] :  # s3_transfer is True and there are specified results to transfer, if exist, and s3_buc has some value
-											self.s3Transfer(conf_in['services'][ser]['s3'], \
-														os.path.join(script_processed, req_res_path_per_request))
+										s3_sec = dict(ser_conf.s3.conf, results=self.taskResults(ser_conf.s3.results)) if ser_conf.per_task_results else ser_conf.s3.conf
+										if self.checkTransfer(s3_sec['transfer'], servs, ser, os.path.join(script_path_in, request), flog) and s3_sec.get('results') and s3_sec['bucket'] :  # s3_transfer is True and there are specified results to transfer, if exist, and s3_buc has some value
+											self.s3Transfer(s3_sec, \
+														os.path.join(script_processed, req_res_path_per_request), res_index, res_manifest)
 											mes_time = time.time()
 											flog.write("Transfered to S3 bucket at " + repr(mes_time) + "\n")
 											self.req_list[request]['services'][service_name]['s3'] = {'sent':mes_time}
@@ -2051,14 +2856,15 @@ class vifi():
 											self.logToMiddleware(middleware_conf=conf['middleware']['log'], body=mes)
 										
 										# If NIFI(s) is(are) enabled, then transfer required results using NIFI
-										if 'nifi' in conf_in['services'][ser]:
+										if ser_conf.nifi is not None:
 											self.req_list[request]['services'][service_name]['nifi'] = []
-											for nifi_sec in conf_in['services'][ser]['nifi']:
-												if self.checkTransfer(nifi_sec['transfer'], servs, ser, os.path.join(script_path_in, request), flog) and nifi_sec['results']:
+											for nifi_spec in ser_conf.nifi:
+												nifi_sec = dict(nifi_spec.conf, results=self.taskResults(nifi_spec.results)) if ser_conf.per_task_results else nifi_spec.conf
+												if self.checkTransfer(nifi_sec['transfer'], servs, ser, os.path.join(script_path_in, request), flog) and nifi_sec.get('results'):
 													res_name = self.nifiTransfer(user_nifi_conf=nifi_sec, \
 																	data_path=os.path.join(script_processed, req_res_path_per_request), \
 																	res_id=res_uuid, pg_name=dset, \
-																	tr_res_temp_name='tr_res_temp')
+																	tr_res_temp_name='tr_res_temp', index=res_index, manifest=res_manifest)
 													if res_name:
 														# NIFI transfer succeeded 
 														mes_time = time.time()
@@ -2073,12 +2879,13 @@ class vifi():
 														# TODO: should the user request be terminated? or just continue with future service(vifi_server)
 												
 										# If SFTP is enabled, then transfer required results using SFTP
-										if 'sftp' in conf_in['services'][ser]:
+										if ser_conf.sftp is not None:
 											self.req_list[request]['services'][service_name]['sftp'] = []
-											for sftp_sec in conf_in['services'][ser]['sftp']:
-												if self.checkTransfer(sftp_sec['transfer'], servs, ser, os.path.join(script_path_in, request), flog) and sftp_sec['results']:
+											for sftp_spec in ser_conf.sftp:
+												sftp_sec = dict(sftp_spec.conf, results=self.taskResults(sftp_spec.results)) if ser_conf.per_task_results else sftp_spec.conf
+												if self.checkTransfer(sftp_sec['transfer'], servs, ser, os.path.join(script_path_in, request), flog) and sftp_sec.get('results'):
 													res_sftp = self.sftpTransfer(user_sftp_conf=sftp_sec, \
-																	data_path=os.path.join(script_processed, req_res_path_per_request))
+																	data_path=os.path.join(script_processed, req_res_path_per_request), index=res_index)
 													if res_sftp:
 														# sftp transfer succeeded 
 														mes_time = time.time()
@@ -2094,7 +2901,9 @@ class vifi():
 														flog.write("Transfer to SFTP Server "+str(sftp_sec['host'])+" failed at  " + repr(time.time()) + os.linesep)
 														
 									else:
-										# Service failed
+										# Service failed. Delete it, according to the termination policy of the set, to release its resources
+										if not persistent:
+											self.delService(executor, service_name, str(set_conf['terminate']), flog)
 										tmp_ser_stat = False
 										break	
 									
@@ -2103,10 +2912,15 @@ class vifi():
 									# Update service iteration number
 									ser_it += 1
 									
+								# Stop the persistent worker of current service, if any
+								if worker_name:
+									self.stopWorker(executor, worker_name, os.path.join(script_processed, worker_ctl), str(set_conf['terminate']), flog)
+									self.admission.release(worker_name)
+									
 								if not tmp_ser_stat:
 									# TODO: If current service fails, then abort whole request. This behavior may need modifications in the future
 									mes_time = time.time()
-									self.req_list[request]['services'][service_name]['status'] = 'failed'
+									self.req_list[request]['services'].setdefault(service_name, {'tasks':0, 'base_service':ser, 'iteration':ser_it})['status'] = 'failed'
 									self.req_list[request]['services'][service_name]['end'] = mes_time
 									flog.write("Failed service " + service_name + " for request " + request + " at " + repr(mes_time) + "\n\n")
 									
@@ -2125,14 +2939,17 @@ class vifi():
 							self.req_list[request]['end'] = req_end_time
 							
 							# Update 'curserv' (i.e., current service) in request configuration file to indicate that all services have been processed
-							conf_in['curserv']='post_services'
-							self.dump_conf(conf_in, os.path.join(script_path_in, request, conf_file_name), flog)
+							req_conf.curserv = 'post_services'
+							self.conf_writer.update(os.path.join(script_path_in, request, conf_file_name), req_conf, flog=flog)
+							self.conf_writer.flush(os.path.join(script_path_in, request, conf_file_name), flog)
+							self.conf_writer.forget(os.path.join(script_path_in, request, conf_file_name))
 							
 							# Update central middleware log if required
 							mes = {'request':request, 'end':req_end_time}
 							self.logToMiddleware(middleware_conf=conf['middleware']['log'], body=mes)
 							
 							# Move finished request to successful requests path, or to failed otherwise. Update internal requests dictionary accordingly
+							self.req_validated.discard(script_processed)
 							if final_req_stat:
 								shutil.move(script_processed, script_finished)
 								self.req_list[request]['status'] = 'success'
@@ -2146,19 +2963,19 @@ class vifi():
 								self.createMetadata()
 								
 								# Move final results to final destination
-								if conf_in['fin_dest']['transfer']:
+								if req_conf.fin_dest['transfer']:
 									
 									# Make a UUID to identify the compressed results that will be transfered (useful for log tracing)
 									res_uuid = str(uuid.uuid1())
 									
 									# IF S3 IS ENABLED, THEN TRANSFER REQUIRED RESULT FILES TO S3 BUCKET
-									if conf_in['fin_dest']['s3']['transfer'] and conf_in['fin_dest']['s3']['bucket']:  # s3_transfer is True and s3_buc has some value
-										self.s3Transfer(conf_in['fin_dest']['s3'], os.path.join(script_finished, req_res_path_per_request))
+									if req_conf.fin_dest['s3']['transfer'] and req_conf.fin_dest['s3']['bucket']:  # s3_transfer is True and s3_buc has some value
+										self.s3Transfer(req_conf.fin_dest['s3'], os.path.join(script_finished, req_res_path_per_request))
 										flog.write("Transfered final results to S3 bucket at " + repr(time.time()) + "\n")
 									
 									# If SFTP is enabled, then transfer required results using SFTP 
-									if conf_in['fin_dest']['sftp']['transfer']:
-										res_sftp = self.sftpTransfer(user_nifi_conf=conf_in['services'][ser]['sftp'], \
+									if req_conf.fin_dest['sftp']['transfer']:
+										res_sftp = self.sftpTransfer(user_sftp_conf=req_conf.fin_dest['sftp'], \
 														data_path=os.path.join(script_finished, req_res_path_per_request))
 										if res_sftp:
 											# sftp transfer succeeded 
@@ -2174,8 +2991,8 @@ class vifi():
 											flog.write("Transfer final results to SFTP Server failed at  " + repr(mes_time) + "\n")
 												
 									# If NIFI is enabled, then transfer required results using NIFI 
-									if conf_in['fin_dest']['nifi']['transfer']:
-										res_name = self.nifiTransfer(user_nifi_conf=conf_in['fin_dest']['nifi']['transfer'], \
+									if req_conf.fin_dest['nifi']['transfer']:
+										res_name = self.nifiTransfer(user_nifi_conf=req_conf.fin_dest['nifi'], \
 															data_path=os.path.join(script_finished, req_res_path_per_request), \
 															res_id=res_uuid, pg_name=dset, \
 															tr_res_temp_name='tr_res_temp')
@@ -2202,7 +3019,8 @@ class vifi():
 								self.logToMiddleware(middleware_conf=conf['middleware']['log'], body=mes)
 								
 							# Write the request log
-							self.reqLog(req_log_path=self.vifi_conf['req_log_path'], req_log=self.req_list[request], req=request + '.' + str(uuid.uuid1()) + '.log.yml')
+							self.reqLog(req_log_path=self.vifi_conf['req_log_path'], req_log=self.req_list[request], req=request + '.' + str(uuid.uuid1()) + '.log.yml', \
+										request=request, dset=dset)
 							
 							# Clean the request log to save resource
 							del self.req_list[request]
@@ -2218,6 +3036,8 @@ class vifi():
 				print(result)
 				traceback.print_exc()
 		finally:
+			# Do not lose pending updates of requests configuration files
+			self.conf_writer.flush(flog=flog if flog else None)
 			if flog:
 				flog.close()
 	
@@ -2243,6 +3063,10 @@ class vifi():
 					sys.exit()
 					
 			while not self.stop:
+				# Reload the VIFI configuration file (e.g., to pre-pull newly allowed images) if it has changed, unless a configuration has been passed explicitly
+				if conf is self.vifi_conf and self.vifi_conf_f and fileSignature(self.vifi_conf_f) != self.vifi_conf_sig:
+					self.loadVIFIConf(self.vifi_conf_f, flog)
+					conf = self.vifi_conf
 				self.vifiRun(sets, request_in, conf)
 				time.sleep(conf['domains']['proc_int'])
 		except:
@@ -0,0 +1,319 @@
+'''
+Created on Oct 19, 2026
+
+Columnar analysis of VIFI request logs. Request logs are parsed into plain columns (one value per service of each
+request), in parallel by a pool of processes for large numbers of logs, and a single DataFrame is built from the
+columns at the end. Derived columns (e.g., queue wait, per-iteration duration, transfer times) are computed on whole
+columns. An analysis cache keeps the parsed columns of each log file (and log store segment) with its signature, so
+repeated analyses of a log directory parse only new or changed logs. The cache is a plain JSON file, so loading a
+cache written by someone else cannot run code.
+
+@author: Mohammed Elshambakey
+@contact: shambakey1@gmail.com
+'''
+
+import os, json, tempfile
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+from vificonf import loadYAML
+from vifilog import LogStore
+
+# Columns parsed from request logs. Times are in seconds since the epoch. Missing values (e.g., a service that was not admitted) are NaN
+LOG_COLUMNS = ('request', 'service', 'base_service', 'iteration', 'no_tasks', 'start', 'end', 'req_start', 'req_end', 's3_sent', \
+			'nifi_sent', 'sftp_sent', 'status')
+PARSE_CHUNK = 256  # Number of logs parsed by each task of the process pool
+PARSE_WORKERS = os.cpu_count() or 1  # Number of processes that parse logs
+PARALLEL_MIN = 2 * PARSE_CHUNK  # Logs are parsed in parallel only if there are at least this number of logs
+CACHE_NAME = '.vifi_analysis_cache.json'  # Name of the analysis cache file in a log directory
+CACHE_VERSION = 3  # Version of the cache format. Caches of other versions are discarded
+LEGACY_CACHE_NAMES = ('.vifi_analysis_cache.pickle',)  # Names of cache files of older versions, which are never loaded
+
+
+
+def isCacheFile(name:str) -> bool:
+	''' Return True if a file name is an analysis cache (including temporary and legacy cache files) '''
+
+	return name == CACHE_NAME or name.startswith('.' + CACHE_NAME + '.') or name in LEGACY_CACHE_NAMES
+
+
+def _float(x) -> float:
+	''' Convert a logged value to float, or NaN if it is missing or malformed '''
+
+	try:
+		return float(x)
+	except (TypeError, ValueError):
+		return np.nan
+
+
+def _lastSent(x) -> float:
+	''' Return the latest 'sent' time of a logged transfer (a dictionary, or a list of dictionaries for multiple destinations), or NaN '''
+
+	if isinstance(x, dict):
+		return _float(x.get('sent'))
+	if isinstance(x, list):
+		sent = [_float(i.get('sent')) for i in x if isinstance(i, dict)]
+		sent = [i for i in sent if i == i]
+		return max(sent) if sent else np.nan
+	return np.nan
+
+
+def _addReqLog(cols:dict, name:str, req:dict) -> None:
+	''' Append the services of one request log to parsed columns '''
+
+	for ser, s in (req.get('services') or {}).items():
+		s = s or {}
+		cols['request'].append(name)
+		cols['service'].append(ser)
+		# The service (as named in the request) and the iteration are logged by the VIFI Node. Older logs do not have them, so each of their services is its own base service, with an unknown iteration
+		cols['base_service'].append(s.get('base_service') if s.get('base_service') is not None else ser)
+		cols['iteration'].append(_float(s.get('iteration')))
+		cols['no_tasks'].append(int(s.get('tasks') or 0))
+		cols['start'].append(_float(s.get('start')))
+		cols['end'].append(_float(s.get('end')))
+		cols['req_start'].append(_float(req.get('start')))
+		cols['req_end'].append(_float(req.get('end')))
+		cols['s3_sent'].append(_lastSent(s.get('s3')))
+		cols['nifi_sent'].append(_lastSent(s.get('nifi')))
+		cols['sftp_sent'].append(_lastSent(s.get('sftp')))
+		cols['status'].append(s.get('status'))
+
+
+def parseReqLogs(paths:List[str]) -> dict:
+	''' Parse request logs into columns (see LOG_COLUMNS). Malformed logs are skipped
+	@param paths: Paths of the request logs
+	@type paths: List[str]
+	@return: Dictionary of the columns. Key is the column name. Value is a list of values
+	@rtype: dict
+	'''
+
+	cols = {c:[] for c in LOG_COLUMNS}
+	for reqf in paths:
+		try:
+			req = loadYAML(reqf, copy_conf=False)
+			if not isinstance(req, dict):
+				continue
+			_addReqLog(cols, reqf, req)
+		except Exception:
+			continue
+	return cols
+
+
+def parseReqRecords(records:List[dict]) -> dict:
+	''' Parse records of a log store into columns (see LOG_COLUMNS, and vifilog.LogStore). The 'request' column holds the unique name of each request log
+	@param records: Records of request logs
+	@type records: List[dict]
+	@return: Dictionary of the columns
+	@rtype: dict
+	'''
+
+	cols = {c:[] for c in LOG_COLUMNS}
+	for rec in records:
+		if isinstance(rec.get('log'), dict):
+			_addReqLog(cols, rec.get('id') or rec.get('request'), rec['log'])
+	return cols
+
+
+def parseReqLogsParallel(paths:List[str], workers:int=None, records:List[dict]=None) -> dict:
+	''' Parse request logs into columns, by a pool of processes if there are many logs (see @parseReqLogs)
+	@param paths: Paths of the request logs
+	@type paths: List[str]
+	@param workers: Number of processes. Defaults to PARSE_WORKERS
+	@type workers: int
+	@param records: Records of a log store, parsed after the files in @paths (see @parseReqRecords)
+	@type records: List[dict]
+	@return: Dictionary of the columns
+	@rtype: dict
+	'''
+
+	workers = workers or PARSE_WORKERS
+	if workers < 2 or len(paths) < PARALLEL_MIN:
+		parts = [parseReqLogs(paths)]
+	else:
+		with ProcessPoolExecutor(max_workers=workers) as pool:
+			parts = list(pool.map(parseReqLogs, [paths[i:i + PARSE_CHUNK] for i in range(0, len(paths), PARSE_CHUNK)]))
+	if records:
+		parts.append(parseReqRecords(records))
+	return mergeColumns(parts)
+
+
+def mergeColumns(parts:List[dict]) -> dict:
+	''' Concatenate parsed columns (see @parseReqLogs) in the given order '''
+
+	cols = {c:[] for c in LOG_COLUMNS}
+	for part in parts:
+		for c in LOG_COLUMNS:
+			cols[c].extend(part[c])
+	return cols
+
+
+def windowColumns(cols:dict, start:float=None, end:float=None) -> dict:
+	''' Return the rows of parsed columns whose requests overlap a time window. Rows with unknown request times are kept
+	@param cols: Parsed columns
+	@type cols: dict
+	@param start: If specified, rows of requests that end before this time are dropped
+	@type start: float
+	@param end: If specified, rows of requests that start after this time are dropped
+	@type end: float
+	@return: The remaining rows, as columns
+	@rtype: dict
+	'''
+
+	if start is None and end is None:
+		return cols
+	keep = [i for i in range(len(cols['request'])) if not (start is not None and cols['req_end'][i] < start) and \
+		not (end is not None and cols['req_start'][i] > end)]  # Comparisons with NaN are False, so rows with unknown times are kept
+	return {c:[cols[c][i] for i in keep] for c in LOG_COLUMNS}
+
+
+class AnalysisCache():
+	''' Persisted cache of parsed request logs. The parsed columns of each log file (or segment of a log store) are kept
+	with the signature (modification time in nanoseconds, size) of the file. Thus, only new or changed logs are parsed
+	on each analysis, and the cached columns of the others are merged with them. The cache is only an optimization: a
+	cache file that cannot be read or written (e.g., in a read-only log directory) just results in parsing all logs.
+	'''
+
+	def __init__(self, path:str):
+		'''
+		@param path: Path of the cache file
+		@type path: str
+		'''
+
+		self.path = path
+		self.entries = {}  # Cached logs. Key is the path of the log file (or segment). Value is a dictionary of 'sig' and 'cols'
+		self.dirty = False  # True if the cache has changed since it was loaded
+		self.load()
+
+	@staticmethod
+	def signature(path:str) -> tuple:
+		''' Return the signature of a log file, or None if it does not exist '''
+
+		try:
+			st = os.stat(path)
+		except OSError:
+			return None
+		return (st.st_mtime_ns, st.st_size)
+
+	def load(self) -> None:
+		''' Load the cache file. A missing, malformed or outdated cache file results in an empty cache '''
+
+		try:
+			with open(self.path) as f:
+				cache = json.load(f)
+			if cache.get('version') != CACHE_VERSION or tuple(cache.get('columns', ())) != LOG_COLUMNS:
+				raise ValueError('Outdated analysis cache')
+			self.entries = {k:{'sig':tuple(v['sig']), 'cols':{c:list(v['cols'][c]) for c in LOG_COLUMNS}} for k, v in cache['entries'].items()}
+		except Exception:
+			self.entries = {}
+
+	def save(self) -> bool:
+		''' Write the cache file (atomically), if the cache has changed
+		@return: False if the cache file could not be written (e.g., the log directory is read-only). Otherwise, True
+		@rtype: bool
+		'''
+
+		if not self.dirty:
+			return True
+		tmp = None
+		try:
+			fd, tmp = tempfile.mkstemp(prefix='.' + os.path.basename(self.path) + '.', suffix='.tmp', dir=os.path.dirname(os.path.abspath(self.path)))
+			with os.fdopen(fd, 'w') as f:
+				json.dump({'version':CACHE_VERSION, 'columns':LOG_COLUMNS, 'entries':self.entries}, f, default=str)  # NaN values are written as NaN, which json reads back
+			os.replace(tmp, self.path)
+		except (OSError, ValueError, TypeError):
+			if tmp and os.path.exists(tmp):
+				try:
+					os.remove(tmp)
+				except OSError:
+					pass
+			return False
+		self.dirty = False
+		return True
+
+	def prune(self, keys:List[str]) -> None:
+		''' Drop cached logs that are not in @keys (e.g., deleted log files) '''
+
+		keys = set(keys)
+		for k in [x for x in self.entries if x not in keys]:
+			del self.entries[k]
+			self.dirty = True
+
+	def logs(self, paths:List[str], workers:int=None) -> dict:
+		''' Return the parsed columns of log files. Only new or changed files are parsed (in parallel if there are many of them)
+		@param paths: Paths of the request logs
+		@type paths: List[str]
+		@param workers: Number of processes. Defaults to PARSE_WORKERS
+		@type workers: int
+		@return: Parsed columns of the files, in the order of @paths
+		@rtype: dict
+		'''
+
+		sigs = {p:self.signature(p) for p in paths}
+		todo = [p for p in paths if sigs[p] and (p not in self.entries or self.entries[p]['sig'] != sigs[p])]
+		workers = workers or PARSE_WORKERS
+		if workers < 2 or len(todo) < PARALLEL_MIN:
+			parts = [parseReqLogs([p]) for p in todo]
+		else:
+			with ProcessPoolExecutor(max_workers=workers) as pool:
+				parts = list(pool.map(parseReqLogs, [[p] for p in todo], chunksize=PARSE_CHUNK))
+		for p, part in zip(todo, parts):
+			self.entries[p] = {'sig':sigs[p], 'cols':part}
+			self.dirty = True
+		return mergeColumns([self.entries[p]['cols'] for p in paths if sigs[p] and p in self.entries])
+
+	def store(self, store:LogStore, start:float=None, end:float=None) -> dict:
+		''' Return the parsed columns of the records of a log store in a time window. Only the segments that may contain
+		requests in the window are considered, and only new or changed segments (e.g., the active segment) are read
+		@param store: Log store
+		@type store: LogStore
+		@param start: If specified, only requests that end at or after this time are returned
+		@type start: float
+		@param end: If specified, only requests that start at or before this time are returned
+		@type end: float
+		@return: Parsed columns of the records
+		@rtype: dict
+		'''
+
+		parts = []
+		for name in store.segments(start=start, end=end):
+			path = store.segmentPath(name)
+			sig = self.signature(path)
+			if not sig and not name.endswith('.gz'):  # The segment has been rotated (i.e., compressed) since it was listed
+				name = name + '.gz'
+				path = store.segmentPath(name)
+				sig = self.signature(path)
+			if not sig:
+				continue
+			if path not in self.entries or self.entries[path]['sig'] != sig:
+				self.entries[path] = {'sig':sig, 'cols':parseReqRecords(store.readSegment(name))}
+				self.dirty = True
+			parts.append(self.entries[path]['cols'])
+		return windowColumns(mergeColumns(parts), start, end)
+
+
+def analysisFrame(cols:dict) -> pd.DataFrame:
+	''' Build the analysis DataFrame from parsed columns, and add the derived columns:
+	- cmp_time: Computation time of each service (iteration)
+	- base_service, iteration (parsed): Service as named in the request, and iteration number, as logged by the VIFI Node (iteration is missing for older logs)
+	- queue_wait: Time between the end of the previous service of the request (or the start of the request) and the start of the service
+	- iter_duration: Time between the end of the previous iteration of the same service and the end of this iteration (the computation time for the first iteration), including result handling between iterations
+	- s3_time, nifi_time, sftp_time: Time between the end of the service and the (latest) transfer of its results to each kind of destination
+	@param cols: Parsed columns (see @parseReqLogs)
+	@type cols: dict
+	@return: Analysis results
+	@rtype: pandas.DataFrame
+	'''
+
+	df = pd.DataFrame({c:cols[c] for c in LOG_COLUMNS}, columns=list(LOG_COLUMNS))
+	df['cmp_time'] = df['end'] - df['start']
+	df['iteration'] = df['iteration'].astype('Int64')
+
+	df = df.sort_values(['request', 'start'], kind='stable')
+	prev_end = df.groupby('request', sort=False)['end'].shift(1)
+	df['queue_wait'] = df['start'] - prev_end.fillna(df['req_start'])
+	prev_iter_end = df.groupby(['request', 'base_service'], sort=False)['end'].shift(1)
+	df['iter_duration'] = (df['end'] - prev_iter_end).fillna(df['cmp_time'])
+	for t in ('s3', 'nifi', 'sftp'):
+		df[t + '_time'] = df[t + '_sent'] - df['end']
+	return df.sort_index()
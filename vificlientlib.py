@@ -1,6 +1,8 @@
 from flask import Flask, request
 from flask_restful import Api, Resource, reqparse
-import yaml, os, traceback
+import os, traceback
+from vificonf import loadYAML, dumpYAML, ConfLock, confVersion
+from vifireq import compileCondition
 from _io import TextIOWrapper
 from builtins import isinstance
 
@@ -9,6 +11,8 @@ api = Api(app)
 
 failureRequestKey='Error' # This is the key of the returned response dictionary in case of failure
 successRequestKey='Success' # This is the key of the returned response dictionary in case of success
+transferKinds={'nifi':'NiFi','sftp':'SFTP','s3':'S3'} # Transfer sections of a service, and their display names
+transferTargetKeys={'nifi':'target_uri','sftp':'host','s3':'bucket'} # Key identifying the target of each transfer section
 
 def load_conf(infile:str, flog:TextIOWrapper=None) -> dict:
     ''' Loads user configuration file.
@@ -22,8 +26,7 @@ def load_conf(infile:str, flog:TextIOWrapper=None) -> dict:
 
     try:
         if infile and os.path.isfile(infile):
-            with open(infile, 'r') as f:
-                return yaml.load(f)
+            return loadYAML(infile)
         else:
             print('Error: No user configuration file is specified')
             return None
@@ -36,9 +39,25 @@ def load_conf(infile:str, flog:TextIOWrapper=None) -> dict:
             print(result)
             traceback.print_exc()
 
+def getConfPathFromReqArgs(reqargs:dict) -> str:
+    ''' Return the path of the user configuration file based on request arguments, or the local configuration file 
+    if request has no path argument.
+    @param reqargs: Request arguments
+    @type reqargs: dict
+    @return: Path of the user configuration file
+    @rtype: str
+    '''
+    
+    if reqargs and 'path' in reqargs:
+        return reqargs['path']
+    else:
+        return 'conf.yml'
+
 def getConfFromReqArgs(reqargs:dict,flog:TextIOWrapper=None) -> dict:
     ''' Loads the user configuration file based on request arguments, or loads the local configuration file if 
-    request has no path argument.
+    request has no path argument. The configuration is served from the configuration cache, and is parsed again only 
+    if the file has changed. Thus, the returned configuration is shared and must not be modified (use updateConf to 
+    modify the configuration file).
     @param reqargs: Request arguments
     @type args: dict
     @param flog: Log file to record raised events
@@ -47,16 +66,92 @@ def getConfFromReqArgs(reqargs:dict,flog:TextIOWrapper=None) -> dict:
     @rtype: dict
     '''
     
-    if 'path' in reqargs:   # Load user configuration file from specified path
-        if os.path.isfile(reqargs['path']):
-            return {successRequestKey:load_conf(reqargs['path'])}
-        else:
-            return {failureRequestKey:'Could not find user configuration file at the specified path'}
-    elif os.path.isfile("conf.yml"):    # If no path is specified for user configuration file, then set path to default location which is 'conf.yml'
-        return {successRequestKey:load_conf("conf.yml")}
+    path=getConfPathFromReqArgs(reqargs)
+    if os.path.isfile(path):
+        return {successRequestKey:loadYAML(path,copy_conf=False)}
+    elif reqargs and 'path' in reqargs:
+        return {failureRequestKey:'Could not find user configuration file at the specified path'}
     else:
         return {failureRequestKey:'Could not find user configuration file'}
 
+def updateConf(reqargs:dict,update,flog:TextIOWrapper=None) -> dict:
+    ''' Modify the user configuration file specified by request arguments. The whole read-modify-write cycle holds the 
+    lock of the configuration file, so concurrent writers (e.g., other REST calls, or the VIFI Node) do not lose updates. 
+    If request arguments have a 'version' key, the update is rejected if the configuration file has been modified since 
+    that version (see the 'conf_version' REST call).
+    @param reqargs: Request arguments
+    @type reqargs: dict
+    @param update: Function that receives a private copy of the configuration, modifies it in place, and returns a 
+    success or failure message. The configuration file is written only if the update succeeds
+    @type update: function
+    @param flog: Log file to record raised events
+    @type flog: TextIOWrapper (file object) 
+    @return: Success, or failure message of the update
+    @rtype: dict
+    '''
+    
+    path=getConfPathFromReqArgs(reqargs)
+    if not os.path.isfile(path):
+        return {failureRequestKey:'Could not find user configuration file'}
+    try:
+        with ConfLock(path) as lock:
+            if reqargs and 'version' in reqargs and str(reqargs['version'])!=str(lock.version):
+                return {failureRequestKey:'Configuration file has been modified since version '+str(reqargs['version'])+'. Current version is '+str(lock.version)}
+            conf=loadYAML(path)
+            res=update(conf)
+            if successRequestKey in res:
+                dumpYAML(conf,path,default_flow_style=None)
+                lock.bump()
+            return res
+    except:
+        result = 'Error: "updateConf" function has error(vifi_server): '
+        if flog:
+            flog.write(result)
+            traceback.print_exc(file=flog)
+        else:
+            print(result)
+            traceback.print_exc()
+        return {failureRequestKey:'Could not update the user configuration file'}
+
+def getTransfersFromConf(conf:dict,reqargs:dict,kind:str) -> dict:
+    ''' Return transfers of a specific kind (i.e., 'nifi', 'sftp' or 's3') of the service specified by request arguments
+    @param conf: User configuration
+    @type conf: dict
+    @param reqargs: Request arguments including the service name
+    @type reqargs: dict
+    @param kind: Kind of transfers (i.e., 'nifi', 'sftp' or 's3')
+    @type kind: str
+    @return: Transfer configurations of specified service
+    @rtype: dict
+    '''
+    
+    if 'service' not in reqargs:
+        return {failureRequestKey:'No service is specified in request arguments'}
+    if 'services' not in conf:
+        return {failureRequestKey:'Could not find any service in the specified user configuration file'}
+    if reqargs['service'] not in conf['services']:
+        return {failureRequestKey:'Could not find specified service'}
+    ser=conf['services'][reqargs['service']]
+    if kind in ser:
+        return {successRequestKey:ser[kind]}
+    else:
+        return {failureRequestKey:'Could not find '+transferKinds[kind]+' transfers for the specified service'}
+
+def checkCondition(condition) -> str:
+    ''' Check a transfer condition before it is stored in a configuration file. A malformed condition would make the 
+    whole configuration file malformed for the VIFI Node
+    @param condition: Transfer condition
+    @type condition: str
+    @return: Error message if the condition is malformed. Otherwise, an empty string
+    @rtype: str
+    '''
+    
+    try:
+        compileCondition(str(condition))
+    except ValueError as e:
+        return str(e)
+    return ''
+
 def getServices(reqargs:dict,flog:TextIOWrapper=None)->dict:
     ''' Return configurations for all services in the specified configuration.
     @param reqargs: Request arguments
@@ -188,31 +283,22 @@ def setNiFiTransferResults(reqargs:dict,flog:TextIOWrapper=None)->dict:
     if not isinstance(reqargs['results'],list):
         return {failureRequestKey:'Results should be in a list'}
     
-    # Extract all nifi transfers in the configuration file 
-    nifitransfers=getNiFiTransfers(reqargs, flog)
-    if successRequestKey in nifitransfers:
-        nifitransfers=nifitransfers[successRequestKey]
+    def update(conf):
+        # Extract all nifi transfers in the configuration file 
+        nifitransfers=getTransfersFromConf(conf, reqargs, 'nifi')
+        if successRequestKey not in nifitransfers:
+            # Something went wrong in extracting nifi transfers. Just return the error
+            return nifitransfers
         # Extract the nifi transfer with the specific target
-        for nifitransfer in nifitransfers:
+        for nifitransfer in nifitransfers[successRequestKey]:
             if nifitransfer['target_uri']==target:
                 nifitransfer['results']=reqargs['results']
-                # Get the path of the configuration file
-                if 'path' in reqargs:
-                    path=reqargs['path']
-                else:
-                    path='conf.yml'
-                # Update the configuration file
-                with open(path,'r') as f:
-                    conf=yaml.load(f)
-                with open(path,'w') as f:
-                    conf['services'][reqargs['service']]['nifi']=nifitransfers
-                    yaml.dump(conf,f)   
                 return {successRequestKey:'Results for nifi transfer with target '+reqargs['target']+' have been updated'}
         # If no nifi transfer exists with the specified target, then return an error
-        return {failureRequestKey:'No nifi with the specified target exists'}    
-    # Something went wrong in extracting nifi transfers. Just return the error    
-    else:
-        return nifitransfers
+        return {failureRequestKey:'No nifi with the specified target exists'}
+    
+    # Update the configuration file
+    return updateConf(reqargs, update, flog)
 
 def setSFTPTransferResults(reqargs:dict,flog:TextIOWrapper=None)->dict:
     ''' Change results sent to SFTP.
@@ -246,32 +332,26 @@ def setSFTPTransferCondition(reqargs:dict,flog:TextIOWrapper=None)->dict:
     # Check if results argument is specified
     if 'condition' not in reqargs:
         return {failureRequestKey:'No conditions are specified'}
+    error=checkCondition(reqargs['condition'])
+    if error:
+        return {failureRequestKey:'Invalid condition: '+error}
     
-    # Extract all SFTP transfers in the configuration file 
-    sftptransfers=getSFTPTransfers(reqargs, flog)
-    if successRequestKey in sftptransfers:
-        sftptransfers=sftptransfers[successRequestKey]
+    def update(conf):
+        # Extract all SFTP transfers in the configuration file 
+        transfers=getTransfersFromConf(conf, reqargs, 'sftp')
+        if successRequestKey not in transfers:
+            # Something went wrong in extracting SFTP transfers. Just return the error
+            return transfers
         # Extract the SFTP transfer with the specific target
-        for sftptransfer in sftptransfers:
-            if sftptransfer['host']==target:
-                sftptransfer['transfer']={'condition':reqargs['condition']}
-                # Get the path of the configuration file
-                if 'path' in reqargs:
-                    path=reqargs['path']
-                else:
-                    path='conf.yml'
-                # Update the configuration file
-                with open(path,'r') as f:
-                    conf=yaml.load(f)
-                with open(path,'w') as f:
-                    conf['services'][reqargs['service']]['sftp']=sftptransfers
-                    yaml.dump(conf,f)   
+        for transfer in transfers[successRequestKey]:
+            if transfer['host']==target:
+                transfer['transfer']={'condition':reqargs['condition']}
                 return {successRequestKey:'Condition for SFTP transfer with target '+reqargs['target']+' has been updated'}
         # If no SFTP transfer exists with the specified target, then return an error
-        return {failureRequestKey:'No SFTP with the specified target exists'}    
-    # Something went wrong in extracting SFTP transfers. Just return the error    
-    else:
-        return sftptransfers
+        return {failureRequestKey:'No SFTP with the specified target exists'}
+    
+    # Update the configuration file
+    return updateConf(reqargs, update, flog)
 
 def setNiFiTransferCondition(reqargs:dict,flog:TextIOWrapper=None)->dict:
     ''' Change the transfer condition of the specified NiFi destination.
@@ -292,33 +372,27 @@ def setNiFiTransferCondition(reqargs:dict,flog:TextIOWrapper=None)->dict:
     # Check if results argument is specified
     if 'condition' not in reqargs:
         return {failureRequestKey:'No conditions are specified'}
+    error=checkCondition(reqargs['condition'])
+    if error:
+        return {failureRequestKey:'Invalid condition: '+error}
     
-    # Extract all SFTP transfers in the configuration file 
-    transfers=getNiFiTransfers(reqargs, flog)
-    if successRequestKey in transfers:
-        transfers=transfers[successRequestKey]
+    def update(conf):
+        # Extract all NiFi transfers in the configuration file 
+        transfers=getTransfersFromConf(conf, reqargs, 'nifi')
+        if successRequestKey not in transfers:
+            # Something went wrong in extracting NiFi transfers. Just return the error
+            return transfers
         # Extract the NiFi transfer with the specific target
-        for transfer in transfers:
+        for transfer in transfers[successRequestKey]:
             if transfer['target_uri']==target:
                 transfer['transfer']={'condition':reqargs['condition']}
-                # Get the path of the configuration file
-                if 'path' in reqargs:
-                    path=reqargs['path']
-                else:
-                    path='conf.yml'
-                # Update the configuration file
-                with open(path,'r') as f:
-                    conf=yaml.load(f)
-                with open(path,'w') as f:
-                    conf['services'][reqargs['service']]['nifi']=transfers
-                    yaml.dump(conf,f)   
                 return {successRequestKey:'Condition for NiFi transfer with target '+reqargs['target']+' has been updated'}
         # If no NiFi transfer exists with the specified target, then return an error
-        return {failureRequestKey:'No NiFi with the specified target exists'}    
-    # Something went wrong in extracting SFTP transfers. Just return the error    
-    else:
-        return transfers
+        return {failureRequestKey:'No NiFi with the specified target exists'}
     
+    # Update the configuration file
+    return updateConf(reqargs, update, flog)
+
 def setNiFiTransferResultsConditions(reqargs:dict,flog:TextIOWrapper=None)->dict:
     ''' Change NiFi results and/or conditions for a specific service. If results and/or conditions are not 
     specified for a specific section, then keep the existing results and/or conditions. Otherwise, current results 
@@ -336,52 +410,45 @@ def setNiFiTransferResultsConditions(reqargs:dict,flog:TextIOWrapper=None)->dict
         return {failureRequestKey:"Input request arguments have no NiFi section"}
     if not isinstance(reqargs['nifi'],list):
         return {failureRequestKey:"Input NiFi section should be in list form"}
+    for sec in reqargs['nifi']:
+        if isinstance(sec,dict) and 'condition' in sec:
+            error=checkCondition(sec['condition'])
+            if error:
+                return {failureRequestKey:'Invalid condition for section '+str(sec)+': '+error}
     
-    # Extract the NiFi settings from the user configuration file    
-    nifitransfers=getNiFiTransfers(reqargs, flog)
-    if successRequestKey in nifitransfers:
-        nifitransfers=nifitransfers[successRequestKey]    
+    def update(conf):
+        # Extract the NiFi settings from the user configuration file    
+        transfers=getTransfersFromConf(conf, reqargs, 'nifi')
+        if successRequestKey not in transfers:
+            # Something went wrong in extracting NiFi transfers. Just return the error
+            return transfers
         # Traverse required input settings
         for sec in reqargs['nifi']:
             # Check if target argument is specified
-            if 'target' in sec:
-                target=sec['target']
-                # Extract the required nifi transfer
-                nifitransfer={}
-                for nifitransfer in nifitransfers:
-                    if nifitransfer['target_uri']==target:
-                        # Change the condition in the extracted NiFi if any
-                        if 'condition' in sec:
-                            nifitransfer['transfer']['condition']=sec['condition']
-                        # Change the results in the extracted NiFi if any
-                        if 'results' in sec:
-                            if isinstance(sec['results'],list):
-                                nifitransfer['results']=sec['results']
-                            else:
-                                return {failureRequestKey:'Results should be in a list'}
-                        # Exit loop
-                        break
-                # If no NiFi section was found with required target, then inform the user that it does not exist
-                if not nifitransfer:
-                    return {failureRequestKey:'The specified NiFi target, '+str(target)+", was not found in current configuration"+os.linesep}
+            if 'target' not in sec:
+                return {failureRequestKey:'No target NiFi is specified for section '+str(sec)}
+            target=sec['target']
+            # Extract the required NiFi transfer
+            for transfer in transfers[successRequestKey]:
+                if transfer['target_uri']==target:
+                    # Change the condition in the extracted NiFi if any
+                    if 'condition' in sec:
+                        transfer.setdefault('transfer',{})['condition']=sec['condition']
+                    # Change the results in the extracted NiFi if any
+                    if 'results' in sec:
+                        if isinstance(sec['results'],list):
+                            transfer['results']=sec['results']
+                        else:
+                            return {failureRequestKey:'Results should be in a list'}
+                    # Exit loop
+                    break
             else:
-                return {failureRequestKey:'No target NiFi is specified for section '+str(sec)} 
-        
-        # Get the path of the configuration file
-        if 'path' in reqargs:
-            path=reqargs['path']
-        else:
-            path='conf.yml'
-        # Update the configuration file
-        with open(path,'r') as f:
-            conf=yaml.load(f)
-        with open(path,'w') as f:
-            conf['services'][reqargs['service']]['nifi']=nifitransfers
-            yaml.dump(conf,f)   
-        return {successRequestKey:'Results and/or conditions for nifi transfer have been updated'+os.linesep}
-       
-    else:   # Something went wrong in extracting nifi transfers. Just return the error 
-        return nifitransfers
+                # If no NiFi section was found with required target, then inform the user that it does not exist
+                return {failureRequestKey:'The specified NiFi target, '+str(target)+", was not found in current configuration"+os.linesep}
+        return {successRequestKey:'Results and/or conditions for NiFi transfer have been updated'+os.linesep}
+    
+    # Update the configuration file. Nothing is written if any section fails
+    return updateConf(reqargs, update, flog)
 
 def setSFTPTransferResultsConditions(reqargs:dict,flog:TextIOWrapper=None)->dict:
     ''' Change SFTP results and/or conditions for a specific service. If results and/or conditions are not 
@@ -400,52 +467,108 @@ def setSFTPTransferResultsConditions(reqargs:dict,flog:TextIOWrapper=None)->dict
         return {failureRequestKey:"Input request arguments have no SFTP section"}
     if not isinstance(reqargs['sftp'],list):
         return {failureRequestKey:"Input SFTP section should be in list form"}
+    for sec in reqargs['sftp']:
+        if isinstance(sec,dict) and 'condition' in sec:
+            error=checkCondition(sec['condition'])
+            if error:
+                return {failureRequestKey:'Invalid condition for section '+str(sec)+': '+error}
     
-    # Extract the SFTP settings from the user configuration file    
-    transfers=getSFTPTransfers(reqargs, flog)
-    if successRequestKey in transfers:
-        transfers=transfers[successRequestKey]    
+    def update(conf):
+        # Extract the SFTP settings from the user configuration file    
+        transfers=getTransfersFromConf(conf, reqargs, 'sftp')
+        if successRequestKey not in transfers:
+            # Something went wrong in extracting SFTP transfers. Just return the error
+            return transfers
         # Traverse required input settings
         for sec in reqargs['sftp']:
             # Check if target argument is specified
-            if 'target' in sec:
-                target=sec['target']
-                # Extract the required nifi transfer
-                transfer={}
-                for transfer in transfers:
-                    if transfer['host']==target:
-                        # Change the condition in the extracted NiFi if any
-                        if 'condition' in sec:
-                            transfer['transfer']['condition']=sec['condition']
-                        # Change the results in the extracted NiFi if any
-                        if 'results' in sec:
-                            if isinstance(sec['results'],list):
-                                transfer['results']=sec['results']
-                            else:
-                                return {failureRequestKey:'Results should be in a list'}
-                        # Exit loop
-                        break
-                # If no SFTP section was found with required target, then inform the user that it does not exist
-                if not transfer:
-                    return {failureRequestKey:'The specified NiFi target, '+str(target)+", was not found in current configuration"+os.linesep}
+            if 'target' not in sec:
+                return {failureRequestKey:'No target SFTP is specified for section '+str(sec)}
+            target=sec['target']
+            # Extract the required SFTP transfer
+            for transfer in transfers[successRequestKey]:
+                if transfer['host']==target:
+                    # Change the condition in the extracted SFTP if any
+                    if 'condition' in sec:
+                        transfer.setdefault('transfer',{})['condition']=sec['condition']
+                    # Change the results in the extracted SFTP if any
+                    if 'results' in sec:
+                        if isinstance(sec['results'],list):
+                            transfer['results']=sec['results']
+                        else:
+                            return {failureRequestKey:'Results should be in a list'}
+                    # Exit loop
+                    break
             else:
-                return {failureRequestKey:'No target SFTP is specified for section '+str(sec)} 
-        
-        # Get the path of the configuration file
-        if 'path' in reqargs:
-            path=reqargs['path']
-        else:
-            path='conf.yml'
-        # Update the configuration file
-        with open(path,'r') as f:
-            conf=yaml.load(f)
-        with open(path,'w') as f:
-            conf['services'][reqargs['service']]['sftp']=transfers
-            yaml.dump(conf,f)   
+                # If no SFTP section was found with required target, then inform the user that it does not exist
+                return {failureRequestKey:'The specified SFTP target, '+str(target)+", was not found in current configuration"+os.linesep}
         return {successRequestKey:'Results and/or conditions for SFTP transfer have been updated'+os.linesep}
-       
-    else:   # Something went wrong in extracting nifi transfers. Just return the error 
-        return transfers
+    
+    # Update the configuration file. Nothing is written if any section fails
+    return updateConf(reqargs, update, flog)
+
+def setTransfersBatch(reqargs:dict,flog:TextIOWrapper=None)->dict:
+    ''' Change results and/or conditions of several transfers, across services and NiFi/SFTP/S3 sections, in one 
+    transaction. All operations are validated first, then applied to one copy of the configuration which is written 
+    once. If any operation fails, the configuration file is not changed.
+    @param reqargs: Request arguments. The 'ops' key holds a list of operations. Each operation is a dictionary of 
+    'service', 'section' (i.e., 'nifi', 'sftp' or 's3'), 'target' (i.e., target_uri for NiFi, host for SFTP, or bucket 
+    for S3, which can be omitted for S3), and at least one of 'results' (list) and 'condition' (str)
+    @type reqargs: dict
+    @param flog: Log file to record raised events
+    @type flog: TextIOWrapper (file object) 
+    @return: Message of success or failure of the whole batch
+    @rtype: dict  
+    '''
+    
+    # Validate all operations before touching the configuration file
+    if not reqargs or 'ops' not in reqargs:
+        return {failureRequestKey:'Input request arguments have no operations (ops) section'}
+    if not isinstance(reqargs['ops'],list) or not reqargs['ops']:
+        return {failureRequestKey:'Input operations should be in a non-empty list'}
+    for i,op in enumerate(reqargs['ops']):
+        if not isinstance(op,dict):
+            return {failureRequestKey:'Operation '+str(i)+' should be a dictionary'}
+        if 'service' not in op:
+            return {failureRequestKey:'No service is specified for operation '+str(i)}
+        if op.get('section') not in transferKinds:
+            return {failureRequestKey:'Section of operation '+str(i)+' should be one of '+', '.join(transferKinds)}
+        if 'target' not in op and op['section']!='s3':
+            return {failureRequestKey:'No target '+transferKinds[op['section']]+' is specified for operation '+str(i)}
+        if 'results' not in op and 'condition' not in op:
+            return {failureRequestKey:'No results or conditions are specified for operation '+str(i)}
+        if 'results' in op and not isinstance(op['results'],list):
+            return {failureRequestKey:'Results of operation '+str(i)+' should be in a list'}
+        if 'condition' in op:
+            error=checkCondition(op['condition'])
+            if error:
+                return {failureRequestKey:'Invalid condition for operation '+str(i)+': '+error}
+    
+    def update(conf):
+        for i,op in enumerate(reqargs['ops']):
+            # Extract the transfers of the specified section
+            transfers=getTransfersFromConf(conf, op, op['section'])
+            if successRequestKey not in transfers:
+                return {failureRequestKey:'Operation '+str(i)+': '+transfers[failureRequestKey]}
+            transfers=transfers[successRequestKey]
+            if isinstance(transfers,dict):  # The S3 section is a single transfer
+                transfers=[transfers]
+            # Extract the transfer with the specified target
+            for transfer in transfers:
+                if 'target' not in op or transfer.get(transferTargetKeys[op['section']])==op['target']:
+                    if 'condition' in op:
+                        if not isinstance(transfer.get('transfer'),dict):
+                            transfer['transfer']={}
+                        transfer['transfer']['condition']=op['condition']
+                    if 'results' in op:
+                        transfer['results']=op['results']
+                    break
+            else:
+                return {failureRequestKey:'Operation '+str(i)+': The specified '+transferKinds[op['section']]+' target, '+str(op.get('target'))+', was not found in current configuration'}
+        return {successRequestKey:str(len(reqargs['ops']))+' transfer operations have been applied'+os.linesep}
+    
+    # Apply all operations with a single write of the configuration file
+    return updateConf(reqargs, update, flog)
 
 def testVIFIClientRestAPI(reqargs:list,flog:TextIOWrapper=None)->dict:
     ''' Test method for the developed REST APIs that print the contents 
@@ -490,6 +613,9 @@ class User(Resource):
             else:
                 return services[failureRequestKey], 404
             
+        elif name.lower()=='conf_version':  # Return the version of the user configuration file, which is incremented by each update
+            return confVersion(getConfPathFromReqArgs(request.get_json())), 200
+            
         elif name.lower()=='current_service':  # Return the name of the current service
             services=getCurrentService(request.get_json())
             if successRequestKey in services:
@@ -570,7 +696,14 @@ class User(Resource):
             if successRequestKey in res:
                 return res[successRequestKey], 200
             else:
-                return res[failureRequestKey],404        
+                return res[failureRequestKey],404
+        
+        elif name.lower()=='batchtransfers':   # Change results and/or conditions of several NiFi/SFTP/S3 transfers in one transaction
+            res=setTransfersBatch(request.get_json())
+            if successRequestKey in res:
+                return res[successRequestKey], 200
+            else:
+                return res[failureRequestKey],404
         else:
             return 'No valid operation has been specified', 404        
 
@@ -0,0 +1,308 @@
+'''
+Created on Oct 19, 2026
+
+Shared configuration loading layer for VIFI Nodes and VIFI clients. YAML files are parsed with the libyaml based
+loader/dumper if available (falling back to the pure Python ones), and parsed files are kept in an in-process cache
+keyed by path, modification time, size and inode. Thus, the same configuration file is parsed only once until it changes.
+YAML files are written atomically (write to a temporary file, then rename), so readers never see partially written files,
+and writers of the same configuration file are serialized by an advisory file lock (see ConfLock).
+
+@author: Mohammed Elshambakey
+@contact: shambakey1@gmail.com
+'''
+
+import os, copy, threading, tempfile, traceback, fcntl, yaml
+from _io import TextIOWrapper
+from collections import OrderedDict
+
+try:
+	from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+	from yaml import SafeLoader, SafeDumper
+
+_cache = OrderedDict()  # Parsed YAML files. Key is the absolute file path. Value is a tuple of (file signature, parsed YAML)
+_cache_lock = threading.Lock()  # Protects @_cache as VIFI functionalities may run in different threads
+_cache_max = 256  # Maximum number of cached files. Least recently used files are evicted first
+_umask = os.umask(0)  # Process umask. Used to set the permissions of newly created files
+os.umask(_umask)
+
+
+def fileSignature(infile:str) -> tuple:
+	''' Return the signature of a file that changes whenever the file is modified or replaced
+	@param infile: Path of the file
+	@type infile: str
+	@return: Tuple of (modification time in nanoseconds, size, inode), or None if the file does not exist
+	@rtype: tuple
+	'''
+
+	try:
+		st = os.stat(infile)
+	except OSError:
+		return None
+	return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def loadYAML(infile:str, copy_conf:bool=True):
+	''' Load YAML file through the configuration cache. The file is parsed only if it is not cached, or if it has
+	changed since it was cached.
+	@param infile: Path and name of the YAML file
+	@type infile: str
+	@param copy_conf: If True, return a private (deep) copy that the caller can modify. Otherwise, return the cached
+	object itself, which must be treated as read-only by the caller
+	@type copy_conf: bool
+	@return: Parsed YAML file, or None if the file does not exist
+	@rtype: dict
+	'''
+
+	path = os.path.abspath(infile)
+	sig = fileSignature(path)
+	if not sig:
+		return None
+
+	with _cache_lock:
+		if path in _cache and _cache[path][0] == sig:
+			_cache.move_to_end(path)
+			conf = _cache[path][1]
+		else:
+			conf = None
+
+	if conf is None:
+		with open(path, 'r') as f:
+			conf = yaml.load(f, Loader=SafeLoader)
+		_store(path, sig, conf)
+
+	return copy.deepcopy(conf) if copy_conf else conf
+
+
+def dumpYAML(conf, outfile:str, fsync:bool=False, **kwargs) -> None:
+	''' Dump configuration into YAML file atomically, and refresh the cached entry of the file. The configuration is
+	written to a temporary file in the same directory, which then replaces the output file. Thus, readers see either the
+	old or the new file, and a crash cannot leave a truncated file.
+	@param conf: Configuration to be dumped
+	@type conf: dict
+	@param outfile: Path and name of the output YAML file
+	@type outfile: str
+	@param fsync: If True, flush the written file (and its directory) to disk before returning
+	@type fsync: bool
+	@param kwargs: Additional arguments to the YAML dumper. Block style is used by default
+	@type kwargs: dict
+	'''
+
+	kwargs.setdefault('default_flow_style', False)
+	out_dir = os.path.dirname(os.path.abspath(outfile))
+	fd, tmp = tempfile.mkstemp(prefix='.' + os.path.basename(outfile) + '.', suffix='.tmp', dir=out_dir)
+	try:
+		with os.fdopen(fd, 'w') as f:
+			yaml.dump(conf, f, Dumper=SafeDumper, **kwargs)
+			if fsync:
+				f.flush()
+				os.fsync(f.fileno())
+		# Keep the permissions of the replaced file (mkstemp creates files readable by the owner only)
+		try:
+			os.chmod(tmp, os.stat(outfile).st_mode & 0o7777)
+		except OSError:
+			os.chmod(tmp, 0o666 & ~_umask)
+		os.replace(tmp, outfile)
+	except:
+		if os.path.exists(tmp):
+			os.remove(tmp)
+		raise
+	if fsync:
+		dfd = os.open(out_dir, os.O_RDONLY)
+		try:
+			os.fsync(dfd)
+		finally:
+			os.close(dfd)
+	_store(os.path.abspath(outfile), fileSignature(outfile), copy.deepcopy(conf))
+
+
+def invalidateYAML(infile:str=None) -> None:
+	''' Remove a file from the configuration cache, or clear the whole cache if no file is specified
+	@param infile: Path of the file to be removed from the cache
+	@type infile: str
+	'''
+
+	with _cache_lock:
+		if infile:
+			_cache.pop(os.path.abspath(infile), None)
+		else:
+			_cache.clear()
+
+
+def _store(path:str, sig:tuple, conf) -> None:
+	''' Store parsed file in the configuration cache, and evict least recently used entries if required '''
+
+	if not sig:
+		return
+	with _cache_lock:
+		_cache[path] = (sig, conf)
+		_cache.move_to_end(path)
+		while len(_cache) > _cache_max:
+			_cache.popitem(last=False)
+
+
+class ConfLock():
+	''' Advisory lock of a configuration file, used as a context manager by all writers of the configuration file (e.g.,
+	the VIFI Node and the VIFI client REST API), so that concurrent read-modify-write cycles do not lose updates. The lock
+	is taken on a side file (e.g., '.conf.yml.lock' for 'conf.yml') which also keeps a version counter of the configuration
+	file. The version is incremented by each locked write (see @bump).
+	'''
+
+	def __init__(self, conffile:str):
+		'''
+		@param conffile: Path of the configuration file to lock
+		@type conffile: str
+		'''
+
+		self.lockfile = lockPath(conffile)
+		self.fd = None
+
+	def __enter__(self):
+		self.fd = os.open(self.lockfile, os.O_RDWR | os.O_CREAT, 0o666 & ~_umask)
+		fcntl.flock(self.fd, fcntl.LOCK_EX)
+		return self
+
+	def __exit__(self, exc_type, exc_value, tb):
+		try:
+			fcntl.flock(self.fd, fcntl.LOCK_UN)
+		finally:
+			os.close(self.fd)
+			self.fd = None
+		return False
+
+	@property
+	def version(self) -> int:
+		''' Current version of the locked configuration file '''
+
+		os.lseek(self.fd, 0, os.SEEK_SET)
+		data = os.read(self.fd, 32).strip()
+		return int(data) if data.isdigit() else 0
+
+	def bump(self) -> int:
+		''' Increment the version of the locked configuration file after it has been written
+		@return: New version
+		@rtype: int
+		'''
+
+		version = self.version + 1
+		os.ftruncate(self.fd, 0)
+		os.lseek(self.fd, 0, os.SEEK_SET)
+		os.write(self.fd, str(version).encode())
+		return version
+
+
+def lockPath(conffile:str) -> str:
+	''' Return the path of the lock (and version) side file of a configuration file '''
+
+	return os.path.join(os.path.dirname(os.path.abspath(conffile)), '.' + os.path.basename(conffile) + '.lock')
+
+
+def confVersion(conffile:str) -> int:
+	''' Return the current version of a configuration file without locking it. Version 0 means the file has not been
+	written by a locked writer yet
+	@param conffile: Path of the configuration file
+	@type conffile: str
+	@return: Version of the configuration file
+	@rtype: int
+	'''
+
+	try:
+		with open(lockPath(conffile), 'r') as f:
+			data = f.read(32).strip()
+	except OSError:
+		return 0
+	return int(data) if data.isdigit() else 0
+
+
+class ConfWriter():
+	''' Write-behind persistence of configuration files. Updates of a configuration file are kept in memory and
+	coalesced, and the latest update is written atomically (see @dumpYAML) only at the configured flush points. Thus, the
+	serialization of the configuration is removed from the hot path (e.g., after each service iteration). Writes hold the
+	lock of the configuration file (see ConfLock). If the file has been modified by another writer since it was last
+	written by this writer, and the pending update has a mergeFrom() method (e.g., vifireq.Request), then the external
+	modifications are merged first, so they are not lost. If the modified file cannot be merged (i.e., mergeFrom() raises
+	ValueError because the file is malformed), the file is kept as it is, and the update stays pending until it can be merged.
+	'''
+
+	def __init__(self, flush_points:list=None, fsync:bool=False):
+		'''
+		@param flush_points: Points at which pending updates are written. 'iteration' writes after each service iteration,
+		while 'service' writes when the current service of the request changes. Defaults to ['service']
+		@type flush_points: list
+		@param fsync: If True, written files are flushed to disk
+		@type fsync: bool
+		'''
+
+		self.flush_points = set(flush_points if flush_points is not None else ['service'])
+		self.fsync = fsync
+		self.pending = {}  # Pending updates. Key is the output file. Value is either a dictionary, or an object with a toDict() method (e.g., vifireq.Request)
+		self.signatures = {}  # Signatures of files as last written by this writer. Used to detect modifications by other writers
+		self.lock = threading.Lock()
+
+	def update(self, outfile:str, conf, point:str=None, flog:TextIOWrapper=None) -> None:
+		''' Record an update of a configuration file. The update is written if @point is one of the configured flush points
+		@param outfile: Path of the configuration file
+		@type outfile: str
+		@param conf: Latest configuration. Either a dictionary, or an object with a toDict() method. It is serialized only when flushed
+		@type conf: dict
+		@param point: The point at which the update is made (e.g., 'iteration', 'service')
+		@type point: str
+		@param flog: Log file to record raised events
+		@type flog: TextIOWrapper (file object)
+		'''
+
+		with self.lock:
+			self.pending[outfile] = conf
+		if point in self.flush_points:
+			self.flush(outfile, flog)
+
+	def flush(self, outfile:str=None, flog:TextIOWrapper=None) -> None:
+		''' Write pending updates of the specified configuration file, or of all configuration files if none is specified
+		@param outfile: Path of the configuration file
+		@type outfile: str
+		@param flog: Log file to record raised events
+		@type flog: TextIOWrapper (file object)
+		'''
+
+		try:
+			with self.lock:
+				if outfile:
+					todo = {outfile:self.pending.pop(outfile)} if outfile in self.pending else {}
+				else:
+					todo, self.pending = self.pending, {}
+			for f, conf in todo.items():
+				with ConfLock(f) as lock:
+					sig = fileSignature(f)
+					if sig and sig != self.signatures.get(f) and hasattr(conf, 'mergeFrom'):
+						try:
+							conf.mergeFrom(loadYAML(f))
+						except ValueError as e:
+							# Writing the update would overwrite the external modifications, so the file is kept
+							if flog:
+								flog.write('Error: configuration file ' + f + ' has been modified externally, but cannot be merged (' + str(e) + '). The file is kept, and the pending update is not written\n')
+							else:
+								print('Error: configuration file ' + f + ' has been modified externally, but cannot be merged (' + str(e) + '). The file is kept, and the pending update is not written')
+							with self.lock:
+								self.pending.setdefault(f, conf)
+							continue
+					dumpYAML(conf.toDict() if hasattr(conf, 'toDict') else conf, f, fsync=self.fsync)
+					lock.bump()
+					self.signatures[f] = fileSignature(f)
+		except:
+			result = 'Error: "ConfWriter.flush" function has error(vifi_server): '
+			if flog:
+				flog.write(result)
+				traceback.print_exc(file=flog)
+			else:
+				print(result)
+				traceback.print_exc()
+
+	def forget(self, outfile:str) -> None:
+		''' Forget a configuration file that will not be written by this writer anymore (e.g., the request has finished)
+		@param outfile: Path of the configuration file
+		@type outfile: str
+		'''
+
+		with self.lock:
+			self.pending.pop(outfile, None)
+			self.signatures.pop(outfile, None)
@@ -0,0 +1,615 @@
+'''
+Created on Oct 19, 2026
+
+Docker helpers for VIFI Nodes. The ServiceRegistry keeps an in-process index of the Docker (Swarm) services known to
+the VIFI Node, so that service name checks and lookups do not query the Docker API for each service iteration. The
+WORKER_LOOP runs the iterations of a persistent worker service inside its containers. The ImageCache pulls the images
+allowed by the VIFI Node in the background, so that image pulls are not part of the service start time. The
+ServiceReaper removes finished services according to termination deadlines, and orphaned VIFI services, in the
+background. The AdmissionController admits services only if the Swarm nodes have enough free resources for them.
+
+@author: Mohammed Elshambakey
+@contact: shambakey1@gmail.com
+'''
+
+import time, threading, traceback, heapq
+import docker.models
+from docker.utils import parse_repository_tag
+from concurrent.futures import ThreadPoolExecutor
+from _io import TextIOWrapper
+from typing import List, Set, Callable
+
+REQUEST_LABEL = 'vifi.request'  # Label of VIFI services that records the request of the service
+SET_LABEL = 'vifi.set'  # Label of VIFI services that records the set (i.e., (sub)workflow) of the service
+NODE_LABEL = 'vifi.node'  # Label of VIFI services that records the VIFI Node that created the service
+
+# Shell loop run by each task of a persistent worker service (see vifi.createUserService). The user command is passed as
+# the positional arguments of the loop. The task runs iteration N when the control file 'iter.N.run' appears in the
+# control directory ($VIFI_CTL), and records the exit code of the user command in 'done.N.<task slot>'. The loop ends
+# when the 'stop' control file appears. A restarted task skips the iterations it has already finished.
+WORKER_LOOP = '''n=0
+while [ -f "$VIFI_CTL/done.$n.$TASK_SLOT" ]; do n=$((n+1)); done
+while [ ! -f "$VIFI_CTL/stop" ]; do
+	if [ -f "$VIFI_CTL/iter.$n.run" ]; then
+		"$@"
+		echo $? > "$VIFI_CTL/.done.$n.$TASK_SLOT" && mv "$VIFI_CTL/.done.$n.$TASK_SLOT" "$VIFI_CTL/done.$n.$TASK_SLOT"
+		n=$((n+1))
+	else
+		sleep 0.05
+	fi
+done'''
+WORKER_CTL_DIR = '.vifi_ctl'  # Directory, under the request folder, of the control files of persistent workers
+
+
+class ServiceRegistry():
+	''' Index of Docker services by exact name, and of VIFI-owned services by request and by set. The registry is
+	initialized from one listing of the existing services, then kept up to date by the VIFI Node when it creates or
+	removes services (see @add and @remove), and by a background thread that follows Docker service events (e.g.,
+	services created or removed by other tools). If the event stream breaks, the registry is synchronized again.
+	'''
+
+	def __init__(self):
+		self.client = None  # Docker client used to synchronize the registry and to follow Docker events
+		self.services = {}  # Known services. Key is the service name. Value is a dictionary of 'id', 'request' and 'set'
+		self.requests = {}  # VIFI services of each request. Key is the request. Value is the set of service names
+		self.sets = {}  # VIFI services of each set. Key is the set. Value is the set of service names
+		self.lock = threading.RLock()
+		self.events = None  # Docker events stream followed by @events_thread
+		self.events_thread = None
+		self.stop = False
+
+	def start(self, client:docker.client.DockerClient, flog:TextIOWrapper=None) -> None:
+		''' Synchronize the registry with the existing services, and start following Docker service events. Calling
+		this method again while the registry is running has no effect
+		@param client: Client connection to Docker Engine
+		@type client: docker.client.DockerClient
+		@param flog: Log file to record raised events
+		@type flog: TextIOWrapper (file object)
+		'''
+
+		with self.lock:
+			if self.events_thread and self.events_thread.is_alive():
+				return
+			self.client = client
+			self.stop = False
+			self.sync(flog)
+			self.events_thread = threading.Thread(target=self.followEvents, name='vifi-service-registry', daemon=True)
+			self.events_thread.start()
+
+	def end(self) -> None:
+		''' Stop following Docker service events '''
+
+		self.stop = True
+		if self.events:
+			try:
+				self.events.close()
+			except:
+				pass
+
+	@property
+	def running(self) -> bool:
+		''' True if the registry is synchronized and follows Docker service events '''
+
+		return bool(self.events_thread and self.events_thread.is_alive())
+
+	def sync(self, flog:TextIOWrapper=None) -> None:
+		''' Rebuild the registry from one listing of the existing Docker services
+		@param flog: Log file to record raised events
+		@type flog: TextIOWrapper (file object)
+		'''
+
+		try:
+			services = self.client.services.list()
+			with self.lock:
+				self.services, self.requests, self.sets = {}, {}, {}
+				for x in services:
+					labels = x.attrs.get('Spec', {}).get('Labels') or {}
+					self.add(x.name, x.id, labels.get(REQUEST_LABEL), labels.get(SET_LABEL), labels.get(NODE_LABEL))
+		except:
+			result = 'Error: "ServiceRegistry.sync" function has error(vifi_server): '
+			if flog:
+				flog.write(result)
+				traceback.print_exc(file=flog)
+			else:
+				print(result)
+				traceback.print_exc()
+
+	def followEvents(self) -> None:
+		''' Update the registry from Docker service events until the registry is stopped '''
+
+		since = time.time()
+		while not self.stop:
+			try:
+				self.events = self.client.events(since=since, filters={'type':'service'}, decode=True)
+				for e in self.events:
+					since = e.get('time', since)
+					actor = e.get('Actor', {})
+					name = actor.get('Attributes', {}).get('name')
+					if not name:
+						continue
+					if e.get('Action') == 'create':
+						self.add(name, actor.get('ID'))
+					elif e.get('Action') == 'remove':
+						self.remove(name)
+			except:
+				if self.stop:
+					break
+				# The event stream broke (e.g., Docker daemon restarted). Events may have been missed, so synchronize again
+				time.sleep(1)
+				self.sync()
+
+	def add(self, name:str, ser_id:str=None, request:str=None, dset:str=None, node:str=None) -> None:
+		''' Add a service to the registry, or complete the information of an already registered service
+		@param name: Service name
+		@type name: str
+		@param ser_id: Service ID
+		@type ser_id: str
+		@param request: Request of the service (for VIFI services)
+		@type request: str
+		@param dset: Set (i.e., (sub)workflow) of the service (for VIFI services)
+		@type dset: str
+		@param node: VIFI Node that created the service (for VIFI services)
+		@type node: str
+		'''
+
+		with self.lock:
+			ser = self.services.setdefault(name, {'id':None, 'request':None, 'set':None, 'node':None})
+			ser['id'] = ser_id or ser['id']
+			ser['node'] = node or ser['node']
+			if request:
+				ser['request'] = request
+				self.requests.setdefault(request, set()).add(name)
+			if dset:
+				ser['set'] = dset
+				self.sets.setdefault(dset, set()).add(name)
+
+	def remove(self, name:str) -> None:
+		''' Remove a service from the registry
+		@param name: Service name
+		@type name: str
+		'''
+
+		with self.lock:
+			ser = self.services.pop(name, None)
+			if not ser:
+				return
+			for index, key in ((self.requests, ser['request']), (self.sets, ser['set'])):
+				if key in index:
+					index[key].discard(name)
+					if not index[key]:
+						del index[key]
+
+	def exists(self, name:str) -> bool:
+		''' True if a service with exactly the specified name exists '''
+
+		with self.lock:
+			return name in self.services
+
+	def getService(self, name:str) -> dict:
+		''' Return the registry record (i.e., 'id', 'request', 'set' and 'node') of the specified service, or None if it does not exist '''
+
+		with self.lock:
+			ser = self.services.get(name)
+			return dict(ser) if ser else None
+
+	def getRequestServices(self, request:str) -> Set[str]:
+		''' Return the names of the VIFI services of the specified request '''
+
+		with self.lock:
+			return set(self.requests.get(request, ()))
+
+	def getSetServices(self, dset:str) -> Set[str]:
+		''' Return the names of the VIFI services of the specified set (i.e., (sub)workflow) '''
+
+		with self.lock:
+			return set(self.sets.get(dset, ()))
+
+
+class ServiceReaper():
+	''' Background removal of services. Finished services are scheduled with a termination deadline (see @schedule),
+	and a background thread removes all due services in one batch, so the request processing never waits for Docker
+	removal calls. The reaper also sweeps orphaned VIFI services (e.g., left behind by a crash of the VIFI Node), which
+	are services created by this VIFI Node, for one of the sets it manages, whose request is no longer processed.
+	Services of other VIFI Nodes, of sets this VIFI Node does not run, or without a node label are never swept. Orphans
+	are scheduled according to the termination policy of their set, so services of sets that keep services forever
+	(i.e., 'inf') are not removed.
+	'''
+
+	def __init__(self, registry:ServiceRegistry, sweep_int:float=60):
+		'''
+		@param registry: Registry of existing services. Removed services are removed from the registry as well
+		@type registry: ServiceRegistry
+		@param sweep_int: Time (in seconds) between sweeps of orphaned services. 0 disables the sweep
+		@type sweep_int: float
+		'''
+
+		self.registry = registry
+		self.sweep_int = sweep_int
+		self.client = None
+		self.active = None  # Function that returns the requests currently being processed
+		self.terminate = None  # Function that returns the termination time of services of a set
+		self.node = None  # Name of this VIFI Node (i.e., value of NODE_LABEL of the services it creates)
+		self.managed = None  # Function that returns the sets managed by this VIFI Node
+		self.log_path = None  # Path of the log file of reaper errors
+		self.queue = []  # Heap of (deadline, service name) of scheduled services
+		self.scheduled = {}  # Deadline of each scheduled service. Key is the service name
+		self.cond = threading.Condition()
+		self.thread = None
+		self.stop = False
+
+	def start(self, client:docker.client.DockerClient, active:Callable=None, terminate:Callable=None, node:str=None, \
+			managed:Callable=None, log_path:str=None) -> None:
+		''' Start the reaper thread. Calling this method again while the reaper is running has no effect
+		@param client: Client connection to Docker Engine
+		@type client: docker.client.DockerClient
+		@param active: Function that returns the set of requests currently being processed. If not specified, orphaned services are not swept
+		@type active: function
+		@param terminate: Function that returns the termination time (i.e., seconds, or 'inf') of the services of a set
+		@type terminate: function
+		@param node: Name of this VIFI Node. Only services labeled with this node are swept. If not specified, orphaned services are not swept
+		@type node: str
+		@param managed: Function that returns the sets managed by this VIFI Node. Only services of these sets are swept. If not specified, orphaned services are not swept
+		@type managed: function
+		@param log_path: Path of the log file of reaper errors. The file is opened (in append mode) only to record an error
+		@type log_path: str
+		'''
+
+		with self.cond:
+			if self.thread and self.thread.is_alive():
+				return
+			self.client = client
+			self.active = active
+			self.terminate = terminate
+			self.node = node
+			self.managed = managed
+			self.log_path = log_path
+			self.stop = False
+			self.thread = threading.Thread(target=self.run, name='vifi-service-reaper', daemon=True)
+			self.thread.start()
+
+	def end(self) -> None:
+		''' Stop the reaper thread. Scheduled services that are not due yet are kept '''
+
+		with self.cond:
+			self.stop = True
+			self.cond.notify()
+
+	@property
+	def running(self) -> bool:
+		''' True if the reaper thread is running '''
+
+		return bool(self.thread and self.thread.is_alive())
+
+	@property
+	def sweeping(self) -> bool:
+		''' True if orphaned services are swept '''
+
+		return bool(self.sweep_int and self.active and self.node and self.managed)
+
+	def logError(self, result:str) -> None:
+		''' Record an error message, followed by the traceback of the current exception, in the reaper log file '''
+
+		try:
+			if self.log_path:
+				with open(self.log_path, 'a') as flog:
+					flog.write(result)
+					traceback.print_exc(file=flog)
+				return
+		except:
+			pass
+		print(result)
+		traceback.print_exc()
+
+	def schedule(self, name:str, term_time) -> None:
+		''' Schedule the removal of a service
+		@param name: Service name
+		@type name: str
+		@param term_time: Time (in seconds) after which the service is removed, or 'inf' to keep the service
+		@type term_time: int or str
+		'''
+
+		if str(term_time).lower() in ('inf', '.inf', 'none'):
+			return
+		deadline = time.time() + float(term_time)
+		with self.cond:
+			if name in self.scheduled and self.scheduled[name] <= deadline:
+				return
+			self.scheduled[name] = deadline
+			heapq.heappush(self.queue, (deadline, name))
+			self.cond.notify()
+
+	def run(self) -> None:
+		''' Remove due services, and sweep orphaned services periodically, until the reaper is stopped '''
+
+		next_sweep = time.time()
+		while True:
+			with self.cond:
+				while not self.stop:
+					now = time.time()
+					if self.queue and self.queue[0][0] <= now:
+						break
+					if self.sweeping and now >= next_sweep:
+						break
+					timeout = min(self.queue[0][0] if self.queue else float('inf'), next_sweep if self.sweeping else float('inf')) - now
+					self.cond.wait(None if timeout == float('inf') else timeout)
+				if self.stop:
+					return
+				due = []
+				while self.queue and self.queue[0][0] <= time.time():
+					deadline, name = heapq.heappop(self.queue)
+					if self.scheduled.get(name) == deadline:  # Skip entries that have been rescheduled to an earlier deadline
+						del self.scheduled[name]
+						due.append(name)
+			if due:
+				self.removeServices(due)
+			if self.sweeping and time.time() >= next_sweep:
+				self.sweep()
+				next_sweep = time.time() + self.sweep_int
+
+	def removeServices(self, names:List[str]) -> None:
+		''' Remove the specified services from Docker and from the registry. Services that do not exist anymore are ignored '''
+
+		for name in names:
+			try:
+				ser = self.registry.getService(name)
+				self.client.api.remove_service(ser['id'] if ser and ser['id'] else name)
+			except docker.errors.NotFound:
+				pass
+			except:
+				self.logError('Error: "ServiceReaper.removeServices" function could not remove service ' + name + '(vifi_server): ')
+				continue
+			self.registry.remove(name)
+
+	def sweep(self) -> None:
+		''' Schedule the removal of orphaned VIFI services (i.e., services of this VIFI Node and of its managed sets, whose request is not being processed) '''
+
+		try:
+			active = self.active()
+			managed = set(self.managed())
+			with self.registry.lock:
+				orphans = [(name, ser['set']) for name, ser in self.registry.services.items() if ser['request'] and \
+						ser['request'] not in active and ser.get('node') == self.node and ser['set'] in managed]
+			for name, dset in orphans:
+				self.schedule(name, self.terminate(dset) if self.terminate else 0)
+		except:
+			self.logError('Error: "ServiceReaper.sweep" function has error(vifi_server): ')
+
+
+class ImageCache():
+	''' Background pre-pull of container images. Each image goes through the states 'pulling', then 'ready' or
+	'failed'. The pull time and the size of each pulled image are recorded. Images that have never been pre-pulled
+	(e.g., images of sets that allow any image) are not tracked, and are pulled by Docker when their services start.
+	'''
+
+	def __init__(self, max_pulls:int=4):
+		'''
+		@param max_pulls: Maximum number of concurrent image pulls
+		@type max_pulls: int
+		'''
+
+		self.client = None  # Docker client used to pull images. Created on first use
+		self.images = {}  # Tracked images. Key is the image. Value is a dictionary of 'state', 'start', 'pull_time', 'size' and 'error'
+		self.lock = threading.Lock()
+		self.pool = ThreadPoolExecutor(max_workers=max_pulls)
+
+	def prefetch(self, images:List[str], refresh:bool=False, flog:TextIOWrapper=None) -> None:
+		''' Start pulling the specified images in the background. Images that are being pulled, or that are already
+		pulled, are skipped unless @refresh is True (e.g., to get new versions of the images)
+		@param images: Images to pull
+		@type images: List[str]
+		@param refresh: If True, pull again already pulled images
+		@type refresh: bool
+		@param flog: Log file to record raised events
+		@type flog: TextIOWrapper (file object)
+		'''
+
+		try:
+			if not self.client:
+				self.client = docker.from_env()
+			for img in images:
+				with self.lock:
+					state = self.images.get(img, {}).get('state')
+					if state == 'pulling' or (state == 'ready' and not refresh):
+						continue
+					self.images[img] = {'state':'pulling', 'start':time.time(), 'pull_time':None, 'size':None, 'error':None}
+				self.pool.submit(self.pull, img)
+		except:
+			result = 'Error: "ImageCache.prefetch" function has error(vifi_server): '
+			if flog:
+				flog.write(result)
+				traceback.print_exc(file=flog)
+			else:
+				print(result)
+				traceback.print_exc()
+
+	def pull(self, img:str) -> None:
+		''' Pull an image, and record its state, pull time and size '''
+
+		try:
+			repo, tag = parse_repository_tag(img)
+			image = self.client.images.pull(repo, tag=tag or 'latest')
+			with self.lock:
+				rec = self.images[img]
+				rec.update({'state':'ready', 'pull_time':time.time() - rec['start'], 'size':image.attrs.get('Size')})
+		except Exception as e:
+			with self.lock:
+				rec = self.images[img]
+				rec.update({'state':'failed', 'pull_time':time.time() - rec['start'], 'error':str(e)})
+
+	def isPulling(self, img:str) -> bool:
+		''' True if the specified image is still being pulled. Services of this image should be queued until it is ready '''
+
+		with self.lock:
+			return self.images.get(img, {}).get('state') == 'pulling'
+
+	def getState(self, img:str) -> dict:
+		''' Return the record (i.e., 'state', 'start', 'pull_time', 'size' and 'error') of the specified image, or None if it is not tracked '''
+
+		with self.lock:
+			rec = self.images.get(img)
+			return dict(rec) if rec else None
+
+	def stats(self) -> dict:
+		''' Return the records of all tracked images '''
+
+		with self.lock:
+			return {k:dict(v) for k, v in self.images.items()}
+
+
+class AdmissionController():
+	''' Resource-aware admission of services. The capacity (i.e., CPUs and memory) of the ready and active Swarm nodes
+	is read from the Docker node API (and refreshed every @node_ttl seconds). At each admission, the reservations of the
+	live Swarm tasks (of any service) are read and subtracted from the capacity of their nodes, as well as the
+	reservations of services admitted by the VIFI Node whose tasks are not live yet. A service is admitted with all its
+	tasks if each of them fits in the free capacity of some node, or shrunk down to its minimum number of tasks.
+	Otherwise, it is not admitted, and should wait until capacity is released (see @release). Services without
+	reservations are always admitted.
+	'''
+
+	LIVE_STATES = ('new', 'allocated', 'pending', 'assigned', 'accepted', 'preparing', 'ready', 'starting', 'running')  # States of tasks that hold (or will soon hold) their reservations
+
+	def __init__(self, node_ttl:float=30):
+		'''
+		@param node_ttl: Time (in seconds) after which the capacity of the nodes is read again
+		@type node_ttl: float
+		'''
+
+		self.node_ttl = node_ttl
+		self.nodes = {}  # (NanoCPUs, memory bytes) of each ready and active node. Key is the node ID
+		self.nodes_time = 0  # Time at which @nodes has been read
+		self.reservations = {}  # Reservations of admitted services. Key is the service name. Value is (tasks, NanoCPUs per task, memory bytes per task)
+		self.lock = threading.Lock()
+
+	def refreshNodes(self, client:docker.client.DockerClient, force:bool=False) -> None:
+		''' Read the capacity of the ready and active Swarm nodes, if it has not been read within @node_ttl seconds '''
+
+		if not force and self.nodes and time.time() - self.nodes_time < self.node_ttl:
+			return
+		nodes = {}
+		for n in client.nodes.list():
+			if n.attrs.get('Spec', {}).get('Availability') == 'active' and n.attrs.get('Status', {}).get('State') == 'ready':
+				res = n.attrs.get('Description', {}).get('Resources', {})
+				nodes[n.id] = (res.get('NanoCPUs', 0), res.get('MemoryBytes', 0))
+		with self.lock:
+			self.nodes = nodes
+			self.nodes_time = time.time()
+
+	def usage(self, client:docker.client.DockerClient) -> tuple:
+		''' Read the reservations of the live Swarm tasks
+		@param client: Client connection to Docker Engine
+		@type client: docker.client.DockerClient
+		@return: Reserved (NanoCPUs, memory bytes) of the tasks assigned to each node (by node ID), (NanoCPUs, memory bytes) of each task not assigned to a node yet, and number of live tasks of each service (by service name)
+		@rtype: tuple
+		'''
+
+		names = {x['ID']:x.get('Spec', {}).get('Name') for x in client.api.services()}
+		used, pending, live = {}, [], {}
+		for t in client.api.tasks(filters={'desired-state':'running'}):
+			if t.get('Status', {}).get('State') not in self.LIVE_STATES:
+				continue
+			name = names.get(t.get('ServiceID'))
+			if name:
+				live[name] = live.get(name, 0) + 1
+			res = (t.get('Spec', {}).get('Resources') or {}).get('Reservations') or {}
+			cpu, mem = res.get('NanoCPUs') or 0, res.get('MemoryBytes') or 0
+			if not cpu and not mem:
+				continue
+			if t.get('NodeID'):
+				u = used.setdefault(t['NodeID'], [0, 0])
+				u[0] += cpu
+				u[1] += mem
+			else:
+				pending.append((cpu, mem))
+		return used, pending, live
+
+	@staticmethod
+	def place(free:list, nano_cpus:int, mem_bytes:int) -> bool:
+		''' Place one task on the node (of @free) with the most free CPUs among the nodes that fit the task, and subtract its reservations from that node
+		@param free: Free [NanoCPUs, memory bytes] of each node
+		@type free: list
+		@return: True if the task has been placed. Otherwise, False
+		@rtype: bool
+		'''
+
+		fits = [x for x in free if x[0] >= nano_cpus and x[1] >= mem_bytes]
+		if not fits:
+			return False
+		node = max(fits, key=lambda x: (x[0], x[1]))
+		node[0] -= nano_cpus
+		node[1] -= mem_bytes
+		return True
+
+	def free(self, client:docker.client.DockerClient, exclude:str=None) -> list:
+		''' Return the free [NanoCPUs, memory bytes] of each node, after the reservations of the live Swarm tasks, and of
+		the services admitted by the VIFI Node whose tasks are not live yet (which are placed as Swarm would spread them)
+		@param client: Client connection to Docker Engine
+		@type client: docker.client.DockerClient
+		@param exclude: Service whose reservations are not subtracted (e.g., a service that is being admitted again)
+		@type exclude: str
+		@return: Free [NanoCPUs, memory bytes] of each node
+		@rtype: list
+		'''
+
+		used, pending, live = self.usage(client)
+		with self.lock:
+			free = [[c - used.get(n, (0, 0))[0], m - used.get(n, (0, 0))[1]] for n, (c, m) in self.nodes.items()]
+			for name, (tasks, cpu, mem) in self.reservations.items():
+				if name != exclude:
+					pending.extend([(cpu, mem)] * max(tasks - live.get(name, 0), 0))
+		for cpu, mem in sorted(pending, reverse=True):
+			self.place(free, cpu, mem)
+		return free
+
+	def admit(self, client:docker.client.DockerClient, name:str, tasks:int, nano_cpus:int=0, mem_bytes:int=0, \
+			min_tasks:int=None, flog:TextIOWrapper=None) -> int:
+		''' Admit a service if there are enough free resources for its tasks, and reserve these resources
+		@param client: Client connection to Docker Engine
+		@type client: docker.client.DockerClient
+		@param name: Service name
+		@type name: str
+		@param tasks: Required number of tasks
+		@type tasks: int
+		@param nano_cpus: Reserved CPUs of each task (in units of 1e-9 CPUs)
+		@type nano_cpus: int
+		@param mem_bytes: Reserved memory of each task (in bytes)
+		@type mem_bytes: int
+		@param min_tasks: Minimum number of tasks the service can be shrunk to. Defaults to @tasks (i.e., no shrinking)
+		@type min_tasks: int
+		@param flog: Log file to record raised events
+		@type flog: TextIOWrapper (file object)
+		@return: Number of admitted tasks, or 0 if the service is not admitted
+		@rtype: int
+		'''
+
+		try:
+			if not nano_cpus and not mem_bytes:
+				return tasks
+			self.refreshNodes(client)
+			with self.lock:
+				# A task should fit in one node
+				if not any(c >= nano_cpus and m >= mem_bytes for c, m in self.nodes.values()):
+					return 0
+			free = self.free(client, exclude=name)
+			fit = 0
+			while fit < tasks and self.place(free, nano_cpus, mem_bytes):
+				fit += 1
+			if fit < (min_tasks or tasks):
+				return 0
+			with self.lock:
+				self.reservations[name] = (fit, nano_cpus, mem_bytes)
+			return fit
+		except:
+			result = 'Error: "AdmissionController.admit" function has error(vifi_server): '
+			if flog:
+				flog.write(result)
+				traceback.print_exc(file=flog)
+			else:
+				print(result)
+				traceback.print_exc()
+			return 0
+
+	def release(self, name:str) -> None:
+		''' Release the reservations of a service (e.g., when its tasks have finished) '''
+
+		with self.lock:
+			self.reservations.pop(name, None)
@@ -0,0 +1,273 @@
+'''
+Created on Oct 19, 2026
+
+Execution backends of VIFI Nodes. An executor creates the services of users' requests, reports the state of their
+tasks, and removes them. The DockerSwarmExecutor runs services as Docker Swarm services. The LocalProcessExecutor runs
+each task of a service as a local process in the request folder, with the same command, arguments, environment
+variables and mounted paths (i.e., container paths are mapped back to their host paths). Thus, lightweight services
+start in milliseconds, and sets can run without a Swarm at all. Both executors report tasks in the form of Docker
+tasks (i.e., 'Slot', 'Version' and 'Status'), so the completion semantics of services (e.g., ttl, retries) are the same.
+
+@author: Mohammed Elshambakey
+@contact: shambakey1@gmail.com
+'''
+
+import os, shlex, threading, itertools, subprocess
+import docker.models
+from typing import List
+from vifidocker import ServiceRegistry, REQUEST_LABEL, SET_LABEL, NODE_LABEL
+
+
+class Executor():
+	''' Interface of VIFI execution backends '''
+
+	kind = None  # Name of the executor as used in the configuration files (e.g., 'docker', 'local')
+	poll_interval = 1  # Time (in seconds) between checks of the tasks of a service
+
+	def create(self, service_name:str, tasks:int, image:str, command:str, args:List[str], envs:List[str], mounts:List[str], \
+			work_dir:str=None, user:str=None, groups:List[str]=None, labels:dict=None, nano_cpus:int=0, mem_bytes:int=0, \
+			retries:int=0):
+		''' Create a service and start its tasks
+		@param service_name: Service name
+		@type service_name: str
+		@param tasks: Number of tasks (i.e., replicas) of the service
+		@type tasks: int
+		@param image: Image of the service
+		@type image: str
+		@param command: Command of the service (e.g., 'python script.py')
+		@type command: str
+		@param args: Arguments passed to @command
+		@type args: List[str]
+		@param envs: Environment variables (in the form KEY=VALUE) of the tasks
+		@type envs: List[str]
+		@param mounts: Mounts (in the form source:target[:options]) of the tasks
+		@type mounts: List[str]
+		@param work_dir: Working directory of the tasks
+		@type work_dir: str
+		@param user: The user to run the tasks
+		@type user: str
+		@param groups: The groups to run the tasks
+		@type groups: List[str]
+		@param labels: Labels of the service
+		@type labels: dict
+		@param nano_cpus: CPU reservation of each task (in units of 10^-9 CPUs), if any
+		@type nano_cpus: int
+		@param mem_bytes: Memory reservation of each task (in bytes), if any
+		@type mem_bytes: int
+		@param retries: Number of times a failed task is restarted. If 0, failed tasks are not restarted
+		@type retries: int
+		@return: Created service
+		'''
+
+		raise NotImplementedError
+
+	def tasks(self, service_name:str) -> List[dict]:
+		''' Return the tasks of a service in the form of Docker tasks, or None if the service does not exist '''
+
+		raise NotImplementedError
+
+	def exists(self, service_name:str) -> bool:
+		''' Return True if a service with the specified name exists '''
+
+		raise NotImplementedError
+
+	def remove(self, service_name:str) -> None:
+		''' Remove a service and stop its running tasks '''
+
+		raise NotImplementedError
+
+	def describe(self, service_name:str) -> str:
+		''' Return a short description of a service for logging '''
+
+		return service_name
+
+
+class DockerSwarmExecutor(Executor):
+	''' Run services as Docker Swarm services '''
+
+	kind = 'docker'
+	poll_interval = 1
+
+	def __init__(self, client:docker.client.DockerClient, registry:ServiceRegistry=None):
+		'''
+		@param client: Client connection to Docker Engine
+		@type client: docker.client.DockerClient
+		@param registry: Index of existing Docker services. Created services are added to it, and it is used to check service names if it follows Docker services
+		@type registry: ServiceRegistry
+		'''
+
+		self.client = client
+		self.registry = registry
+
+	def create(self, service_name:str, tasks:int, image:str, command:str, args:List[str], envs:List[str], mounts:List[str], \
+			work_dir:str=None, user:str=None, groups:List[str]=None, labels:dict=None, nano_cpus:int=0, mem_bytes:int=0, \
+			retries:int=0) -> docker.models.services.Service:
+
+		# Reserve the CPUs and memory of each task, so that Swarm places tasks only on nodes that have enough free resources
+		if nano_cpus or mem_bytes:
+			task_resources = docker.types.Resources(cpu_reservation=nano_cpus or None, mem_reservation=mem_bytes or None)
+		else:
+			task_resources = None
+
+		restart_policy = {'condition':'on-failure', 'max_attempts':retries} if retries else {'condition':'none'}
+		ser = self.client.services.create(name=service_name, mode={'Replicated':{'Replicas':tasks}}, restart_policy=\
+								restart_policy, mounts=mounts, workdir=work_dir, env=envs, image=image, \
+								command=command, args=args, user=user, groups=groups, \
+								labels=labels, resources=task_resources)
+		if self.registry:
+			labels = labels or {}
+			self.registry.add(service_name, ser.id, labels.get(REQUEST_LABEL), labels.get(SET_LABEL), labels.get(NODE_LABEL))
+		return ser
+
+	def tasks(self, service_name:str) -> List[dict]:
+		try:
+			return self.client.services.get(service_name).tasks()
+		except docker.errors.NotFound:
+			return None
+
+	def exists(self, service_name:str) -> bool:
+		if self.registry and self.registry.running:
+			return self.registry.exists(service_name)
+		return service_name in [x.name for x in self.client.services.list(filters={'name':service_name})]
+
+	def remove(self, service_name:str) -> None:
+		self.client.services.get(service_name).remove()
+		if self.registry:
+			self.registry.remove(service_name)
+
+	def describe(self, service_name:str) -> str:
+		return str(self.client.services.get(service_name))
+
+
+class LocalProcessExecutor(Executor):
+	''' Run each task of a service as a local process. Mount targets in the working directory, command, arguments and
+	environment variables are mapped to their sources, so that the processes see the request folder and data directories
+	where the containers would. The image, labels and resource reservations are ignored. Failed tasks are restarted up
+	to the specified retries, when their state is checked (see @tasks). Like containers, the processes do not inherit
+	the environment of the VIFI Node (e.g., its credentials): they get only the variables of @base_env and those of the
+	service.
+	'''
+
+	kind = 'local'
+	poll_interval = 0.01
+	log_dir = '.vifi_logs'  # Directory, under the working directory, of the output of the local processes
+	base_env = ('PATH', 'HOME', 'LANG')  # Environment variables of the VIFI Node passed to the local processes
+
+	def __init__(self):
+		self.services = {}  # Local services. Key is the service name. Value is a dictionary of the service specification and its tasks (i.e., processes)
+		self.lock = threading.RLock()  # Protects @services, as services may be checked and removed from different threads
+		self.index = itertools.count(1)  # Version index of created tasks. Later tasks (e.g., restarts) have larger indexes
+
+	def create(self, service_name:str, tasks:int, image:str, command:str, args:List[str], envs:List[str], mounts:List[str], \
+			work_dir:str=None, user:str=None, groups:List[str]=None, labels:dict=None, nano_cpus:int=0, mem_bytes:int=0, \
+			retries:int=0) -> dict:
+
+		# Map mount targets to their sources (longest targets first, so nested mounts are mapped correctly). The first
+		# mount is the request folder, which is the working directory if none is specified
+		paths = []
+		for m in mounts:
+			parts = m.split(':')
+			if len(parts) >= 2:
+				paths.append((parts[1].rstrip(os.sep) or os.sep, parts[0]))
+		paths.sort(key=lambda x: len(x[0]), reverse=True)
+		cwd = self.mapPath(work_dir, paths) if work_dir else None
+		if not cwd or not os.path.isdir(cwd):
+			cwd = mounts[0].split(':')[0] if mounts else os.getcwd()
+
+		ser = {'name':service_name, 'argv':[self.mapPath(x, paths) for x in shlex.split(command) + list(args)], 'cwd':cwd, \
+			'envs':[self.mapEnv(x, paths) for x in envs], 'retries':retries, 'user':user, 'groups':groups, \
+			'labels':labels or {}, 'tasks':{}}
+		os.makedirs(os.path.join(cwd, self.log_dir), exist_ok=True)
+		with self.lock:
+			if service_name in self.services:
+				raise ValueError('Local service ' + service_name + ' already exists')
+			self.services[service_name] = ser
+			for slot in range(1, tasks + 1):
+				ser['tasks'][slot] = [self.startTask(ser, slot)]
+		return ser
+
+	def mapPath(self, path:str, paths:list) -> str:
+		''' Map a path inside the (container) mounts to its host path. Other values are returned as they are '''
+
+		for target, source in paths:
+			if path == target:
+				return source
+			if path.startswith(target.rstrip(os.sep) + os.sep):
+				return os.path.join(source, path[len(target.rstrip(os.sep)) + 1:])
+		return path
+
+	def mapEnv(self, env:str, paths:list) -> str:
+		''' Map the value of an environment variable (in the form KEY=VALUE) to its host path, if it is a mounted path '''
+
+		key, sep, value = env.partition('=')
+		return key + sep + self.mapPath(value, paths) if sep else env
+
+	def startTask(self, ser:dict, slot:int) -> dict:
+		''' Start the process of one task of a local service
+		@param ser: Local service
+		@type ser: dict
+		@param slot: Slot of the task
+		@type slot: int
+		@return: The task (i.e., its version index and process)
+		@rtype: dict
+		'''
+
+		# Docker placeholders of the task are replaced by their values
+		subs = {'{{.Task.Slot}}':str(slot), '{{.Task.Name}}':ser['name'] + '.' + str(slot), '{{.Service.Name}}':ser['name']}
+		env = {k:os.environ[k] for k in self.base_env if k in os.environ}
+		env.setdefault('PATH', os.defpath)
+		for x in ser['envs']:
+			for k, v in subs.items():
+				x = x.replace(k, v)
+			key, _, value = x.partition('=')
+			env[key] = value
+		kwargs = {}
+		if ser['user'] and str(ser['user']) != str(os.getuid()):
+			kwargs['user'] = int(ser['user']) if str(ser['user']).isdigit() else ser['user']
+		if ser['groups'] and [str(x) for x in ser['groups']] != [str(os.getgid())]:
+			kwargs['extra_groups'] = [int(x) if str(x).isdigit() else x for x in ser['groups']]
+		index = next(self.index)
+		with open(os.path.join(ser['cwd'], self.log_dir, ser['name'] + '.' + str(slot) + '.' + str(index) + '.log'), 'w') as out:
+			proc = subprocess.Popen(ser['argv'], cwd=ser['cwd'], env=env, stdout=out, stderr=subprocess.STDOUT, \
+								stdin=subprocess.DEVNULL, **kwargs)
+		return {'index':index, 'proc':proc}
+
+	def tasks(self, service_name:str) -> List[dict]:
+		with self.lock:
+			ser = self.services.get(service_name)
+			if ser is None:
+				return None
+			res = []
+			for slot, history in ser['tasks'].items():
+				# Restart the task if its latest process has failed and it has not used all of its retries
+				rc = history[-1]['proc'].poll()
+				if rc not in (None, 0) and len(history) <= ser['retries']:
+					history.append(self.startTask(ser, slot))
+				for t in history:
+					rc = t['proc'].poll()
+					if rc is None:
+						status = {'State':'running'}
+					elif rc == 0:
+						status = {'State':'complete'}
+					else:
+						status = {'State':'failed', 'Err':'task: non-zero exit (' + str(rc) + ')'}
+					res.append({'Slot':slot, 'Version':{'Index':t['index']}, 'Status':status})
+			return res
+
+	def exists(self, service_name:str) -> bool:
+		with self.lock:
+			return service_name in self.services
+
+	def remove(self, service_name:str) -> None:
+		with self.lock:
+			ser = self.services.pop(service_name, None)
+		if ser:
+			for history in ser['tasks'].values():
+				for t in history:
+					if t['proc'].poll() is None:
+						t['proc'].terminate()
+
+	def describe(self, service_name:str) -> str:
+		with self.lock:
+			ser = self.services.get(service_name)
+		return '<LocalService: ' + service_name + ' ' + str([x['proc'].pid for h in ser['tasks'].values() for x in h]) + '>' if ser else service_name
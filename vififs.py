@@ -0,0 +1,455 @@
+'''
+Created on Oct 19, 2026
+
+File system helpers of VIFI Nodes to place results of services without rewriting their data. Moves are renames when
+the source and the destination share a file system. Copies share the data of the source file by a reflink (i.e.,
+copy-on-write clone, where supported by the file system), and are physically copied otherwise. Hardlinks are used
+only if explicitly requested, as they do not keep copy semantics. Replaced destinations are renamed aside first, so the new result appears
+atomically, and the old one is discarded afterwards. Directory trees that must really be copied are copied in
+parallel (see copyTree), with in-kernel copies (copy_file_range, or sendfile) of each file. Removed paths are renamed
+into a trash directory, and deleted in the background (see TrashCollector). The ResultIndex matches the result patterns
+of an iteration against one (cached) listing of each directory.
+
+@author: Mohammed Elshambakey
+@contact: shambakey1@gmail.com
+'''
+
+import os, re, errno, shutil, fcntl, uuid, queue, threading, ctypes, fnmatch, functools
+from concurrent.futures import ThreadPoolExecutor
+
+FICLONE = 0x40049409  # Linux ioctl that clones (i.e., reflinks) a whole file
+COPY_MODES = ('auto', 'reflink', 'hardlink', 'copy')  # 'auto' tries reflink, then copy. 'hardlink' tries hardlink, then copy
+
+COPY_BUFSIZE = 8 * 1024 * 1024  # Size of each chunk of in-kernel (or buffered) copies of file data
+COPY_WORKERS = min(32, (os.cpu_count() or 1) * 4)  # Default number of threads that copy the files of a directory tree
+
+_reflink_unsupported = set()  # Devices whose file systems do not support reflinks, so they are not tried again
+
+
+def reflinkFile(src:str, dst:str) -> bool:
+	''' Clone a file by a reflink (copy-on-write), if supported by the file system
+	@param src: Source file
+	@type src: str
+	@param dst: Destination file (should not exist)
+	@type dst: str
+	@return: True if the file has been cloned. Otherwise, False (and no destination file is left behind)
+	@rtype: bool
+	'''
+
+	dev = os.stat(src).st_dev
+	if dev in _reflink_unsupported:
+		return False
+	try:
+		with open(src, 'rb') as fsrc, open(dst, 'xb') as fdst:
+			fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+	except OSError as e:
+		if os.path.lexists(dst):
+			os.remove(dst)
+		if e.errno in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL):
+			_reflink_unsupported.add(dev)
+		return False
+	shutil.copystat(src, dst)
+	return True
+
+
+def copyData(src:str, dst:str) -> None:
+	''' Physically copy the data (and the metadata) of a file. The data is copied in the kernel by copy_file_range, or
+	by sendfile if copy_file_range is not supported (e.g., across some file systems), or through a large buffer otherwise
+	@param src: Source file
+	@type src: str
+	@param dst: Destination file
+	@type dst: str
+	'''
+
+	with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+		size = os.fstat(fsrc.fileno()).st_size
+		done = 0
+		for fn in ('copy_file_range', 'sendfile'):
+			if not hasattr(os, fn):
+				continue
+			try:
+				while done < size:
+					if fn == 'copy_file_range':
+						n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), COPY_BUFSIZE, done, done)
+					else:
+						n = os.sendfile(fdst.fileno(), fsrc.fileno(), done, COPY_BUFSIZE)
+					if not n:
+						break
+					done += n
+				break
+			except OSError as e:
+				if done or e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EBADF):
+					raise
+		if done < size:
+			fsrc.seek(done)
+			fdst.seek(done)
+			shutil.copyfileobj(fsrc, fdst, COPY_BUFSIZE)
+	shutil.copystat(src, dst)
+
+
+def copyFile(src:str, dst:str, copy_mode:str='auto') -> str:
+	''' Copy a file, sharing the data of the source file if possible
+	@param src: Source file
+	@type src: str
+	@param dst: Destination file (should not exist)
+	@type dst: str
+	@param copy_mode: One of COPY_MODES. Hardlinks (only used by 'hardlink') share the inode of the source, so they are
+	only safe if later writers replace the source file rather than rewrite it in place
+	@type copy_mode: str
+	@return: The used method ('reflink', 'hardlink' or 'copy')
+	@rtype: str
+	'''
+
+	if copy_mode in ('auto', 'reflink') and reflinkFile(src, dst):
+		return 'reflink'
+	if copy_mode == 'hardlink':
+		try:
+			os.link(src, dst)
+			return 'hardlink'
+		except OSError:
+			pass
+	copyData(src, dst)
+	return 'copy'
+
+
+def copyTree(src:str, dst:str, copy_mode:str='auto', workers:int=None) -> None:
+	''' Copy a directory tree, sharing the data of the source files if possible (see @copyFile). All directories are
+	created first, then files are copied by a pool of threads, so that copying many files is not bound by the latency
+	of each file. Symbolic links are copied as links. If the destination is inside the source, it is not copied into itself
+	@param src: Source directory
+	@type src: str
+	@param dst: Destination directory (may exist)
+	@type dst: str
+	@param copy_mode: One of COPY_MODES
+	@type copy_mode: str
+	@param workers: Number of copying threads. Defaults to COPY_WORKERS
+	@type workers: int
+	'''
+
+	dst_real = os.path.realpath(dst)
+	dirs_todo = []  # (source, target) of directories
+	files_todo = []  # (source, target) of files
+	for root, dirs, files in os.walk(src):
+		target = os.path.join(dst, os.path.relpath(root, src))
+		dirs_todo.append((root, target))
+		dirs[:] = [d for d in dirs if os.path.realpath(os.path.join(root, d)) != dst_real or os.path.islink(os.path.join(root, d))]
+		for f in files + [d for d in dirs if os.path.islink(os.path.join(root, d))]:
+			files_todo.append((os.path.join(root, f), os.path.join(target, f)))
+
+	for _, target in dirs_todo:
+		os.makedirs(target, exist_ok=True)
+
+	def copy(item):
+		if os.path.islink(item[0]):
+			os.symlink(os.readlink(item[0]), item[1])
+		else:
+			copyFile(item[0], item[1], copy_mode)
+
+	workers = workers or COPY_WORKERS
+	if workers > 1 and len(files_todo) > 1:
+		with ThreadPoolExecutor(max_workers=min(workers, len(files_todo))) as pool:
+			for _ in pool.map(copy, files_todo):  # Raises the first error, if any
+				pass
+	else:
+		for item in files_todo:
+			copy(item)
+
+	# Directory times are set last, as copying files into the directories changes them
+	for root, target in reversed(dirs_todo):
+		shutil.copystat(root, target)
+
+
+def _aside(path:str) -> str:
+	''' Return a unique hidden sibling name of a path, used to keep a file or directory aside '''
+
+	return os.path.join(os.path.dirname(path), '.' + os.path.basename(path) + '.' + uuid.uuid4().hex[:12])
+
+
+def placeResult(src:str, dst:str, action:str='move', copy_mode:str='auto', discard=None) -> None:
+	''' Place a result (file or directory) at its destination by moving or copying it. The destination is replaced if it
+	already exists. The new result is renamed into place, so it appears atomically. Only moves across devices copy data
+	@param src: Result file or directory
+	@type src: str
+	@param dst: Destination path
+	@type dst: str
+	@param action: 'copy' keeps the source, while 'move' (default) removes it
+	@type action: str
+	@param copy_mode: One of COPY_MODES (used by 'copy')
+	@type copy_mode: str
+	@param discard: Function called with the path of a replaced destination directory, which has been renamed aside.
+	Defaults to removing it
+	@type discard: function
+	'''
+
+	os.makedirs(os.path.dirname(dst) or '.', exist_ok=True)
+	if action == 'copy':
+		# Build the copy next to the destination (i.e., on the same device), then rename it into place
+		tmp = _aside(dst)
+		if os.path.isdir(src):
+			copyTree(src, tmp, copy_mode)
+		else:
+			copyFile(src, tmp, copy_mode)
+		src = tmp
+
+	# A file replaces a file atomically. A directory destination (or a destination replaced by a directory) is renamed aside first
+	old = None
+	if os.path.lexists(dst) and (os.path.isdir(dst) or os.path.isdir(src)) and not os.path.samefile(src, dst):
+		old = _aside(dst)
+		os.rename(dst, old)
+	try:
+		os.rename(src, dst)
+	except OSError as e:
+		if e.errno != errno.EXDEV:
+			if old:
+				os.rename(old, dst)
+			raise
+		# Across devices, the result is copied to the destination device, then renamed into place
+		tmp = _aside(dst)
+		if os.path.isdir(src):
+			copyTree(src, tmp, 'copy')
+			os.rename(tmp, dst)
+			shutil.rmtree(src)
+		else:
+			copyData(src, tmp)
+			os.rename(tmp, dst)
+			os.remove(src)
+	if old:
+		if discard:
+			discard(old)
+		elif os.path.isdir(old) and not os.path.islink(old):
+			shutil.rmtree(old, ignore_errors=True)
+		else:
+			os.remove(old)
+
+
+@functools.lru_cache(maxsize=1024)
+def compilePattern(pattern:str):
+	''' Compile a glob pattern of one path component into a regular expression. Compiled patterns are cached, so the
+	patterns of a request are compiled only once
+	@param pattern: Glob pattern of a file or directory name (e.g., 'out_*.nc')
+	@type pattern: str
+	@return: Compiled pattern
+	@rtype: re.Pattern
+	'''
+
+	return re.compile(fnmatch.translate(pattern))
+
+
+class ResultIndex():
+	''' In-memory index of the directories that hold the results of a service iteration. Each directory is listed by
+	os.scandir at most once (until it is invalidated), and all patterns (e.g., of results, toremove, and S3, NiFi and SFTP
+	results) are matched against the listings in memory, with the same semantics as glob.glob (i.e., wildcards do not
+	cross directories, and do not match hidden names unless the pattern starts with '.'). Functions that change the
+	indexed directories (e.g., moving results) should invalidate the changed directories (see @invalidate).
+	'''
+
+	def __init__(self):
+		self.listings = {}  # Listing of each scanned directory. Key is the directory path. Value is a dictionary of (entry name, True if the entry is a directory)
+
+	def listdir(self, path:str) -> dict:
+		''' Return the (cached) listing of a directory, or an empty dictionary if it is not a directory '''
+
+		path = os.path.normpath(path)
+		if path not in self.listings:
+			try:
+				with os.scandir(path) as it:
+					self.listings[path] = {e.name:e.is_dir() for e in it}
+			except OSError:
+				self.listings[path] = {}
+		return self.listings[path]
+
+	def exists(self, path:str) -> bool:
+		''' True if the path exists, according to the listing of its parent directory '''
+
+		path = os.path.normpath(path)
+		parent = os.path.dirname(path) or os.curdir
+		return os.path.basename(path) in self.listdir(parent) if parent != path else True
+
+	def isdir(self, path:str) -> bool:
+		''' True if the path is a directory, according to the listing of its parent directory '''
+
+		path = os.path.normpath(path)
+		parent = os.path.dirname(path) or os.curdir
+		return bool(self.listdir(parent).get(os.path.basename(path))) if parent != path else True
+
+	def isfile(self, path:str) -> bool:
+		''' True if the path exists and is not a directory '''
+
+		return self.exists(path) and not self.isdir(path)
+
+	def glob(self, pathname:str) -> list:
+		''' Return the paths matching a pattern, like glob.glob
+		@param pathname: Path pattern (e.g., '/requests/in/r1/out_*/*.nc')
+		@type pathname: str
+		@return: Matching paths
+		@rtype: list
+		'''
+
+		if not glob_magic.search(pathname):
+			return [pathname] if self.exists(pathname) else []
+		head, parts = pathname, []
+		while glob_magic.search(head):
+			head, tail = os.path.split(head)
+			parts.insert(0, tail)
+		paths = [head or os.curdir] if self.isdir(head or os.curdir) else []
+		for i, part in enumerate(parts):
+			last = i == len(parts) - 1
+			matched = []
+			for p in paths:
+				listing = self.listdir(p)
+				if not part:  # Trailing separator: only directories match
+					matched.append(p + os.sep)
+				elif glob_magic.search(part):
+					pat = compilePattern(part)
+					matched.extend(os.path.join(p, x) for x, is_dir in listing.items() if (last or is_dir) and pat.match(x) and \
+								(part.startswith('.') or not x.startswith('.')))
+				elif part in listing and (last or listing[part]):
+					matched.append(os.path.join(p, part))
+			paths = matched
+		return [x[len(os.curdir + os.sep):] if not head and x.startswith(os.curdir + os.sep) else x for x in paths]
+
+	def walk(self, top:str):
+		''' Walk a directory tree top-down using the cached listings, like os.walk '''
+
+		listing = self.listdir(top)
+		dirs = [x for x, is_dir in listing.items() if is_dir]
+		yield top, dirs, [x for x, is_dir in listing.items() if not is_dir]
+		for d in dirs:
+			if not os.path.islink(os.path.join(top, d)):
+				yield from self.walk(os.path.join(top, d))
+
+	def invalidate(self, path:str=None) -> None:
+		''' Drop the listings of a directory and its sub-directories, or of all directories if none is specified '''
+
+		if path is None:
+			self.listings.clear()
+			return
+		path = os.path.normpath(path)
+		for p in [x for x in self.listings if x == path or x.startswith(path.rstrip(os.sep) + os.sep)]:
+			del self.listings[p]
+
+	def changed(self, path:str) -> None:
+		''' Record that a path has been created, replaced or removed. The listings of the path (and its sub-directories)
+		and of its ancestors are dropped, so they are listed again when needed '''
+
+		path = os.path.normpath(path)
+		self.invalidate(path)
+		parent = os.path.dirname(path)
+		while parent and parent != path:
+			self.listings.pop(parent, None)
+			path, parent = parent, os.path.dirname(parent)
+
+
+glob_magic = re.compile('[*?[]')  # Characters that make a path component a glob pattern
+
+
+TRASH_DIR = '.trash'  # Name of the trash directory of each set (see TrashCollector)
+IOPRIO_SYSCALLS = {'x86_64':251, 'i686':289, 'aarch64':30, 'armv7l':314, 'ppc64le':273, 's390x':282}  # Number of the ioprio_set system call on each machine
+
+
+class TrashCollector():
+	''' Asynchronous removal of files and directories. A path is removed by renaming it into a trash directory on the
+	same file system (see @trash), which is atomic and takes constant time regardless of the size of the path, so the
+	caller sees a clean tree right away. A background thread then deletes the trash with the lowest CPU and I/O
+	priorities, so the deletion does not compete with running services. Paths that cannot be renamed into the trash
+	(e.g., across devices) are removed directly.
+	'''
+
+	def __init__(self):
+		self.queue = queue.Queue()  # Trashed paths waiting to be deleted
+		self.collected = set()  # Trash directories whose leftovers (e.g., from a crash) have been queued
+		self.lock = threading.Lock()
+		self.thread = None
+
+	def start(self) -> None:
+		''' Start the collector thread. Calling this method again while the collector is running has no effect '''
+
+		with self.lock:
+			if self.thread and self.thread.is_alive():
+				return
+			self.thread = threading.Thread(target=self.run, name='vifi-trash-collector', daemon=True)
+			self.thread.start()
+
+	def end(self) -> None:
+		''' Stop the collector thread. Trashed paths that are not deleted yet are left in the trash, and are collected on the next start '''
+
+		if self.running:
+			self.queue.put(None)
+
+	@property
+	def running(self) -> bool:
+		''' True if the collector thread is running '''
+
+		return bool(self.thread and self.thread.is_alive())
+
+	def trash(self, path:str, trash_dir:str) -> None:
+		''' Remove a file or directory by moving it to the trash
+		@param path: Path to remove
+		@type path: str
+		@param trash_dir: Trash directory (created if it does not exist). It should be on the same file system as @path
+		@type trash_dir: str
+		'''
+
+		self.collect(trash_dir)
+		target = os.path.join(trash_dir, uuid.uuid4().hex + '.' + os.path.basename(path))
+		try:
+			os.makedirs(trash_dir, exist_ok=True)
+			os.rename(path, target)
+		except OSError:
+			self.delete(path)
+			return
+		if self.running:
+			self.queue.put(target)
+		else:
+			self.delete(target)
+
+	def collect(self, trash_dir:str) -> None:
+		''' Queue the leftovers of a trash directory (e.g., trashed before a restart of the VIFI Node) for deletion, once per
+		trash directory. A trash directory is marked as collected only when the collector is running (i.e., its leftovers
+		are actually queued), so that leftovers found while the collector is stopped are collected after it starts
+		'''
+
+		with self.lock:
+			if trash_dir in self.collected or not self.running:
+				return
+			if os.path.isdir(trash_dir):
+				for f in os.listdir(trash_dir):
+					self.queue.put(os.path.join(trash_dir, f))
+			self.collected.add(trash_dir)
+
+	def delete(self, path:str) -> None:
+		''' Delete a file or directory, ignoring errors '''
+
+		if os.path.isdir(path) and not os.path.islink(path):
+			shutil.rmtree(path, ignore_errors=True)
+		else:
+			try:
+				os.remove(path)
+			except OSError:
+				pass
+
+	def run(self) -> None:
+		''' Delete trashed paths until the collector is stopped '''
+
+		_lowerPriority()
+		while True:
+			path = self.queue.get()
+			if path is None:
+				return
+			self.delete(path)
+
+
+def _lowerPriority() -> None:
+	''' Give the calling thread the lowest CPU priority, and the idle I/O scheduling class (on Linux), if permitted '''
+
+	tid = threading.get_native_id()
+	try:
+		os.setpriority(os.PRIO_PROCESS, tid, 19)
+	except (OSError, AttributeError):
+		pass
+	nr = IOPRIO_SYSCALLS.get(os.uname().machine)
+	if nr:
+		try:
+			ctypes.CDLL(None, use_errno=True).syscall(nr, 1, tid, 3 << 13)  # IOPRIO_WHO_PROCESS, IOPRIO_CLASS_IDLE
+		except (OSError, AttributeError):
+			pass
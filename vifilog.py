@@ -0,0 +1,337 @@
+'''
+Created on Oct 19, 2026
+
+Append-only store of VIFI request logs. Each request log is appended as one JSON line to the active segment of the
+store. The active segment is rotated (and compressed) when it reaches a maximum size. A small index records, for each
+segment, its number of records, its time range, and the requests, services and sets it contains. Thus, queries (e.g.,
+the logs of a time window, of a request, or of a set) read only the segments that may contain matching records,
+instead of parsing one YAML file per request. The writer keeps the index in memory, and writes it when a segment is
+started or rotated, and otherwise every INDEX_INTERVAL seconds or INDEX_RECORDS appends. Readers always scan the active
+segment, so records that are not indexed yet are still found.
+
+@author: Mohammed Elshambakey
+@contact: shambakey1@gmail.com
+'''
+
+import os, re, gzip, json, time, shutil, tempfile, threading
+from typing import Iterator, List
+
+SEGMENT_PREFIX = 'requests.'  # Segment files are named '<SEGMENT_PREFIX><sequence><SEGMENT_SUFFIX>[.gz]'
+SEGMENT_SUFFIX = '.jsonl'
+INDEX_NAME = 'requests.index.json'  # Name of the index file of the store
+SEGMENT_SIZE = 64 * 1024 * 1024  # Default size (in bytes) at which the active segment is rotated
+INDEX_INTERVAL = 30  # Default time (in seconds) after which appended records are written to the index
+INDEX_RECORDS = 1000  # Default number of appended records after which they are written to the index
+ENTRY_SETS = ('requests', 'services', 'sets')  # Keys of index entries that hold sets of names (lists in the index file)
+
+_segment_name = re.compile('^' + re.escape(SEGMENT_PREFIX) + r'(\d+)' + re.escape(SEGMENT_SUFFIX) + r'(\.gz)?$')
+
+
+def _float(x) -> float:
+	''' Convert a logged time to float, or None if it is missing or malformed '''
+
+	try:
+		return float(x)
+	except (TypeError, ValueError):
+		return None
+
+
+def isStoreFile(name:str) -> bool:
+	''' Return True if a file name is a segment or the index of a log store '''
+
+	return name == INDEX_NAME or bool(_segment_name.match(name))
+
+
+class LogStore():
+	''' Append-only store of request logs under a directory. Records are dictionaries of 'id' (unique name of the
+	request log, e.g., '<request>.<uuid>'), 'request' (request name), 'set', 'logged' (time the record was appended),
+	'start', 'end' (time range of the request) and 'log' (the request log as recorded by VIFI Node).
+	@note: A store has one writer (i.e., the VIFI Node). Readers may run in other processes. Appended records are visible to readers as soon as they are written, as the active segment is always scanned
+	'''
+
+	def __init__(self, root:str, segment_size:int=SEGMENT_SIZE, compress:bool=True, index_interval:float=INDEX_INTERVAL, \
+				index_records:int=INDEX_RECORDS):
+		'''
+		@param root: Directory of the store
+		@type root: str
+		@param segment_size: Size (in bytes) at which the active segment is rotated
+		@type segment_size: int
+		@param compress: If True, rotated segments are compressed (gzip)
+		@type compress: bool
+		@param index_interval: Time (in seconds) after which appended records are written to the index
+		@type index_interval: float
+		@param index_records: Number of appended records after which they are written to the index
+		@type index_records: int
+		'''
+
+		self.root = os.path.abspath(root)
+		self.segment_size = segment_size
+		self.compress = compress
+		self.index_interval = index_interval
+		self.index_records = index_records
+		self.index = None  # Loaded index. Dictionary of 'active' (name of the active segment) and 'segments' (entry of each segment by name)
+		self.unsaved = 0  # Number of appended records that are not written to the index yet
+		self.saved_time = time.time()  # Time at which the index has been written
+		self.lock = threading.Lock()  # Serializes appends of different threads
+
+	@staticmethod
+	def isStore(path:str) -> bool:
+		''' Return True if a directory contains a log store '''
+
+		return os.path.isfile(os.path.join(path, INDEX_NAME))
+
+	@staticmethod
+	def newEntry() -> dict:
+		''' Return an empty index entry of a segment '''
+
+		return {'records':0, 'start':None, 'end':None, 'requests':set(), 'services':set(), 'sets':set()}
+
+	@staticmethod
+	def addToEntry(entry:dict, rec:dict) -> None:
+		''' Add a record to the index entry of its segment '''
+
+		entry['records'] += 1
+		if rec.get('start') is not None:
+			entry['start'] = rec['start'] if entry['start'] is None else min(entry['start'], rec['start'])
+		if rec.get('end') is not None:
+			entry['end'] = rec['end'] if entry['end'] is None else max(entry['end'], rec['end'])
+		for key, values in (('requests', [rec.get('request')]), ('sets', [rec.get('set')]), \
+						('services', list(((rec.get('log') or {}).get('services') or {}).keys()))):
+			entry[key].update(v for v in values if v is not None)
+
+	def segmentPath(self, name:str) -> str:
+		''' Return the path of a segment '''
+
+		return os.path.join(self.root, name)
+
+	def listSegments(self) -> List[str]:
+		''' Return the names of the segment files of the store, in the order of their sequence numbers '''
+
+		try:
+			names = [x for x in os.listdir(self.root) if _segment_name.match(x)]
+		except FileNotFoundError:
+			return []
+		return sorted(names, key=lambda x: int(_segment_name.match(x).group(1)))
+
+	def loadIndex(self) -> dict:
+		''' Load the index of the store. The index is rebuilt from the segments if it is missing, malformed or does not match the segment files
+		@return: Index of the store
+		@rtype: dict
+		'''
+
+		try:
+			with open(os.path.join(self.root, INDEX_NAME)) as f:
+				index = json.load(f)
+			if sorted(index['segments']) != sorted(self.listSegments()):
+				raise ValueError('Index does not match the segments of the store')
+			for entry in index['segments'].values():
+				for key in ENTRY_SETS:
+					entry[key] = set(entry[key])
+		except (OSError, ValueError, KeyError, TypeError):
+			index = self.rebuildIndex()
+		return index
+
+	def rebuildIndex(self) -> dict:
+		''' Rebuild the index of the store by reading all of its segments
+		@return: Index of the store
+		@rtype: dict
+		'''
+
+		index = {'active':None, 'segments':{}}
+		for name in self.listSegments():
+			entry = self.newEntry()
+			for rec in self.readSegment(name):
+				self.addToEntry(entry, rec)
+			index['segments'][name] = entry
+			if not name.endswith('.gz'):
+				index['active'] = name
+		for name, entry in index['segments'].items():
+			if not name.endswith('.gz') and name != index['active']:
+				entry['closed'] = True
+		return index
+
+	def saveIndex(self) -> None:
+		''' Write the index of the store (atomically) '''
+
+		fd, tmp = tempfile.mkstemp(prefix='.' + INDEX_NAME + '.', suffix='.tmp', dir=self.root)
+		try:
+			with os.fdopen(fd, 'w') as f:
+				json.dump(self.index, f, default=sorted)  # Sets of names are written as sorted lists
+			os.chmod(tmp, 0o644)
+			os.replace(tmp, os.path.join(self.root, INDEX_NAME))
+		except:
+			if os.path.exists(tmp):
+				os.remove(tmp)
+			raise
+		self.unsaved = 0
+		self.saved_time = time.time()
+
+	def openIndex(self) -> None:
+		''' Load the index for appends. The entry of the active segment is recomputed from the segment, as records
+		appended after the index was last written (e.g., before a restart of the writer) are not in the index
+		@note: Must be called while holding @lock
+		'''
+
+		self.index = self.loadIndex()
+		active = self.index['active']
+		if active and active in self.index['segments']:
+			entry = self.newEntry()
+			for rec in self.readSegment(active):
+				self.addToEntry(entry, rec)
+			self.index['segments'][active] = entry
+
+	def flush(self) -> None:
+		''' Write the index if it has records that are not written yet (e.g., before the writer stops) '''
+
+		with self.lock:
+			if self.index is not None and self.unsaved:
+				self.saveIndex()
+
+	def nextSegment(self) -> str:
+		''' Return the name of a new segment, following the latest segment of the store '''
+
+		seq = [int(_segment_name.match(x).group(1)) for x in self.index['segments']]
+		return SEGMENT_PREFIX + '%06d' % (max(seq) + 1 if seq else 1) + SEGMENT_SUFFIX
+
+	def append(self, req_id:str, log:dict, request:str=None, dset:str=None) -> dict:
+		''' Append a request log to the store
+		@param req_id: Unique name of the request log (e.g., '<request>.<uuid>')
+		@type req_id: str
+		@param log: Request log
+		@type log: dict
+		@param request: Request name. Defaults to @req_id
+		@type request: str
+		@param dset: Set of the request, if known
+		@type dset: str
+		@return: The appended record
+		@rtype: dict
+		'''
+
+		rec = {'id':req_id, 'request':request or req_id, 'set':dset, 'logged':time.time(), \
+			'start':_float(log.get('start')), 'end':_float(log.get('end')), 'log':log}
+		line = json.dumps(rec, default=str) + '\n'
+		with self.lock:
+			os.makedirs(self.root, exist_ok=True)
+			if self.index is None:
+				self.openIndex()
+			started = not self.index['active']
+			if started:
+				self.index['active'] = self.nextSegment()
+				self.index['segments'][self.index['active']] = self.newEntry()
+			path = self.segmentPath(self.index['active'])
+			with open(path, 'a') as f:
+				f.write(line)
+				size = f.tell()
+			self.addToEntry(self.index['segments'][self.index['active']], rec)
+			self.unsaved += 1
+			# The index is written when the segment files change (so readers do not rebuild it), and otherwise periodically
+			rotated = bool(self.segment_size and size >= self.segment_size)
+			if rotated:
+				self.rotate()
+			if started or rotated or self.unsaved >= self.index_records or time.time() - self.saved_time >= self.index_interval:
+				self.saveIndex()
+		return rec
+
+	def rotate(self) -> None:
+		''' Close the active segment (compressing it if required). The next append starts a new segment
+		@note: Must be called while holding @lock
+		'''
+
+		name = self.index['active']
+		if not name:
+			return
+		if self.compress:
+			path = self.segmentPath(name)
+			fd, tmp = tempfile.mkstemp(prefix='.' + name + '.', suffix='.tmp', dir=self.root)
+			try:
+				with open(path, 'rb') as fin, gzip.open(os.fdopen(fd, 'wb'), 'wb') as fout:
+					shutil.copyfileobj(fin, fout)
+				os.chmod(tmp, 0o644)
+				os.replace(tmp, path + '.gz')
+			except:
+				if os.path.exists(tmp):
+					os.remove(tmp)
+				raise
+			self.index['segments'][name + '.gz'] = self.index['segments'].pop(name)
+			os.remove(path)
+		else:
+			self.index['segments'][name]['closed'] = True
+		self.index['active'] = None
+
+	def readSegment(self, name:str) -> Iterator[dict]:
+		''' Read the records of a segment. Malformed lines (e.g., a partially written last line) are skipped
+		@param name: Name of the segment
+		@type name: str
+		@return: Iterator over the records of the segment
+		@rtype: Iterator[dict]
+		'''
+
+		path = self.segmentPath(name)
+		try:
+			f = gzip.open(path, 'rt') if name.endswith('.gz') else open(path)
+		except FileNotFoundError:  # The segment has been rotated (i.e., compressed) since it was listed
+			if name.endswith('.gz'):
+				return
+			yield from self.readSegment(name + '.gz')
+			return
+		with f:
+			for line in f:
+				try:
+					rec = json.loads(line)
+				except ValueError:
+					continue
+				if isinstance(rec, dict):
+					yield rec
+
+	def segments(self, request:str=None, service:str=None, dset:str=None, start:float=None, end:float=None) -> List[str]:
+		''' Return the names of the segments that may contain records matching a query (see @query). The active segment is always included '''
+
+		index = self.index if self.index is not None else self.loadIndex()
+		res = []
+		for name in self.listSegments():
+			entry = index['segments'].get(name)
+			if not entry or name == index.get('active') or not name.endswith('.gz') and not entry.get('closed'):
+				res.append(name)  # The segment may have records that are not indexed yet
+				continue
+			if request is not None and request not in entry['requests']:
+				continue
+			if service is not None and service not in entry['services']:
+				continue
+			if dset is not None and dset not in entry['sets']:
+				continue
+			if start is not None and entry['end'] is not None and entry['end'] < start:
+				continue
+			if end is not None and entry['start'] is not None and entry['start'] > end:
+				continue
+			res.append(name)
+		return res
+
+	def query(self, request:str=None, service:str=None, dset:str=None, start:float=None, end:float=None) -> Iterator[dict]:
+		''' Return the records that match a query. Only the segments that may contain matching records are read
+		@param request: If specified, only records of this request (name) are returned
+		@type request: str
+		@param service: If specified, only records of requests that have this service are returned
+		@type service: str
+		@param dset: If specified, only records of this set are returned
+		@type dset: str
+		@param start: If specified, only records of requests that end at or after this time are returned
+		@type start: float
+		@param end: If specified, only records of requests that start at or before this time are returned
+		@type end: float
+		@return: Iterator over matching records, in the order they were appended
+		@rtype: Iterator[dict]
+		'''
+
+		for name in self.segments(request=request, service=service, dset=dset, start=start, end=end):
+			for rec in self.readSegment(name):
+				if request is not None and rec.get('request') != request:
+					continue
+				if service is not None and service not in ((rec.get('log') or {}).get('services') or {}):
+					continue
+				if dset is not None and rec.get('set') != dset:
+					continue
+				if start is not None and rec.get('end') is not None and rec['end'] < start:
+					continue
+				if end is not None and rec.get('start') is not None and rec['start'] > end:
+					continue
+				yield rec
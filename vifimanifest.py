@@ -0,0 +1,218 @@
+'''
+Created on Oct 19, 2026
+
+Result manifests of VIFI requests. A manifest records, for each result file of a request, its path, size,
+modification time and checksum. Checksums are computed once (in parallel, with large files read through mmap) and
+reused by the transfer backends: S3 uploads send the MD5 digest (Content-MD5) so that S3 verifies the uploaded data,
+and NiFi bundles ship the manifest of their files. The manifest is only built when a transfer fires, and only for the
+files it ships, and unchanged files keep their checksums across iterations, so each shipped file is read once, not once
+per destination.
+The checksum uses xxhash or blake3 if installed, and blake2b otherwise.
+
+@author: Mohammed Elshambakey
+@contact: shambakey1@gmail.com
+'''
+
+import os, json, mmap, base64, hashlib, tempfile, threading
+from concurrent.futures import ThreadPoolExecutor
+from vififs import ResultIndex
+
+try:
+	import xxhash
+	HASH_NAME = 'xxh3_128'
+	_newHash = xxhash.xxh3_128
+except ImportError:
+	try:
+		import blake3
+		HASH_NAME = 'blake3'
+		_newHash = blake3.blake3
+	except ImportError:
+		HASH_NAME = 'blake2b'
+		_newHash = hashlib.blake2b
+
+MANIFEST_NAME = '.vifi_manifest.json'  # Name of the manifest file in the results folder of a request (and in NiFi bundles)
+MMAP_MIN = 8 * 1024 * 1024  # Files of at least this size are read through mmap
+READ_BUFSIZE = 1024 * 1024  # Size of each read of smaller files
+HASH_WORKERS = min(16, (os.cpu_count() or 1) * 2)  # Number of threads that compute checksums
+
+
+def hashFile(path:str, md5:bool=False) -> tuple:
+	''' Compute the checksum (and the MD5 digest, if required) of a file in one read
+	@param path: Path of the file
+	@type path: str
+	@param md5: If True, compute the MD5 digest as well
+	@type md5: bool
+	@return: Tuple of (checksum in hex, MD5 digest in hex or None)
+	@rtype: tuple
+	'''
+
+	h = _newHash()
+	m = hashlib.md5() if md5 else None
+	with open(path, 'rb') as f:
+		size = os.fstat(f.fileno()).st_size
+		if size >= MMAP_MIN:
+			with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+				view = memoryview(mm)
+				try:
+					for pos in range(0, size, MMAP_MIN):  # Chunks of the mapped file are hashed without copying them
+						h.update(view[pos:pos + MMAP_MIN])
+						if m:
+							m.update(view[pos:pos + MMAP_MIN])
+				finally:
+					view.release()
+		else:
+			for chunk in iter(lambda: f.read(READ_BUFSIZE), b''):
+				h.update(chunk)
+				if m:
+					m.update(chunk)
+	return h.hexdigest(), m.hexdigest() if m else None
+
+
+class ResultManifest():
+	''' Manifest of the result files under a results folder. Entries are dictionaries of 'path' (relative to the
+	results folder), 'size', 'mtime', 'hash' and, if required, 'md5'. An entry is recomputed only if its file changes
+	(i.e., its size, modification time or inode change).
+	'''
+
+	def __init__(self, root:str):
+		'''
+		@param root: Results folder
+		@type root: str
+		'''
+
+		self.root = root
+		self.entries = {}  # Entries of the result files. Key is the path relative to @root
+		self.stats = {}  # Signature (size, modification time in nanoseconds, inode) of each file when its entry was computed
+		self.lock = threading.Lock()
+
+	def build(self, index:ResultIndex=None, md5:bool=False, workers:int=None, paths:list=None) -> dict:
+		''' Update the manifest with the current result files. Checksums of new and changed files are computed in parallel
+		@param index: Index of the result directories of the current iteration. A new index is used if none is specified
+		@type index: ResultIndex
+		@param md5: If True, the MD5 digests of files (used by S3) are computed as well
+		@type md5: bool
+		@param workers: Number of threads that compute checksums. Defaults to HASH_WORKERS
+		@type workers: int
+		@param paths: Files and directories (absolute, or relative to the results folder) to update (e.g., the files shipped by a transfer). The whole results folder is updated if not specified. Entries of other files are kept
+		@type paths: list
+		@return: The entries of the manifest
+		@rtype: dict
+		'''
+
+		index = index or ResultIndex()
+		todo = []
+		current = set()
+		if paths is None:
+			listing = index.walk(self.root)
+		else:
+			listing = []
+			for x in paths:
+				full = os.path.join(self.root, x)
+				if index.isdir(full):
+					listing.extend(index.walk(full))
+				else:
+					listing.append((os.path.dirname(full), [], [os.path.basename(full)]))
+		for path, _, files in listing:
+			for f in files:
+				full = os.path.join(path, f)
+				rel = os.path.relpath(full, self.root)
+				if rel == MANIFEST_NAME or os.path.islink(full):
+					continue
+				try:
+					st = os.stat(full)
+				except OSError:
+					continue
+				current.add(rel)
+				sig = (st.st_size, st.st_mtime_ns, st.st_ino)
+				if self.stats.get(rel) != sig or (md5 and not self.entries[rel].get('md5')):
+					todo.append((rel, full, sig, st))
+
+		def compute(item):
+			rel, full, sig, st = item
+			digest, md5_digest = hashFile(full, md5)
+			entry = {'path':rel, 'size':st.st_size, 'mtime':st.st_mtime, 'hash':digest}
+			if md5_digest:
+				entry['md5'] = md5_digest
+			with self.lock:
+				self.entries[rel] = entry
+				self.stats[rel] = sig
+
+		workers = workers or HASH_WORKERS
+		if workers > 1 and len(todo) > 1:
+			with ThreadPoolExecutor(max_workers=min(workers, len(todo))) as pool:
+				for _ in pool.map(compute, todo):  # Raises the first error, if any
+					pass
+		else:
+			for item in todo:
+				compute(item)
+
+		with self.lock:
+			if paths is None:
+				for rel in set(self.entries) - current:
+					del self.entries[rel]
+					self.stats.pop(rel, None)
+			return self.entries
+
+	def get(self, path:str) -> dict:
+		''' Return the entry of a result file, or None if the file is not in the manifest or has changed since its entry was computed
+		@param path: Path of the file (absolute, or relative to the results folder)
+		@type path: str
+		@return: Entry of the file
+		@rtype: dict
+		'''
+
+		rel = os.path.relpath(os.path.join(self.root, path), self.root)
+		with self.lock:
+			entry = self.entries.get(rel)
+			sig = self.stats.get(rel)
+		if not entry:
+			return None
+		try:
+			st = os.stat(os.path.join(self.root, rel))
+		except OSError:
+			return None
+		return entry if sig == (st.st_size, st.st_mtime_ns, st.st_ino) else None
+
+	def contentMD5(self, path:str) -> str:
+		''' Return the base64 encoded MD5 digest of a result file (i.e., the Content-MD5 header of S3 uploads), or None if it is not known '''
+
+		entry = self.get(path)
+		return base64.b64encode(bytes.fromhex(entry['md5'])).decode() if entry and entry.get('md5') else None
+
+	def toDict(self, paths:list=None) -> dict:
+		''' Return the manifest as a dictionary, optionally restricted to some files and directories
+		@param paths: Files and directories (absolute, or relative to the results folder) whose entries are included. All entries are included if not specified
+		@type paths: list
+		@return: Manifest
+		@rtype: dict
+		'''
+
+		with self.lock:
+			entries = list(self.entries.values())
+		if paths is not None:
+			prefixes = [os.path.relpath(os.path.join(self.root, x), self.root) for x in paths]
+			entries = [e for e in entries if any(e['path'] == p or e['path'].startswith(p + os.sep) for p in prefixes)]
+		return {'algorithm':HASH_NAME, 'files':sorted(entries, key=lambda e: e['path'])}
+
+	def dump(self, outfile:str=None, paths:list=None) -> str:
+		''' Write the manifest as a JSON file (atomically)
+		@param outfile: Output file. Defaults to MANIFEST_NAME in the results folder
+		@type outfile: str
+		@param paths: Files and directories whose entries are written (see @toDict)
+		@type paths: list
+		@return: Path of the written file
+		@rtype: str
+		'''
+
+		outfile = outfile or os.path.join(self.root, MANIFEST_NAME)
+		fd, tmp = tempfile.mkstemp(prefix='.' + os.path.basename(outfile) + '.', suffix='.tmp', dir=os.path.dirname(os.path.abspath(outfile)))
+		try:
+			with os.fdopen(fd, 'w') as f:
+				json.dump(self.toDict(paths), f, indent=1)
+			os.chmod(tmp, 0o644)
+			os.replace(tmp, outfile)
+		except:
+			if os.path.exists(tmp):
+				os.remove(tmp)
+			raise
+		return outfile
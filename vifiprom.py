@@ -0,0 +1,358 @@
+'''
+Created on Oct 19, 2026
+
+Prometheus query engine of VIFI Nodes. A PromClient keeps one pooled HTTP session to the Prometheus API, runs range
+queries of many metrics in parallel by a bounded pool of threads, optionally combines several metrics into one regex
+selector (i.e., {__name__=~"a|b|c"}) and splits the returned series back by metric name, and retries failed queries
+(i.e., connection errors, timeouts and 429/5xx responses) with exponential backoff.
+Long range queries are split into chunks, so that no query goes over the maximum number of points that Prometheus
+returns per series, and the series of the chunks are merged. If a query cache is used, timestamps are aligned to
+multiples of the step, chunks are aligned to multiples of the chunk length, and the results of complete (i.e., old
+enough) chunks are kept on disk, keyed by the normalized query. Thus, repeated analyses read cached chunks instead of
+querying Prometheus again. The cache is bounded in size, and the least recently used chunks are evicted.
+
+@author: Mohammed Elshambakey
+@contact: shambakey1@gmail.com
+'''
+
+import os, re, json, math, time, hashlib, tempfile, threading, requests
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+PROM_WORKERS = 8  # Default number of parallel queries
+PROM_BATCH = 1  # Default number of metrics combined into one query. If 1, each metric is queried alone
+PROM_RETRIES = 3  # Default number of times a failed query is retried
+PROM_BACKOFF = 0.5  # Initial delay (in seconds) before retrying a failed query. The delay doubles after each retry
+PROM_TIMEOUT = 60  # Timeout (in seconds) of each HTTP request
+RETRY_STATUS = (429, 500, 502, 503, 504)  # HTTP status codes of failed queries that are retried
+MAX_GET_QUERY = 2048  # Longer queries are sent by POST, so that they do not exceed URL length limits
+MAX_POINTS = 11000  # Maximum number of points per series that Prometheus returns for one range query
+CHUNK_POINTS = 240  # Default number of points (i.e., steps) of each cached chunk
+CACHE_SIZE = 1024 * 1024 * 1024  # Default maximum size (in bytes) of the query cache
+CACHE_MIN_AGE = 300  # Chunks are cached only if their last point is at least this old (in seconds), as recent data may still change
+
+
+class PromError(Exception):
+	''' Raised when a Prometheus query fails (after all of its retries) '''
+
+	pass
+
+
+class QueryCache():
+	''' Size-bounded on-disk cache of range query results. Each entry is a JSON file named by its key. The modification
+	time of an entry is updated when it is read, and the least recently used entries are evicted first.
+	'''
+
+	def __init__(self, path:str, max_bytes:int=CACHE_SIZE):
+		'''
+		@param path: Directory of the cache
+		@type path: str
+		@param max_bytes: Maximum total size (in bytes) of the cache entries
+		@type max_bytes: int
+		'''
+
+		self.path = path
+		self.max_bytes = max_bytes
+		self.entries = OrderedDict()  # Size of each entry by key, from the least to the most recently used
+		self.size = 0  # Total size of the entries
+		self.lock = threading.Lock()
+		os.makedirs(path, exist_ok=True)
+		files = []
+		for f in os.listdir(path):
+			if f.endswith('.json'):
+				try:
+					st = os.stat(os.path.join(path, f))
+				except OSError:
+					continue
+				files.append((st.st_mtime, f[:-len('.json')], st.st_size))
+		for _, key, size in sorted(files):
+			self.entries[key] = size
+			self.size += size
+
+	@staticmethod
+	def key(*parts) -> str:
+		''' Return the key of an entry from its parts (e.g., url, normalized query, step and chunk) '''
+
+		return hashlib.sha256('\0'.join(str(x) for x in parts).encode()).hexdigest()
+
+	def entryPath(self, key:str) -> str:
+		''' Return the path of the file of an entry '''
+
+		return os.path.join(self.path, key + '.json')
+
+	def get(self, key:str):
+		''' Return the value of an entry, or None if the entry is not cached '''
+
+		with self.lock:
+			if key not in self.entries:
+				return None
+			self.entries.move_to_end(key)
+		try:
+			with open(self.entryPath(key)) as f:
+				value = json.load(f)
+			os.utime(self.entryPath(key))
+			return value
+		except (OSError, ValueError):  # The entry has been removed or is malformed
+			with self.lock:
+				self.size -= self.entries.pop(key, 0)
+			return None
+
+	def put(self, key:str, value) -> None:
+		''' Add an entry, and evict the least recently used entries if the cache goes over its maximum size '''
+
+		fd, tmp = tempfile.mkstemp(prefix='.' + key + '.', suffix='.tmp', dir=self.path)
+		try:
+			with os.fdopen(fd, 'w') as f:
+				json.dump(value, f)
+			size = os.path.getsize(tmp)
+			os.replace(tmp, self.entryPath(key))
+		except:
+			if os.path.exists(tmp):
+				os.remove(tmp)
+			raise
+		with self.lock:
+			self.size += size - self.entries.pop(key, 0)
+			self.entries[key] = size
+			evicted = []
+			while self.size > self.max_bytes and len(self.entries) > 1:
+				old, old_size = self.entries.popitem(last=False)
+				self.size -= old_size
+				evicted.append(old)
+		for old in evicted:
+			try:
+				os.remove(self.entryPath(old))
+			except OSError:
+				pass
+
+
+class PromClient():
+	''' Client of the Prometheus HTTP API '''
+
+	def __init__(self, url:str, uname:str=None, upass:str=None, workers:int=PROM_WORKERS, retries:int=PROM_RETRIES, \
+				backoff:float=PROM_BACKOFF, timeout:float=PROM_TIMEOUT, cache:QueryCache=None, chunk_points:int=CHUNK_POINTS):
+		'''
+		@param url: Prometheus API url (e.g., http://localhost:9090/api/v1/)
+		@type url: str
+		@param uname: Prometheus username
+		@type uname: str
+		@param upass: Prometheus password
+		@type upass: str
+		@param workers: Maximum number of parallel queries
+		@type workers: int
+		@param retries: Number of times a failed query is retried
+		@type retries: int
+		@param backoff: Initial delay (in seconds) before retrying a failed query
+		@type backoff: float
+		@param timeout: Timeout (in seconds) of each HTTP request
+		@type timeout: float
+		@param cache: Cache of range query results. If None, results are not cached
+		@type cache: QueryCache
+		@param chunk_points: Number of points of each cached chunk
+		@type chunk_points: int
+		'''
+
+		self.url = url if url.endswith('/') else url + '/'
+		self.workers = max(1, workers or PROM_WORKERS)
+		self.retries = PROM_RETRIES if retries is None else retries
+		self.backoff = backoff
+		self.timeout = timeout
+		self.cache = cache
+		self.chunk_points = chunk_points
+		self.session = requests.Session()
+		if uname or upass:
+			self.session.auth = (uname, upass)
+		self.mountAdapter()
+
+	def mountAdapter(self) -> None:
+		''' Mount a connection pool of one connection per parallel query (i.e., @workers) on the session '''
+
+		adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+		for prefix in ('http://', 'https://'):
+			old = self.session.adapters.get(prefix)
+			self.session.mount(prefix, adapter)
+			if old is not None and old is not adapter:
+				old.close()
+
+	def setWorkers(self, workers:int) -> None:
+		''' Change the maximum number of parallel queries. The connection pool is resized, so that parallel queries do not open connections that are discarded
+		@param workers: Maximum number of parallel queries
+		@type workers: int
+		'''
+
+		workers = max(1, workers or PROM_WORKERS)
+		if workers != self.workers:
+			self.workers = workers
+			self.mountAdapter()
+
+	def close(self) -> None:
+		''' Close the connections of the client '''
+
+		self.session.close()
+
+	def request(self, endpoint:str, params:dict) -> dict:
+		''' Send a request to the Prometheus API, retrying failed requests
+		@param endpoint: API endpoint (e.g., 'query_range')
+		@type endpoint: str
+		@param params: Parameters of the request
+		@type params: dict
+		@return: The 'data' field of the response
+		@rtype: dict
+		@raise PromError: If the request fails after all retries
+		'''
+
+		delay = self.backoff
+		for attempt in range(self.retries + 1):
+			try:
+				if len(str(params.get('query', ''))) > MAX_GET_QUERY:
+					res = self.session.post(self.url + endpoint, data=params, timeout=self.timeout)
+				else:
+					res = self.session.get(self.url + endpoint, params=params, timeout=self.timeout)
+				if res.ok:
+					return res.json()['data']
+				error = 'HTTP ' + str(res.status_code) + ': ' + res.text[:200]
+				if res.status_code not in RETRY_STATUS:
+					break
+			except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+				error = str(e)  # Transient errors are retried
+			except (requests.RequestException, ValueError, KeyError, TypeError) as e:
+				error = type(e).__name__ + ': ' + str(e)  # E.g., an invalid request, or a response that is not valid Prometheus JSON
+				break
+			if attempt < self.retries:
+				time.sleep(delay)
+				delay *= 2
+		raise PromError('Prometheus request ' + endpoint + ' failed: ' + error)
+
+	def metricNames(self) -> List[str]:
+		''' Return the names of all metrics of Prometheus '''
+
+		return self.request('label/__name__/values', {})
+
+	def queryRange(self, query:str, start:float, end:float, step:float) -> list:
+		''' Run a range query. Long ranges are split into chunks (see the module description), whose series are merged
+		@param query: PromQL query
+		@type query: str
+		@param start: Start time of the query (Unix Time Stamp)
+		@type start: float
+		@param end: End time of the query (Unix Time Stamp)
+		@type end: float
+		@param step: Time step of the query (in seconds)
+		@type step: float
+		@return: The 'result' field of the response (i.e., list of series)
+		@rtype: list
+		'''
+
+		step = float(step)
+		if self.cache is None:
+			# Split the range into chunks of at most MAX_POINTS points, on the grid of the original start time
+			span = step * (MAX_POINTS - 1)
+			if end - start <= span:
+				return self.fetchRange(query, start, end, step)
+			chunks = []
+			t = start
+			while t <= end:
+				chunks.append(self.fetchRange(query, t, min(t + span, end), step))
+				t += span + step
+			return self.mergeSeries(chunks, start, end)
+
+		# Fetch (or read from the cache) the aligned chunks that cover the range
+		query = ' '.join(query.split())
+		chunk_points = max(1, min(self.chunk_points or CHUNK_POINTS, MAX_POINTS))
+		length = step * chunk_points
+		start = math.ceil(start / step) * step
+		end = math.floor(end / step) * step
+		if end < start:
+			return []
+		complete_before = time.time() - CACHE_MIN_AGE
+		chunks = []
+		for c in range(int(start // length), int(end // length) + 1):
+			c_start = c * length
+			c_end = c_start + length - step
+			if c_end > complete_before:  # Recent chunks are not cached, and only the required part of them is fetched
+				chunks.append(self.fetchRange(query, max(c_start, start), min(c_end, end), step))
+				continue
+			key = self.cache.key(self.url, query, step, c)
+			result = self.cache.get(key)
+			if result is None:
+				result = self.fetchRange(query, c_start, c_end, step)
+				self.cache.put(key, result)
+			chunks.append(result)
+		return self.mergeSeries(chunks, start, end)
+
+	def fetchRange(self, query:str, start:float, end:float, step:float) -> list:
+		''' Send one range query to Prometheus, and return its series '''
+
+		return self.request('query_range', {'query':query, 'start':start, 'end':end, 'step':step})['result']
+
+	@staticmethod
+	def mergeSeries(chunks:List[list], start:float, end:float) -> list:
+		''' Merge the series of consecutive chunks of a range query. Series with the same labels are joined, and points outside [@start, @end] are dropped
+		@param chunks: Series of each chunk, in time order
+		@type chunks: List[list]
+		@param start: Start time of the range query
+		@type start: float
+		@param end: End time of the range query
+		@type end: float
+		@return: Merged series
+		@rtype: list
+		'''
+
+		merged = OrderedDict()  # Merged series by labels, in the order they first appear
+		for series in chunks:
+			for s in series:
+				labels = tuple(sorted(s.get('metric', {}).items()))
+				if labels not in merged:
+					merged[labels] = {'metric':s.get('metric', {}), 'values':[]}
+				merged[labels]['values'].extend(v for v in s.get('values', []) if start <= v[0] <= end)
+		return [s for s in merged.values() if s['values']]
+
+	@staticmethod
+	def selector(metrics:List[str]) -> str:
+		''' Return a query that selects all series of the specified metrics '''
+
+		if len(metrics) == 1:
+			return metrics[0]
+		return '{__name__=~"' + '|'.join(re.escape(x) for x in metrics) + '"}'
+
+	def queryMetrics(self, metrics:List[str], start:float, end:float, step:float, batch:int=PROM_BATCH) -> dict:
+		''' Run range queries of many metrics in parallel
+		@param metrics: Metrics names
+		@type metrics: List[str]
+		@param start: Start time of the queries (Unix Time Stamp)
+		@type start: float
+		@param end: End time of the queries (Unix Time Stamp)
+		@type end: float
+		@param step: Time step of the queries (in seconds)
+		@type step: float
+		@param batch: Number of metrics combined into one query (see @selector). If 1, each metric is queried alone
+		@type batch: int
+		@return: Series of each metric. Key is the metric name. Value is the list of series, or an error message (str) if the query of the metric failed
+		@rtype: dict
+		'''
+
+		batch = max(1, batch or 1)
+		groups = [metrics[i:i + batch] for i in range(0, len(metrics), batch)]
+
+		def run(group):
+			try:
+				series = self.queryRange(self.selector(group), start, end, step)
+			except PromError:
+				return {mi:"Error: cannot contact Prometheus for metric " + mi for mi in group}
+			if len(group) == 1:
+				return {group[0]:series}
+			res = {mi:[] for mi in group}
+			for s in series:
+				name = s.get('metric', {}).get('__name__')
+				if name in res:
+					res[name].append(s)
+			return res
+
+		res_values = {}
+		if self.workers > 1 and len(groups) > 1:
+			with ThreadPoolExecutor(max_workers=min(self.workers, len(groups))) as pool:
+				for part in pool.map(run, groups):
+					res_values.update(part)
+		else:
+			for group in groups:
+				res_values.update(run(group))
+		return {mi:res_values[mi] for mi in metrics}  # Keep the order of the specified metrics
@@ -0,0 +1,551 @@
+'''
+Created on Oct 19, 2026
+
+Compiled request model. The user configuration file (conf.yml) of a request is parsed and validated once into compact
+typed objects (Request, ServiceSpec, IterationSpec, TransferSpec, ResourceSpec), so that the scheduler does not re-index nested
+dictionaries in its hot loop, and a malformed configuration fails once, at load time. The model can be serialized back
+to the original YAML structure.
+
+@author: Mohammed Elshambakey
+@contact: shambakey1@gmail.com
+'''
+
+import re
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Callable
+from vificonf import loadYAML, dumpYAML
+
+
+class RequestConfError(ValueError):
+	''' Raised when the user configuration file of a request is malformed '''
+	pass
+
+
+def _check(cond:bool, mes:str) -> None:
+	''' Raise RequestConfError with the given message if the condition does not hold '''
+
+	if not cond:
+		raise RequestConfError(mes)
+
+
+def _isint(x) -> bool:
+	''' True if the input is an integer (booleans are not accepted as integers) '''
+
+	return isinstance(x, int) and not isinstance(x, bool)
+
+
+# Terms of the transfer condition language. Each term is evaluated over (current iteration, maximum repetitions, stop flag)
+_cond_terms = {'all':lambda it, rep, stop: True, \
+			'never':lambda it, rep, stop: False, \
+			'true':lambda it, rep, stop: True, \
+			'false':lambda it, rep, stop: False, \
+			'last_iteration':lambda it, rep, stop: it == rep, \
+			'all_but_last_iteration':lambda it, rep, stop: it < rep, \
+			'stop_iteration':lambda it, rep, stop: stop}
+_cond_tokens = re.compile(r'\s*(?:(\()|(\))|([A-Za-z_]+))')
+
+
+@lru_cache(maxsize=1024)
+def compileCondition(cond:str) -> Callable:
+	''' Compile a transfer condition (e.g., 'last_iteration or stop_iteration') into a predicate. The condition language
+	consists of the terms 'all', 'never', 'last_iteration', 'all_but_last_iteration', 'stop_iteration', 'true' and 'false',
+	combined by 'and', 'or', 'not' and parentheses (case insensitive). Compiled conditions are cached, so each condition is
+	compiled only once.
+	@param cond: Transfer condition
+	@type cond: str
+	@return: Predicate called as predicate(cur_iter, max_rep, stop), where @cur_iter is the number of finished iterations,
+	@max_rep is the maximum repetitions (an integer or 'inf'), and @stop is True if the 'stop.iterating' file exists. The
+	predicate has the attribute 'uses_stop' which is True if the condition depends on @stop
+	@rtype: Callable
+	@raise RequestConfError: If the condition has a syntax error
+	'''
+
+	# Tokenize the condition
+	tokens = []
+	pos = 0
+	cond_str = str(cond).strip()
+	while pos < len(cond_str):
+		m = _cond_tokens.match(cond_str, pos)
+		_check(m and m.end() > pos, 'Invalid transfer condition "' + cond_str + '" at position ' + str(pos))
+		tokens.append(m.group(1) or m.group(2) or m.group(3).lower())
+		pos = m.end()
+		while pos < len(cond_str) and cond_str[pos].isspace():
+			pos += 1
+	_check(tokens, 'Empty transfer condition')
+
+	uses_stop = 'stop_iteration' in tokens
+	pos = 0
+
+	def peek():
+		return tokens[pos] if pos < len(tokens) else None
+
+	def take():
+		nonlocal pos
+		pos += 1
+		return tokens[pos - 1]
+
+	# Recursive descent parser. Precedence (from lowest): or, and, not
+	def parseOr():
+		left = parseAnd()
+		while peek() == 'or':
+			take()
+			left = (lambda a, b: lambda it, rep, stop: a(it, rep, stop) or b(it, rep, stop))(left, parseAnd())
+		return left
+
+	def parseAnd():
+		left = parseNot()
+		while peek() == 'and':
+			take()
+			left = (lambda a, b: lambda it, rep, stop: a(it, rep, stop) and b(it, rep, stop))(left, parseNot())
+		return left
+
+	def parseNot():
+		if peek() == 'not':
+			take()
+			return (lambda a: lambda it, rep, stop: not a(it, rep, stop))(parseNot())
+		return parseAtom()
+
+	def parseAtom():
+		tok = take() if peek() is not None else None
+		if tok == '(':
+			node = parseOr()
+			_check(peek() == ')', 'Missing ")" in transfer condition "' + cond_str + '"')
+			take()
+			return node
+		_check(tok in _cond_terms, 'Unknown term "' + str(tok) + '" in transfer condition "' + cond_str + '"')
+		return _cond_terms[tok]
+
+	node = parseOr()
+	_check(pos == len(tokens), 'Unexpected "' + str(peek()) + '" in transfer condition "' + cond_str + '"')
+
+	def predicate(cur_iter:int, max_rep, stop:bool=False) -> bool:
+		if str(max_rep).lower() in ('inf', '.inf'):
+			max_rep = float('inf')
+		return bool(node(cur_iter, max_rep, stop))
+	predicate.uses_stop = uses_stop
+	return predicate
+
+
+class IterationSpec():
+	''' Iteration parameters of a service (i.e., the 'iterative' section of the service) '''
+
+	__slots__ = ('max_rep', 'cur_iter', 'persistent', 'extra')
+
+	def __init__(self, max_rep=1, cur_iter:int=0, persistent:bool=None):
+		'''
+		@param max_rep: Maximum number of iterations. Either an integer, 'inf', or YAML infinity (.inf)
+		@type max_rep: int or str or float
+		@param cur_iter: Current iteration number (i.e., number of finished iterations)
+		@type cur_iter: int
+		@param persistent: If True, all iterations run in one long-lived service (if allowed by the set). None if not specified
+		@type persistent: bool
+		'''
+
+		self.max_rep = max_rep
+		self.cur_iter = cur_iter
+		self.persistent = persistent
+		self.extra = {}  # Other keys of the section (including a null 'persistent'), kept as they are
+
+	@classmethod
+	def fromDict(cls, conf:dict, where:str='iterative'):
+		''' Parse and validate the 'iterative' section of a service
+		@param conf: The 'iterative' section
+		@type conf: dict
+		@param where: Location of the section in the configuration file. Used in error messages
+		@type where: str
+		@return: Iteration parameters
+		@rtype: IterationSpec
+		'''
+
+		_check(isinstance(conf, dict) and 'max_rep' in conf and 'cur_iter' in conf, where + ' should have max_rep and cur_iter')
+		max_rep = conf['max_rep']
+		_check(str(max_rep).lower() in ('inf', '.inf') or (_isint(max_rep) and max_rep >= 0), \
+			where + '.max_rep should be a non-negative integer or inf')
+		_check(_isint(conf['cur_iter']) and conf['cur_iter'] >= 0, where + '.cur_iter should be a non-negative integer')
+		_check(conf.get('persistent') is None or isinstance(conf['persistent'], bool), where + '.persistent should be True or False')
+		it = cls(max_rep, conf['cur_iter'], conf.get('persistent'))
+		it.extra = {k:v for k, v in conf.items() if k not in ('max_rep', 'cur_iter') and not (k == 'persistent' and v is not None)}
+		return it
+
+	@property
+	def infinite(self) -> bool:
+		''' True if the service iterates until it produces the 'stop.iterating' file '''
+
+		return str(self.max_rep).lower() in ('inf', '.inf')
+
+	def unfinished(self) -> bool:
+		''' True if the service still has iterations to run '''
+
+		return self.infinite or self.cur_iter < self.max_rep
+
+	def toDict(self) -> dict:
+		''' Serialize back to the 'iterative' section '''
+
+		conf = {'max_rep':self.max_rep, 'cur_iter':self.cur_iter}
+		conf.update(self.extra)
+		if self.persistent is not None:
+			conf['persistent'] = self.persistent
+		return conf
+
+
+class ResourceSpec():
+	''' Resource reservations of each task of a service (i.e., the optional 'resources' section of the service) '''
+
+	__slots__ = ('cpu', 'memory', 'min_tasks', 'extra')
+
+	_mem_units = {'': 1, 'b': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3, 't': 1024 ** 4}
+
+	def __init__(self, cpu:float=None, memory=None, min_tasks:int=None):
+		'''
+		@param cpu: Number of CPUs reserved for each task (e.g., 0.5)
+		@type cpu: float
+		@param memory: Memory reserved for each task, either in bytes, or with a unit suffix (e.g., '512M', '2G')
+		@type memory: int or str
+		@param min_tasks: Minimum number of tasks the service can be shrunk to if resources are not enough for all tasks. Defaults to all tasks (i.e., no shrinking)
+		@type min_tasks: int
+		'''
+
+		self.cpu = cpu
+		self.memory = memory
+		self.min_tasks = min_tasks
+		self.extra = {}  # Other keys (and null reservations) of the section, kept as they are
+
+	@classmethod
+	def fromDict(cls, conf:dict, where:str='resources'):
+		''' Parse and validate the 'resources' section of a service
+		@param conf: The 'resources' section
+		@type conf: dict
+		@param where: Location of the section in the configuration file. Used in error messages
+		@type where: str
+		@return: Resource reservations
+		@rtype: ResourceSpec
+		'''
+
+		_check(isinstance(conf, dict), where + ' should be a dictionary')
+		cpu = conf.get('cpu')
+		_check(cpu is None or ((_isint(cpu) or isinstance(cpu, float)) and cpu > 0), where + '.cpu should be a positive number')
+		res = cls(cpu, conf.get('memory'), conf.get('min_tasks'))
+		res.extra = {k:v for k, v in conf.items() if k not in ('cpu', 'memory', 'min_tasks') or v is None}
+		_check(res.memory is None or res.memBytes() > 0, where + '.memory should be a positive size (e.g., 536870912, 512M, 2G)')
+		_check(res.min_tasks is None or (_isint(res.min_tasks) and res.min_tasks > 0), where + '.min_tasks should be a positive integer')
+		return res
+
+	@property
+	def nano_cpus(self) -> int:
+		''' Reserved CPUs of each task in units of 1e-9 CPUs (as used by Docker), or 0 if not specified '''
+
+		return int(self.cpu * 1e9) if self.cpu else 0
+
+	def memBytes(self) -> int:
+		''' Reserved memory of each task in bytes, 0 if not specified, or -1 if malformed '''
+
+		if self.memory is None:
+			return 0
+		if _isint(self.memory):
+			return self.memory
+		m = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([bkmgt]?)i?b?\s*', str(self.memory).lower())
+		return int(float(m.group(1)) * self._mem_units[m.group(2)]) if m else -1
+
+	def toDict(self) -> dict:
+		''' Serialize back to the 'resources' section '''
+
+		conf = dict(self.extra)
+		conf.update({k:getattr(self, k) for k in ('cpu', 'memory', 'min_tasks') if getattr(self, k) is not None})
+		return conf
+
+
+class TransferSpec():
+	''' A transfer section of a service (i.e., the 's3' section, or one of the 'nifi' or 'sftp' sections). The original
+	section is kept in @conf, as it is passed as it is to the transfer functions (e.g., s3Transfer, nifiTransfer)
+	'''
+
+	__slots__ = ('kind', 'conf', 'condition', 'predicate', 'results')
+
+	# Keys required by the transfer functions for each kind of transfer
+	required_keys = {'s3':('bucket', 'path'), \
+					'nifi':('archname', 'target_uri', 'target_remote_input_port'), \
+					'sftp':('host', 'port', 'username', 'password', 'dest_path')}
+
+	def __init__(self, kind:str, conf:dict):
+		'''
+		@param kind: Kind of transfer (i.e., 's3', 'nifi' or 'sftp')
+		@type kind: str
+		@param conf: The transfer section
+		@type conf: dict
+		'''
+
+		self.kind = kind
+		self.conf = conf
+		self.condition = conf['transfer']['condition']
+		self.predicate = compileCondition(self.condition)  # Compiled transfer condition
+		self.results = conf.get('results')
+
+	@classmethod
+	def fromDict(cls, kind:str, conf:dict, where:str=''):
+		''' Parse and validate a transfer section
+		@param kind: Kind of transfer (i.e., 's3', 'nifi' or 'sftp')
+		@type kind: str
+		@param conf: The transfer section
+		@type conf: dict
+		@param where: Location of the section in the configuration file. Used in error messages
+		@type where: str
+		@return: Transfer section
+		@rtype: TransferSpec
+		'''
+
+		where = where or kind
+		_check(isinstance(conf, dict), where + ' should be a dictionary')
+		_check(isinstance(conf.get('transfer'), dict) and isinstance(conf['transfer'].get('condition'), str), \
+			where + '.transfer.condition should be a string')
+		_check(conf.get('results') is None or isinstance(conf['results'], (list, dict)), \
+			where + '.results should be a list or a dictionary')
+		for k in cls.required_keys[kind]:
+			_check(k in conf, where + ' misses required key ' + k)
+		try:
+			return cls(kind, conf)
+		except RequestConfError as e:
+			raise RequestConfError(where + '.transfer.condition: ' + str(e))
+
+	def toDict(self) -> dict:
+		''' Serialize back to the transfer section '''
+
+		self.conf['transfer']['condition'] = self.condition
+		if 'results' in self.conf or self.results is not None:
+			self.conf['results'] = self.results
+		return self.conf
+
+
+class ServiceSpec():
+	''' A service of a request '''
+
+	__slots__ = ('name', 'image', 'script', 'cmd_eng', 'args', 'envs', 'mnts', 'tasks', 'ser_check_thr', 'container_dir', \
+				'work_dir', 'data', 'dep_files', 'dep_ser', 'dep_fn', 'results', 'toremove', 'iterative', 's3', 'nifi', \
+				'sftp', 'resources', 'retries', 'per_task_results', 'executor', 'present', 'dep_extra', 'extra')
+
+	# Keys that must exist in a service section
+	required_keys = ('iterative', 'dependencies', 'image', 'script', 'cmd_eng', 'tasks', 'ser_check_thr', 'container_dir', \
+					'data', 'work_dir', 'args', 'envs', 'mnts', 'results', 'toremove', 's3')
+
+	# Keys that may be omitted from a service section
+	optional_keys = ('nifi', 'sftp', 'resources', 'retries', 'per_task_results', 'executor')
+
+	# Keys of a service section. Any other key is kept as it is in @extra
+	keys = required_keys + optional_keys
+
+	def __init__(self, name:str):
+		'''
+		@param name: Service name
+		@type name: str
+		'''
+
+		self.name = name
+		self.present = set()  # Optional keys that exist in the service section (even if null), so they are written back
+		self.dep_extra = {}  # Keys of the 'dependencies' section other than 'files' and 'ser', kept as they are
+		self.extra = {}
+
+	@classmethod
+	def fromDict(cls, name:str, conf:dict):
+		''' Parse and validate a service section
+		@param name: Service name
+		@type name: str
+		@param conf: The service section
+		@type conf: dict
+		@return: Service
+		@rtype: ServiceSpec
+		'''
+
+		where = 'services.' + str(name)
+		_check(isinstance(conf, dict), where + ' should be a dictionary')
+		missing = [k for k in cls.required_keys if k not in conf]
+		_check(not missing, where + ' misses required keys ' + str(missing))
+
+		ser = cls(name)
+		ser.iterative = IterationSpec.fromDict(conf['iterative'], where + '.iterative')
+
+		dep = conf['dependencies']
+		_check(isinstance(dep, dict) and 'files' in dep and 'ser' in dep, where + '.dependencies should have files and ser')
+		_check(dep['files'] is None or isinstance(dep['files'], dict), where + '.dependencies.files should be a dictionary')
+		_check(dep['ser'] is None or isinstance(dep['ser'], list), where + '.dependencies.ser should be a list')
+		ser.dep_files = dep['files']
+		ser.dep_ser = dep['ser']
+		ser.dep_fn = dep.get('fn')
+		ser.dep_extra = {k:v for k, v in dep.items() if k not in ('files', 'ser')}
+
+		for k in ('image', 'script', 'cmd_eng'):
+			_check(isinstance(conf[k], str) and conf[k], where + '.' + k + ' should be a non-empty string')
+		ser.image = conf['image']
+		ser.script = conf['script']
+		ser.cmd_eng = conf['cmd_eng']
+
+		_check(_isint(conf['tasks']) and conf['tasks'] > 0, where + '.tasks should be a positive integer')
+		ser.tasks = conf['tasks']
+		_check(conf['ser_check_thr'] is None or _isint(conf['ser_check_thr']), where + '.ser_check_thr should be an integer')
+		ser.ser_check_thr = conf['ser_check_thr']
+
+		for k in ('args', 'envs', 'mnts', 'toremove'):
+			_check(conf[k] is None or isinstance(conf[k], list), where + '.' + k + ' should be a list')
+		ser.args = conf['args']
+		ser.envs = conf['envs']
+		ser.mnts = conf['mnts']
+		ser.toremove = conf['toremove']
+		ser.container_dir = conf['container_dir']
+		ser.work_dir = conf['work_dir']
+
+		_check(conf['data'] is None or isinstance(conf['data'], dict), where + '.data should be a dictionary')
+		for k, v in (conf['data'] or {}).items():
+			_check(isinstance(v, dict) and 'container_data_path' in v, where + '.data.' + str(k) + ' should have container_data_path')
+		ser.data = conf['data']
+
+		_check(conf['results'] is None or isinstance(conf['results'], dict), where + '.results should be a dictionary')
+		for k, v in (conf['results'] or {}).items():
+			_check(isinstance(v, list) and all(isinstance(a, dict) and 'action' in a for a in v), \
+				where + '.results.' + str(k) + ' should be a list of actions')
+		ser.results = conf['results']
+
+		ser.s3 = TransferSpec.fromDict('s3', conf['s3'], where + '.s3')
+		for kind in ('nifi', 'sftp'):
+			secs = conf.get(kind)
+			_check(secs is None or isinstance(secs, list), where + '.' + kind + ' should be a list')
+			setattr(ser, kind, [TransferSpec.fromDict(kind, x, where + '.' + kind + '[' + str(i) + ']') \
+							for i, x in enumerate(secs)] if secs is not None else None)
+
+		ser.resources = ResourceSpec.fromDict(conf['resources'], where + '.resources') if conf.get('resources') is not None else None
+		_check(not ser.resources or not ser.resources.min_tasks or ser.resources.min_tasks <= ser.tasks, \
+			where + '.resources.min_tasks should not exceed tasks')
+
+		_check(conf.get('retries') is None or (_isint(conf['retries']) and conf['retries'] >= 0), where + '.retries should be a non-negative integer')
+		ser.retries = conf.get('retries')
+		_check(conf.get('per_task_results') is None or isinstance(conf['per_task_results'], bool), where + '.per_task_results should be True or False')
+		ser.per_task_results = conf.get('per_task_results')
+		_check(conf.get('executor') is None or isinstance(conf['executor'], str), where + '.executor should be a string')
+		ser.executor = conf.get('executor')
+
+		ser.present = {k for k in cls.optional_keys if k in conf}
+		ser.extra = {k:v for k, v in conf.items() if k not in cls.keys}
+		return ser
+
+	def toDict(self) -> dict:
+		''' Serialize back to the service section '''
+
+		dep = {'files':self.dep_files, 'ser':self.dep_ser}
+		dep.update(self.dep_extra)
+		if self.dep_fn is not None or 'fn' in self.dep_extra:
+			dep['fn'] = self.dep_fn
+		conf = {'iterative':self.iterative.toDict(), 'dependencies':dep, \
+			'image':self.image, 'script':self.script, 'cmd_eng':self.cmd_eng, 'args':self.args, 'envs':self.envs, \
+			'mnts':self.mnts, 'tasks':self.tasks, 'ser_check_thr':self.ser_check_thr, 'container_dir':self.container_dir, \
+			'work_dir':self.work_dir, 'data':self.data, 'results':self.results, 'toremove':self.toremove, \
+			's3':self.s3.toDict()}
+		# Optional keys are written if they have a value, or if they exist (even if null) in the original section
+		for k in self.optional_keys:
+			v = getattr(self, k)
+			if v is not None:
+				if k in ('nifi', 'sftp'):
+					v = [x.toDict() for x in v]
+				elif k == 'resources':
+					v = v.toDict()
+				conf[k] = v
+			elif k in self.present:
+				conf[k] = None
+		conf.update(self.extra)
+		return conf
+
+
+class Request():
+	''' A user request as described by its configuration file '''
+
+	__slots__ = ('userid', 'curserv', 'fin_dest', 'services', 'present', 'extra')
+
+	def __init__(self):
+		self.userid = None
+		self.curserv = 'pre_services'
+		self.fin_dest = {}
+		self.services = OrderedDict()
+		self.present = {'userid', 'curserv'}  # Top-level keys that are written back even if they are null
+		self.extra = {}
+
+	@classmethod
+	def fromDict(cls, conf:dict):
+		''' Parse and validate a user configuration
+		@param conf: User configuration
+		@type conf: dict
+		@return: Request
+		@rtype: Request
+		@raise RequestConfError: If the user configuration is malformed
+		'''
+
+		_check(isinstance(conf, dict), 'Configuration should be a dictionary')
+		_check(isinstance(conf.get('services'), dict) and conf['services'], 'Configuration has no services')
+		_check(isinstance(conf.get('fin_dest'), dict) and 'transfer' in conf['fin_dest'], 'Configuration has no valid fin_dest section')
+
+		req = cls()
+		req.userid = conf.get('userid')
+		req.curserv = conf.get('curserv', 'pre_services')
+		req.fin_dest = conf['fin_dest']
+		for name, ser in conf['services'].items():
+			req.services[name] = ServiceSpec.fromDict(name, ser)
+		req.present = {k for k in ('userid', 'curserv') if k in conf}
+		req.extra = {k:v for k, v in conf.items() if k not in ('userid', 'curserv', 'fin_dest', 'services')}
+		return req
+
+	@classmethod
+	def load(cls, infile:str):
+		''' Load, parse and validate the user configuration file of a request
+		@param infile: Path to the user configuration file
+		@type infile: str
+		@return: Request
+		@rtype: Request
+		@raise RequestConfError: If the user configuration file does not exist or is malformed
+		'''
+
+		conf = loadYAML(infile)
+		_check(conf is not None, 'Configuration file ' + str(infile) + ' does not exist')
+		return cls.fromDict(conf)
+
+	def mergeFrom(self, conf:dict) -> None:
+		''' Merge a configuration that has been modified externally (e.g., by the VIFI client REST API) into this request.
+		The state owned by the VIFI Node (i.e., the current service and the current iteration of each service) is kept from
+		this request, while all other settings (e.g., transfer results, conditions and maximum iterations) are taken from @conf. Services are
+		updated in place, so references held by the scheduler stay valid. If @conf is malformed, this request is not changed.
+		@param conf: Externally modified user configuration
+		@type conf: dict
+		@raise RequestConfError: If @conf is malformed. The caller should not overwrite the external configuration with this request, or the external modifications are lost
+		'''
+
+		other = Request.fromDict(conf)
+		for name, ser in self.services.items():
+			if name in other.services:
+				for k in ServiceSpec.__slots__:
+					if k not in ('name', 'iterative'):
+						setattr(ser, k, getattr(other.services[name], k))
+				ser.iterative.max_rep = other.services[name].iterative.max_rep
+		self.userid = other.userid
+		self.fin_dest = other.fin_dest
+		self.extra = other.extra
+
+	def unfinishedServices(self) -> List[ServiceSpec]:
+		''' Return the services that still have iterations to run, in order '''
+
+		return [x for x in self.services.values() if x.iterative.unfinished()]
+
+	def toDict(self) -> dict:
+		''' Serialize back to the user configuration structure '''
+
+		conf = {}
+		if self.userid is not None or 'userid' in self.present:
+			conf['userid'] = self.userid
+		conf['fin_dest'] = self.fin_dest
+		if self.curserv != 'pre_services' or 'curserv' in self.present:
+			conf['curserv'] = self.curserv
+		conf['services'] = {k:v.toDict() for k, v in self.services.items()}
+		conf.update(self.extra)
+		return conf
+
+	def dump(self, outfile:str, **kwargs) -> None:
+		''' Write the request configuration back to a YAML file
+		@param outfile: Path to the user configuration file
+		@type outfile: str
+		'''
+
+		dumpYAML(self.toDict(), outfile, **kwargs)